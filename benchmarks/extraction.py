@@ -0,0 +1,52 @@
+"""Per-record construction cost and memory of the `Extraction` representations.
+
+Run with `uv run python benchmarks/extraction.py [count]`.
+"""
+
+import gc
+import sys
+import timeit
+import tracemalloc
+from collections.abc import Callable
+
+from torah_dl.core.models import Extraction, ExtractionRecord
+
+FIELDS = {
+    "download_url": "https://download.yutorah.org/2024/34263/1117416/ketuvot-57a-b---preparation-for-nisuin.mp3",
+    "title": "Ketuvot 57a-b - Preparation for Nisuin",
+    "file_format": "audio/mp3",
+    "file_name": "ketuvot-57a-b---preparation-for-nisuin.mp3",
+}
+
+BUILDERS: dict[str, Callable[[], object]] = {
+    "Extraction(...)": lambda: Extraction(**FIELDS),
+    "Extraction.model_construct(...)": lambda: Extraction.model_construct(**FIELDS),
+    "Extraction.trusted(...)": lambda: Extraction.trusted(**FIELDS),
+    "ExtractionRecord(...)": lambda: ExtractionRecord(**FIELDS),
+}
+
+
+def construction_time(build: Callable[[], object], count: int) -> float:
+    """Returns the best per-record construction time in microseconds."""
+    return min(timeit.repeat(build, number=count, repeat=5)) / count * 1e6
+
+
+def memory_per_record(build: Callable[[], object], count: int) -> float:
+    """Returns the bytes allocated per record while holding `count` of them."""
+    gc.collect()
+    tracemalloc.start()
+    records = [build() for _ in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return size / count
+
+
+def main(count: int = 100_000) -> None:
+    print(f"{'representation':<34}{'us/record':>12}{'bytes/record':>15}")
+    for name, build in BUILDERS.items():
+        print(f"{name:<34}{construction_time(build, count):>12.2f}{memory_per_record(build, count):>15.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -1,6 +1,8 @@
 from .core.download import download
 from .core.exceptions import (
+    CircuitOpenError,
     ContentExtractionError,
+    DeadlineExceededError,
     DownloadError,
     DownloadURLError,
     ExtractionError,
@@ -9,17 +11,20 @@ from .core.exceptions import (
     TitleExtractionError,
     TorahDLError,
 )
-from .core.extract import EXTRACTORS, can_handle, extract
+from .core.extract import EXTRACTORS, can_handle, extract, extract_all
 from .core.list import list_extractors
-from .core.models import Extraction
+from .core.models import Extraction, ExtractionRecord
 
 __all__ = [
     "EXTRACTORS",
+    "CircuitOpenError",
     "ContentExtractionError",
+    "DeadlineExceededError",
     "DownloadError",
     "DownloadURLError",
     "Extraction",
     "ExtractionError",
+    "ExtractionRecord",
     "ExtractorNotFoundError",
     "NetworkError",
     "TitleExtractionError",
@@ -27,5 +32,6 @@ __all__ = [
     "can_handle",
     "download",
     "extract",
+    "extract_all",
     "list_extractors",
 ]
@@ -1,13 +1,40 @@
+import contextlib
 import importlib.metadata
+import re
+import signal
+import sys
+import threading
+import time
 from pathlib import Path
 from typing import Annotated
 
 import typer
 from rich.console import Console
+from rich.filesize import decimal
+from rich.progress import (
+    BarColumn,
+    DownloadColumn,
+    Progress,
+    Task,
+    TaskID,
+    TextColumn,
+    TimeRemainingColumn,
+    TransferSpeedColumn,
+)
 from rich.table import Table
+from rich.text import Text
 
 from torah_dl import download, extract, list_extractors
+from torah_dl.core.catalog import Catalog
+from torah_dl.core.download import DownloadProgress
 from torah_dl.core.exceptions import ExtractorNotFoundError
+from torah_dl.core.jobs import Job, JobQueue, JobState, process_queue, process_queue_in_processes
+from torah_dl.core.manifest import MANIFEST_NAME, Manifest
+from torah_dl.core.metrics import serve_metrics
+from torah_dl.core.ratelimit import set_bandwidth_limit
+from torah_dl.core.shard import InvalidShardError, Shard, shard_urls
+from torah_dl.core.store import MediaStore
+from torah_dl.core.sync import sync
 
 try:
     __version__ = importlib.metadata.version(__package__ or __name__)
@@ -15,24 +42,71 @@ except importlib.metadata.PackageNotFoundError:  # pragma: no cover
     __version__ = "develop"
 
 app = typer.Typer()
+queue_app = typer.Typer(help="Work through a durable queue of URLs to download.")
+app.add_typer(queue_app, name="queue")
 console = Console()
+err_console = Console(stderr=True)
+
+_RATE = re.compile(r"(\d+(?:\.\d+)?)([KMG]?)", re.IGNORECASE)
+_ERR_INVALID_RATE = "expected bytes per second, e.g. 500K or 2M"
+_ERR_SKIP_STDOUT = "needs an output file, not stdout"
+_ERR_NO_FETCH_RECORD = "cannot be combined with --record, which records the title"
+
+CatalogOption = Annotated[
+    Path,
+    typer.Option("--catalog", envvar="TORAH_DL_CATALOG", help="SQLite catalog of extracted shiurim"),
+]
+
+FsyncOption = Annotated[
+    bool,
+    typer.Option("--fsync", help="Flush downloads to disk before finishing them, so a crash cannot lose them"),
+]
+
+StoreOption = Annotated[
+    Path | None,
+    typer.Option(
+        "--store",
+        envvar="TORAH_DL_STORE",
+        help="Content-addressed store to download through, so the same media is only fetched and kept once",
+    ),
+]
+
+
+def _open_store(path: Path | None) -> contextlib.AbstractContextManager[MediaStore | None]:
+    return MediaStore(path) if path is not None else contextlib.nullcontext()
 
 
 @app.command(name="extract")
 def extract_url(
     url: str,
     url_only: Annotated[bool, typer.Option("--url-only", help="Only output the download URL")] = False,
+    no_fetch: Annotated[
+        bool,
+        typer.Option(
+            "--no-fetch",
+            help="Build the download URL from the URL alone where the site allows it, without checking it or "
+            "fetching the title",
+        ),
+    ] = False,
+    record: Annotated[bool, typer.Option("--record", help="Record the extraction in the catalog")] = False,
+    catalog_path: CatalogOption = Path("catalog.db"),
 ):
     """
     Extract information from a given URL
     """
+    if no_fetch and record:
+        raise typer.BadParameter(_ERR_NO_FETCH_RECORD, param_hint="--no-fetch")
     with console.status("Extracting URL..."):
         try:
-            extraction = extract(url)
+            extraction = extract(url, fetch_metadata=not no_fetch)
         except ExtractorNotFoundError:
             typer.echo(f"Extractor not found for URL: {url}", err=True)
             raise typer.Exit(1) from None
 
+    if record:
+        with Catalog(catalog_path) as catalog:
+            catalog.add(url, extraction)
+
     if url_only:
         typer.echo(extraction.download_url)
     else:
@@ -48,13 +122,282 @@ def extract_url(
 @app.command(name="download")
 def download_url(
     url: Annotated[str, typer.Argument(help="URL to download")],
-    output_path: Annotated[Path, typer.Argument(help="Path to save the downloaded file")] = Path("audio"),
+    output_path: Annotated[
+        Path,
+        typer.Argument(help="Path to save the downloaded file; - writes it to stdout, e.g. to pipe it into ffmpeg"),
+    ] = Path("audio"),
+    skip_unchanged: Annotated[
+        bool,
+        typer.Option("--skip-unchanged", help="Don't download again if the file exists and is unchanged upstream"),
+    ] = False,
+    store_path: StoreOption = None,
+    fsync: FsyncOption = False,
 ):
     """Download a file from a URL and show progress."""
-    with console.status("Extracting URL..."):
+    to_stdout = str(output_path) == "-"
+    if to_stdout and skip_unchanged:
+        raise typer.BadParameter(_ERR_SKIP_STDOUT, param_hint="--skip-unchanged")
+    # keep stdout for the file itself when it is written there
+    out = err_console if to_stdout else console
+
+    with out.status("Extracting URL..."):
         extraction = extract(url)
-    with console.status("Downloading file..."):
-        download(extraction.download_url, output_path)
+    with _progress_bars(out) as bars, _open_store(store_path) as store:
+        task = bars.add_task("stdout" if to_stdout else output_path.name, total=None)
+        result = (store.download if store else download)(
+            extraction.download_url,
+            sys.stdout.buffer if to_stdout else output_path,
+            skip_unchanged=skip_unchanged,
+            fsync=fsync,
+            progress=lambda progress: bars.update(task, completed=progress.done, total=progress.total),
+        )
+    if not result.downloaded and not to_stdout:
+        typer.echo(f"{output_path} is up to date")
+    elif result.downloaded:
+        typer.echo(
+            f"Downloaded {'to stdout' if to_stdout else output_path} ({decimal(result.size)}) "
+            f"in {result.elapsed:.1f}s, {decimal(int(result.throughput))}/s",
+            err=to_stdout,
+        )
+
+
+@app.command(name="sync")
+def sync_series(
+    url: Annotated[str, typer.Argument(help="URL of the feed or series to sync")],
+    directory: Annotated[Path, typer.Argument(help="Directory to mirror the series into")],
+    md5: Annotated[bool, typer.Option("--md5", help="Record the MD5 of each file as well as its SHA-256")] = False,
+    store_path: StoreOption = None,
+):
+    """Download the items of a series that are not in a directory yet."""
+    with console.status("Syncing..."), _open_store(store_path) as store:
+        result = sync(url, directory, md5=md5, store=store)
+
+    if result.not_modified:
+        typer.echo("Feed unchanged since the last sync")
+        return
+
+    typer.echo(f"Downloaded {len(result.downloaded)}, already present {result.skipped}, failed {len(result.failed)}")
+    for download_url, error in result.failed.items():
+        typer.echo(f"Failed {download_url}: {error}", err=True)
+    if result.failed:
+        raise typer.Exit(1)
+
+
+@app.command(name="search")
+def search_catalog(
+    query: Annotated[str, typer.Argument(help="Words to look for in titles")],
+    catalog_path: CatalogOption = Path("catalog.db"),
+    limit: Annotated[int, typer.Option("--limit", help="Maximum number of results")] = 50,
+):
+    """Search the catalog of extracted shiurim by title."""
+    with Catalog(catalog_path) as catalog:
+        entries = catalog.search(query, limit=limit)
+
+    table = Table(box=None, pad_edge=False)
+    table.add_column(style="bold")
+    table.add_column(style="cyan", no_wrap=True)
+    for entry in entries:
+        table.add_row(entry.title, entry.download_url)
+    console.print(table)
+
+
+QueueOption = Annotated[
+    Path,
+    typer.Option("--queue", envvar="TORAH_DL_QUEUE", help="SQLite database holding the download queue"),
+]
+
+
+@queue_app.command(name="add")
+def queue_add(
+    urls: Annotated[
+        list[str] | None, typer.Argument(help="URLs to queue; read from stdin, one per line, if omitted")
+    ] = None,
+    queue_path: QueueOption = Path("queue.db"),
+    shard: Annotated[
+        str | None,
+        typer.Option("--shard", help="Only queue the URLs of shard i of N (i/N), to split one list across machines"),
+    ] = None,
+):
+    """Queue URLs for download."""
+    if not urls:
+        urls = [line.strip() for line in sys.stdin if line.strip()]
+    if shard is not None:
+        try:
+            urls = list(shard_urls(urls, Shard.parse(shard)))
+        except InvalidShardError as e:
+            raise typer.BadParameter(str(e), param_hint="--shard") from None
+    with JobQueue(queue_path) as queue:
+        added = queue.add(urls)
+    typer.echo(f"Queued {added} new URLs")
+
+
+@queue_app.command(name="run")
+def queue_run(
+    directory: Annotated[Path, typer.Argument(help="Directory to download into")],
+    queue_path: QueueOption = Path("queue.db"),
+    workers: Annotated[int, typer.Option("--workers", help="How many URLs to work on at once (per process)")] = 4,
+    processes: Annotated[
+        int | None,
+        typer.Option("--processes", help="Run this many worker processes; 0 runs one per CPU"),
+    ] = None,
+    store_path: StoreOption = None,
+    fsync: FsyncOption = False,
+):
+    """Extract and download every queued URL, resuming interrupted downloads.
+
+    On SIGINT or SIGTERM no new URL is started, but downloads in progress are finished first.
+    """
+    stop = threading.Event()
+
+    def request_stop(*_):
+        if not stop.is_set():
+            typer.echo("Stopping after the downloads in progress...", err=True)
+        stop.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    if processes is not None:
+        with console.status("Downloading queued URLs...") as status:
+            process_queue_in_processes(
+                queue_path,
+                directory,
+                processes=processes or None,
+                threads=workers,
+                stop=stop,
+                on_progress=lambda counts: status.update(
+                    "Downloading queued URLs... " + ", ".join(f"{state.value} {n}" for state, n in counts.items())
+                ),
+                store=store_path,
+                fsync=fsync,
+            )
+    else:
+        with JobQueue(queue_path) as queue, _open_store(store_path) as store, _progress_bars() as bars:
+            counts = queue.counts()
+            jobs = sum(counts[state] for state in (JobState.PENDING, JobState.EXTRACTED, JobState.DOWNLOADING))
+            process_queue(
+                queue,
+                directory,
+                workers=workers,
+                stop=stop,
+                store=store,
+                fsync=fsync,
+                on_progress=_QueueProgress(bars, jobs),
+            )
+
+    with JobQueue(queue_path) as queue:
+        manifest_path = directory / MANIFEST_NAME
+        Manifest.load(manifest_path).merge(queue.manifest(directory)).save(manifest_path)
+        _print_queue_status(queue)
+
+
+@queue_app.command(name="status")
+def queue_status(queue_path: QueueOption = Path("queue.db")):
+    """Show how many queued URLs are in each state, and why any failed."""
+    with JobQueue(queue_path) as queue:
+        _print_queue_status(queue)
+        for job in queue.failures():
+            typer.echo(f"{job.url}: {job.error}: {job.error_message}")
+
+
+@queue_app.command(name="retry")
+def queue_retry(queue_path: QueueOption = Path("queue.db")):
+    """Queue every failed URL again."""
+    with JobQueue(queue_path) as queue:
+        retried = queue.retry_failed()
+    typer.echo(f"Queued {retried} failed URLs again")
+
+
+@queue_app.command(name="recover")
+def queue_recover(queue_path: QueueOption = Path("queue.db")):
+    """Release every claimed URL, so the next run works on it again.
+
+    Only use this when no worker is running: `tdl queue run` already releases the URLs of workers
+    that have exited, or that stopped renewing their claims, e.g. because their host crashed.
+    """
+    with JobQueue(queue_path) as queue:
+        recovered = queue.recover()
+    typer.echo(f"Released {recovered} claimed URLs")
+
+
+@app.command(name="merge-manifests")
+def merge_manifests(
+    output: Annotated[Path, typer.Argument(help="Manifest to merge into; created if missing")],
+    inputs: Annotated[list[Path], typer.Argument(help="Manifests to merge, e.g. one per shard")],
+):
+    """Merge the manifests written by several machines or shards into one."""
+    manifest = Manifest.load(output)
+    for path in inputs:
+        manifest.merge(Manifest.load(path))
+    manifest.save(output)
+    typer.echo(f"{len(manifest.entries)} files in {output}")
+
+
+class _SizeColumn(DownloadColumn):
+    """Bytes downloaded of a file, or files finished for the bar of a whole queue."""
+
+    def render(self, task: Task) -> Text:
+        if task.fields.get("files"):
+            return Text(f"{int(task.completed)}/{int(task.total or 0)} files", style="progress.download")
+        return super().render(task)
+
+
+class _SpeedColumn(TransferSpeedColumn):
+    """Bytes per second of a file, or of all downloads together for the bar of a whole queue."""
+
+    def render(self, task: Task) -> Text:
+        if task.fields.get("files"):
+            return Text(f"{decimal(int(task.fields['rate']))}/s", style="progress.data.speed")
+        return super().render(task)
+
+
+def _progress_bars(output: Console = console) -> Progress:
+    return Progress(
+        TextColumn("{task.description}"),
+        BarColumn(),
+        _SizeColumn(),
+        _SpeedColumn(),
+        TimeRemainingColumn(),
+        console=output,
+        transient=True,
+    )
+
+
+class _QueueProgress:
+    """Shows a bar for every download in progress, and one for the whole queue with the combined throughput."""
+
+    def __init__(self, bars: Progress, jobs: int):
+        self._bars = bars
+        self._overall = bars.add_task("All files", total=jobs, files=True, rate=0.0)
+        self._tasks: dict[int, TaskID] = {}
+        self._received: dict[int, int] = {}
+        self._finished = 0
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, job: Job, progress: DownloadProgress | None) -> None:
+        with self._lock:
+            if progress is None:
+                if (task := self._tasks.pop(job.id, None)) is not None:
+                    self._bars.remove_task(task)
+                self._finished += self._received.pop(job.id, 0)
+                self._bars.advance(self._overall)
+            else:
+                if (task := self._tasks.get(job.id)) is None:
+                    task = self._tasks[job.id] = self._bars.add_task(Path(job.output_path or job.url).name)
+                self._bars.update(task, completed=progress.done, total=progress.total)
+                self._received[job.id] = progress.received
+            received = self._finished + sum(self._received.values())
+            self._bars.update(self._overall, rate=received / (time.perf_counter() - self._start))
+
+
+def _print_queue_status(queue: JobQueue) -> None:
+    table = Table(box=None, pad_edge=False, show_header=False)
+    table.add_column(style="bold")
+    table.add_column(justify="right")
+    for state, count in queue.counts().items():
+        table.add_row(state.value, str(count), style="green" if state is JobState.DONE else None)
+    console.print(table)
 
 
 @app.command(name="list")
@@ -83,11 +426,40 @@ def callback(
         bool | None,
         typer.Option("--version", callback=version_callback, is_eager=True),
     ] = None,
+    metrics_port: Annotated[
+        int | None,
+        typer.Option("--metrics-port", help="Serve Prometheus metrics on this port while the command runs"),
+    ] = None,
+    limit_rate: Annotated[
+        str | None,
+        typer.Option(
+            "--limit-rate",
+            help="Cap the download speed of all downloads together, in every worker process, e.g. 500K or 2M bytes/s",
+        ),
+    ] = None,
+    limit_host_rate: Annotated[
+        list[str] | None,
+        typer.Option("--limit-host-rate", help="Cap the download speed from one host, as HOST=RATE; may be repeated"),
+    ] = None,
 ):
     """
     SoferAI's Torah Downloader
     """
-    pass
+    if metrics_port is not None:
+        serve_metrics(metrics_port)
+    if limit_rate is not None:
+        set_bandwidth_limit(_parse_rate(limit_rate, "--limit-rate"))
+    for host_rate in limit_host_rate or []:
+        host, _, rate = host_rate.partition("=")
+        set_bandwidth_limit(_parse_rate(rate, "--limit-host-rate"), host)
+
+
+def _parse_rate(rate: str, option: str) -> float:
+    """Parses a number of bytes per second with an optional K, M or G (1024-based) suffix."""
+    match = _RATE.fullmatch(rate.strip())
+    if match is None or float(match[1]) <= 0:
+        raise typer.BadParameter(_ERR_INVALID_RATE, param_hint=option)
+    return float(match[1]) * 1024 ** " KMG".index(match[2].upper() or " ")
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -0,0 +1,225 @@
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+from pydantic import BaseModel, Field
+
+from .extract import get_extractor
+from .models import Extraction
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    canonical_id TEXT NOT NULL,
+    extractor TEXT NOT NULL,
+    title TEXT,
+    download_url TEXT NOT NULL,
+    file_format TEXT,
+    file_name TEXT,
+    size INTEGER,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    UNIQUE (extractor, canonical_id)
+);
+CREATE INDEX IF NOT EXISTS extractions_url ON extractions (url);
+"""
+
+# An external-content index over the titles, kept in sync with the table by triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS extractions_fts USING fts5(title, content='extractions', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS extractions_ai AFTER INSERT ON extractions BEGIN
+    INSERT INTO extractions_fts (rowid, title) VALUES (new.id, new.title);
+END;
+CREATE TRIGGER IF NOT EXISTS extractions_ad AFTER DELETE ON extractions BEGIN
+    INSERT INTO extractions_fts (extractions_fts, rowid, title) VALUES ('delete', old.id, old.title);
+END;
+CREATE TRIGGER IF NOT EXISTS extractions_au AFTER UPDATE OF title ON extractions BEGIN
+    INSERT INTO extractions_fts (extractions_fts, rowid, title) VALUES ('delete', old.id, old.title);
+    INSERT INTO extractions_fts (rowid, title) VALUES (new.id, new.title);
+END;
+"""
+
+_UPSERT = """
+INSERT INTO extractions (
+    url, canonical_id, extractor, title, download_url, file_format, file_name, size, first_seen, last_seen
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (extractor, canonical_id) DO UPDATE SET
+    url = excluded.url,
+    title = excluded.title,
+    download_url = excluded.download_url,
+    file_format = excluded.file_format,
+    file_name = excluded.file_name,
+    size = excluded.size,
+    last_seen = excluded.last_seen
+"""
+
+_FIELDS = (
+    "url",
+    "canonical_id",
+    "extractor",
+    "title",
+    "download_url",
+    "file_format",
+    "file_name",
+    "size",
+    "first_seen",
+    "last_seen",
+)
+_SELECT = "SELECT " + ", ".join(f"extractions.{field}" for field in _FIELDS) + " FROM extractions"  # noqa: S608
+
+
+class CatalogEntry(BaseModel):
+    """An extraction recorded in a `Catalog`."""
+
+    url: str = Field(description="The URL the item was last extracted from")
+    canonical_id: str
+    extractor: str
+    title: str | None = None
+    download_url: str
+    file_format: str | None = None
+    file_name: str | None = None
+    size: int | None = None
+    first_seen: datetime
+    last_seen: datetime
+
+    def to_extraction(self) -> Extraction:
+        """Returns the recorded extraction."""
+        return Extraction.trusted(self.download_url, self.title, self.file_format, self.file_name, self.size)
+
+
+class Catalog:
+    """A local SQLite catalog of extractions, searchable by title.
+
+    Items are keyed by extractor and `Extractor.canonical_id`, so extracting the same item again,
+    through any of its URLs, updates its entry. Titles are indexed with FTS5 when the SQLite
+    build has it, and matched with LIKE otherwise.
+
+    Args:
+        path: The database file; ":memory:" keeps the catalog in memory
+    """
+
+    def __init__(self, path: str | Path = ":memory:"):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+            try:
+                self._connection.executescript(_FTS_SCHEMA)
+                self.full_text = True
+            except sqlite3.OperationalError:
+                self.full_text = False
+
+    def add(self, url: str, extraction: Extraction) -> None:
+        """Records an extraction of a URL."""
+        self.add_many([(url, extraction)])
+
+    def add_many(self, items: Iterable[tuple[str, Extraction]], batch_size: int = 1000) -> int:
+        """
+        Records many extractions, committing one transaction per batch.
+
+        Args:
+            items: (url, extraction) pairs
+            batch_size: How many extractions to write per transaction
+
+        Returns:
+            int: The number of extractions recorded
+
+        Raises:
+            ExtractorNotFoundError: If no extractor handles one of the URLs
+        """
+        count = 0
+        iterator = iter(items)
+        while batch := [self._row(url, extraction) for url, extraction in islice(iterator, batch_size)]:
+            with self._lock, self._connection:
+                self._connection.executemany(_UPSERT, batch)
+            count += len(batch)
+        return count
+
+    def get(self, url: str) -> CatalogEntry | None:
+        """Returns the entry of the item a URL points at, if it has been recorded."""
+        extractor = get_extractor(url)
+        return self._one(
+            f"{_SELECT} WHERE extractor = ? AND canonical_id = ?",
+            (extractor.name, extractor.canonical_id(url)),
+        )
+
+    def search(self, query: str, limit: int = 50) -> list[CatalogEntry]:
+        """
+        Finds entries whose title contains every word of the query; the last word may be a prefix.
+
+        Args:
+            query: The words to look for
+            limit: The maximum number of entries to return
+
+        Returns:
+            list[CatalogEntry]: The matching entries, best matches first when FTS5 is available
+        """
+        words = query.split()
+        if not words:
+            return []
+
+        if self.full_text:
+            match = " ".join('"' + word.replace('"', '""') + '"' for word in words) + "*"
+            sql = (
+                f"{_SELECT} JOIN extractions_fts ON extractions_fts.rowid = extractions.id "
+                "WHERE extractions_fts MATCH ? ORDER BY extractions_fts.rank LIMIT ?"
+            )
+            params: tuple = (match, limit)
+        else:
+            conditions = " AND ".join("title LIKE ?" for _ in words)
+            sql = f"{_SELECT} WHERE {conditions} LIMIT ?"
+            params = (*(f"%{word}%" for word in words), limit)
+
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def __iter__(self) -> Iterator[CatalogEntry]:
+        with self._lock:
+            rows = self._connection.execute(f"{_SELECT} ORDER BY extractions.id").fetchall()
+        return (self._entry(row) for row in rows)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def _row(self, url: str, extraction: Extraction) -> tuple:
+        extractor = get_extractor(url)
+        now = time.time()
+        return (
+            url,
+            extractor.canonical_id(url),
+            extractor.name,
+            extraction.title,
+            extraction.download_url,
+            extraction.file_format,
+            extraction.file_name,
+            extraction.size,
+            now,
+            now,
+        )
+
+    def _one(self, sql: str, params: tuple) -> CatalogEntry | None:
+        with self._lock:
+            row = self._connection.execute(sql, params).fetchone()
+        return None if row is None else self._entry(row)
+
+    @staticmethod
+    def _entry(row: tuple) -> CatalogEntry:
+        return CatalogEntry(**dict(zip(_FIELDS, row, strict=True)))
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections.abc import Callable
+
+from .exceptions import DeadlineExceededError
+from .instrumentation import record_limit
+from .ratelimit import normalize_host
+
+
+class AIMDLimiter:
+    """Adaptive concurrency limit for a single host (additive increase, multiplicative decrease).
+
+    While responses come back at a stable latency the limit grows by roughly one slot per
+    `limit` successful requests. A 429, 5xx or timeout cuts it by `decrease`, at most once per
+    latency window so a single burst of failures does not collapse it to the minimum.
+    """
+
+    def __init__(
+        self,
+        initial: float = 4,
+        minimum: float = 1,
+        maximum: float = 64,
+        decrease: float = 0.5,
+        latency_tolerance: float = 2.0,
+        on_change: Callable[[float], None] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.baseline_latency: float | None = None
+        self._on_change = on_change
+        self._clock = clock
+        self._last_decrease = float("-inf")
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: float | None = None) -> float:
+        """Blocks until a request slot is free, returning the time spent waiting.
+
+        Raises:
+            DeadlineExceededError: If no slot became free within `timeout` seconds
+        """
+        start = self._clock()
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.in_flight < int(self.limit), timeout):
+                raise DeadlineExceededError()
+            self.in_flight += 1
+        return self._clock() - start
+
+    def cancel(self) -> None:
+        """Frees a slot whose request was never sent, without adjusting the limit."""
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def release(self, latency: float, overloaded: bool = False) -> None:
+        """Frees a slot and adjusts the limit from the outcome of the request that held it.
+
+        Args:
+            latency: How long the request took
+            overloaded: Whether the host signalled overload (429, 5xx or a timeout)
+        """
+        with self._condition:
+            self.in_flight -= 1
+            previous = self.limit
+            if overloaded:
+                now = self._clock()
+                if now - self._last_decrease >= (self.baseline_latency or 0.0):
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_decrease = now
+            else:
+                if self.baseline_latency is None or latency <= self.baseline_latency * self.latency_tolerance:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self.baseline_latency = (
+                    latency if self.baseline_latency is None else 0.9 * self.baseline_latency + 0.1 * latency
+                )
+            self._condition.notify_all()
+            changed = int(self.limit) != int(previous)
+
+        if changed and self._on_change:
+            self._on_change(self.limit)
+
+
+class HostConcurrency:
+    """Keeps one `AIMDLimiter` per host."""
+
+    def __init__(self, initial: float = 4, minimum: float = 1, maximum: float = 64):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self._limiters: dict[str, AIMDLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, host: str) -> AIMDLimiter:
+        """Returns the limiter of a host, creating it on first use."""
+        host = normalize_host(host)
+        if (limiter := self._limiters.get(host)) is None:
+            with self._lock:
+                if (limiter := self._limiters.get(host)) is None:
+                    limiter = self._limiters[host] = AIMDLimiter(
+                        self.initial,
+                        self.minimum,
+                        self.maximum,
+                        on_change=lambda limit: record_limit(host, limit),
+                    )
+        return limiter
+
+    def limits(self) -> dict[str, float]:
+        """Returns the current concurrency limit of every host seen so far."""
+        return {host: limiter.limit for host, limiter in self._limiters.items()}
+
+
+CONCURRENCY = HostConcurrency()
+
+
+def concurrency_limits() -> dict[str, float]:
+    """Returns the current adaptive concurrency limit of every host seen so far."""
+    return CONCURRENCY.limits()
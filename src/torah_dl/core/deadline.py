@@ -0,0 +1,89 @@
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from pydantic import BaseModel, Field
+
+from .exceptions import DeadlineExceededError
+
+
+class Timeouts(BaseModel):
+    """Per-request socket timeouts, in seconds."""
+
+    connect: float = Field(default=10.0, gt=0, description="Time allowed to establish a connection")
+    read: float = Field(default=30.0, gt=0, description="Time allowed between bytes of the response")
+
+
+_timeouts = Timeouts()
+_deadline: ContextVar[float | None] = ContextVar("torah_dl_deadline", default=None)
+
+
+def get_timeouts() -> Timeouts:
+    """Returns the default per-request timeouts."""
+    return _timeouts
+
+
+def set_timeouts(connect: float | None = None, read: float | None = None) -> None:
+    """Changes the default per-request connect and/or read timeout."""
+    global _timeouts
+    _timeouts = Timeouts(
+        connect=connect if connect is not None else _timeouts.connect,
+        read=read if read is not None else _timeouts.read,
+    )
+
+
+@contextmanager
+def deadline(seconds: float | None) -> Generator[None, None, None]:
+    """Bounds the total time of every request made inside the block.
+
+    Nested deadlines never extend an enclosing one. None leaves the current deadline unchanged.
+    """
+    if seconds is None:
+        yield
+        return
+
+    expires = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(expires if current is None else min(current, expires))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """Returns the seconds left before the current deadline, or None when there is no deadline."""
+    expires = _deadline.get()
+    return None if expires is None else expires - time.monotonic()
+
+
+def check_deadline() -> float | None:
+    """Raises `DeadlineExceededError` if the current deadline has passed, otherwise returns the time left."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceededError()
+    return left
+
+
+def request_timeout(timeout: float | tuple[float, float] | None = None) -> tuple[float, float]:
+    """Returns the (connect, read) timeout for the next request, capped by the current deadline.
+
+    Args:
+        timeout: An explicit timeout for the request, in the same form `requests` accepts;
+            defaults to the configured `Timeouts`
+
+    Raises:
+        DeadlineExceededError: If the current deadline has already passed
+    """
+    if timeout is None:
+        connect, read = _timeouts.connect, _timeouts.read
+    elif isinstance(timeout, tuple):
+        connect, read = timeout
+    else:
+        connect = read = timeout
+
+    left = check_deadline()
+    if left is None:
+        return connect, read
+    return min(connect, left), min(read, left)
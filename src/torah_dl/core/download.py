@@ -1,24 +1,506 @@
-from pathlib import Path
+import errno
+import hashlib
+import os
+import re
+import stat
+import time
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO
+from urllib.parse import urlparse
 
 import requests
+from pydantic import BaseModel, Field
 
+from . import http
 from .exceptions import DownloadError
+from .instrumentation import RequestTiming, record_download
+from .models import Extraction
+from .ratelimit import BANDWIDTH
 
+CHUNK_SIZE = 64 * 1024
 
-def download(url: str, output_path: Path, timeout: int = 30):
+# How many bytes are written between two calls of a download's checkpoint callback
+CHECKPOINT_INTERVAL = 1024 * 1024
+
+# The least time between two calls of a download's progress callback, in seconds
+PROGRESS_INTERVAL = 0.1
+
+# Characters that are not safe in file names on every platform we support
+_UNSAFE_CHARACTERS = re.compile(r"[^\w.\-]+")
+
+_ERR_STREAM_OPTIONS = "offset and skip_unchanged need an output path, not a stream"
+_ERR_STREAM_FSYNC = "fsync needs a stream backed by a file"
+
+
+def download(
+    url: str,
+    output_path: Path | BinaryIO,
+    timeout: float | None = None,
+    *,
+    offset: int = 0,
+    validator: str | None = None,
+    checkpoint: Callable[[int, str | None], None] | None = None,
+    skip_unchanged: bool = False,
+    md5: bool = False,
+    fsync: bool = False,
+    progress: Callable[["DownloadProgress"], None] | None = None,
+) -> "DownloadResult":
     """Download a file from a given URL and save it to the specified output path.
 
+    The file is streamed into `partial_path(output_path)` and only renamed to `output_path` once it
+    is complete, so an interrupted download never leaves a file that looks finished. When the
+    server sends a Content-Length, the partial file is preallocated to it first, so the file system
+    can lay it out in one piece even while many downloads write at once. Downloads are kept under
+    the limits set with `set_bandwidth_limit()`. The file is hashed as it is written, so it is never
+    read back; only the part kept from an interrupted download is read once when resuming. With
+    `skip_unchanged`, what the server said about the file (its ETag, Last-Modified and size) and its
+    hashes are kept next to it in `sidecar_path(output_path)`, for the next download to compare with.
+
+    The file can also be written to any writable binary stream instead, e.g. a pipe into ffmpeg, so
+    it never touches the disk; it is then written as it arrives, and cannot be resumed or skipped.
+
     Args:
         url: The URL to download from
-        output_path: The path to save the downloaded file to
-        timeout: The timeout for the request
+        output_path: The path to save the downloaded file to, or a binary stream to write it to
+        timeout: The timeout for the request; defaults to the configured connect and read timeouts
+        offset: Resume a partial file left by an interrupted download from this byte, with a Range
+            request; the download starts over if the partial file is shorter or the server ignores the range
+        validator: The ETag or Last-Modified date of the file the partial file was downloaded from, as
+            passed to `checkpoint`; it is sent as If-Range, so a file that has changed upstream since is
+            downloaded again from the start rather than spliced onto the old one. Without it, `offset`
+            is ignored.
+        checkpoint: Called every `CHECKPOINT_INTERVAL` bytes with the number of bytes flushed to the
+            partial file and the validator to resume it with
+        skip_unchanged: If `output_path` already exists, send a HEAD request first and skip the download
+            when the file has not changed since it was saved (see `RemoteFile.unchanged`)
+        md5: Also compute the MD5 of the file, e.g. to compare it with an S3 ETag
+        fsync: Flush the file to disk at every checkpoint and before it is renamed, and the rename
+            itself, so neither the file nor a checkpoint is lost if the machine crashes; a stream is
+            flushed to disk once the download has finished, and must be backed by a file
+        progress: Called when the transfer starts, at most every `PROGRESS_INTERVAL` seconds while
+            it runs, and once it has finished
+
+    Returns:
+        DownloadResult: The size and hashes of the file, whether it was downloaded, and how fast
+
+    Raises:
+        DownloadError: If the file could not be fetched
+        ValueError: If `offset` or `skip_unchanged` is given with a stream, or `fsync` with a stream
+            that is not backed by a file (e.g. a pipe or `io.BytesIO`)
+    """
+    start = time.perf_counter()
+    if not isinstance(output_path, str | os.PathLike):
+        if offset or skip_unchanged:
+            raise ValueError(_ERR_STREAM_OPTIONS)
+        fd = _stream_file(output_path) if fsync else None
+        return _download_to_stream(url, output_path, timeout, md5, progress, start, fd)
+
+    output_path = Path(output_path)
+    if skip_unchanged and (saved := _unchanged_file(url, output_path, timeout)) is not None:
+        return DownloadResult(
+            path=output_path,
+            downloaded=False,
+            size=output_path.stat().st_size,
+            sha256=saved.sha256,
+            md5=saved.md5,
+            elapsed=time.perf_counter() - start,
+        )
+
+    part = partial_path(output_path)
+    if offset and (validator is None or not part.exists() or part.stat().st_size < offset):
+        offset = 0
+
+    response = _get(url, timeout, offset, validator)
+    if response.status_code not in (206, 416):
+        offset = 0
+        validator = _validator(response.headers)
+    hashes = _hashes(md5)
+    size = _expected_size(response, offset)
+
+    try:
+        with response:
+            chunks = _chunks(response, url, offset, size, start, progress)
+            written = _write(chunks, part, offset, size, hashes, checkpoint, validator, fsync)
+    except requests.RequestException as e:
+        raise DownloadError(url) from e
+
+    os.replace(part, output_path)
+    if fsync:
+        _fsync_directory(output_path.parent)
+    remote = RemoteFile.from_headers(response.headers, size=written)
+    remote.sha256 = hashes[0].hexdigest()
+    remote.md5 = hashes[1].hexdigest() if md5 else None
+    if skip_unchanged:
+        remote.save(sidecar_path(output_path))
+    else:
+        # whatever an earlier download saved no longer describes the file
+        sidecar_path(output_path).unlink(missing_ok=True)
+
+    return DownloadResult(
+        path=output_path,
+        downloaded=True,
+        size=written,
+        sha256=remote.sha256,
+        md5=remote.md5,
+        received=written - offset,
+        elapsed=_record(url, response, written - offset, start),
+    )
+
+
+class DownloadResult(BaseModel):
+    """What a download did."""
+
+    path: Path | None = Field(description="Where the file was saved; None if it was written to a stream")
+    downloaded: bool = Field(description="False if nothing was transferred, e.g. the file was unchanged upstream")
+    size: int
+    sha256: str | None = Field(default=None, description="Hex digest; unknown for files kept from before hashing")
+    md5: str | None = None
+    received: int = Field(default=0, description="Bytes transferred, less than `size` if the download was resumed")
+    elapsed: float = Field(default=0.0, description="Seconds from the request to the finished file")
+
+    @property
+    def throughput(self) -> float:
+        """The average bytes per second received."""
+        return self.received / self.elapsed if self.elapsed > 0 else 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class DownloadProgress:
+    """How far a download has got, as passed to its progress callback.
+
+    Attributes:
+        done: Bytes in the file so far, including any part kept from an interrupted download
+        total: The size of the file, if the server sent it
+        received: Bytes received since the download started
+        elapsed: Seconds since the download started
     """
+
+    done: int
+    total: int | None
+    received: int
+    elapsed: float
+
+    @property
+    def rate(self) -> float:
+        """The average bytes per second received so far."""
+        return self.received / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> float | None:
+        """Seconds until the download is expected to finish, if its size and rate are known."""
+        if self.total is None or not (rate := self.rate):
+            return None
+        return max(self.total - self.done, 0) / rate
+
+
+class RemoteFile(BaseModel):
+    """What a server said about a file when it was downloaded, to tell later whether it has changed, and its hashes."""
+
+    etag: str | None = None
+    last_modified: str | None = None
+    size: int | None = None
+    sha256: str | None = None
+    md5: str | None = None
+
+    @classmethod
+    def from_headers(cls, headers: Mapping[str, str], size: int | None = None) -> "RemoteFile":
+        """Reads the validators of a response; `size` overrides its Content-Length, e.g. for a 206."""
+        if size is None and (length := headers.get("Content-Length", "")).isdigit():
+            size = int(length)
+        return cls(etag=headers.get("ETag"), last_modified=headers.get("Last-Modified"), size=size)
+
+    @classmethod
+    def load(cls, path: Path) -> "RemoteFile | None":
+        """Reads a sidecar file, or returns None if it is missing or unreadable."""
+        try:
+            return cls.model_validate_json(path.read_bytes())
+        except (OSError, ValueError):
+            return None
+
+    def save(self, path: Path) -> None:
+        path.write_text(self.model_dump_json(), encoding="utf-8")
+
+    def unchanged(self, current: "RemoteFile") -> bool:
+        """Whether the file the server describes now is the one described by this record.
+
+        The ETag, or the Last-Modified date when there is no ETag, must be known on both sides and
+        equal; sizes, where both are known, must be equal too. A size alone is never enough.
+        """
+        if self.etag and current.etag:
+            same = self.etag == current.etag
+        elif self.last_modified and current.last_modified:
+            same = self.last_modified == current.last_modified
+        else:
+            return False
+        return same and (self.size is None or current.size is None or self.size == current.size)
+
+
+def sidecar_path(output_path: Path) -> Path:
+    """Returns where the `RemoteFile` of a downloaded file is kept."""
+    return output_path.with_name(f".{output_path.name}.torah-dl.json")
+
+
+def _unchanged_file(url: str, output_path: Path, timeout: float | None) -> RemoteFile | None:
+    """Returns the saved `RemoteFile` of `output_path` if the file is there and unchanged upstream."""
+    if not output_path.is_file() or (saved := RemoteFile.load(sidecar_path(output_path))) is None:
+        return None
+    if saved.size is not None and saved.size != output_path.stat().st_size:
+        return None
     try:
-        response = requests.get(url, timeout=timeout)
+        response = http.head(url, timeout=timeout)
         response.raise_for_status()
+    except requests.RequestException:
+        return None
+    return saved if saved.unchanged(RemoteFile.from_headers(response.headers)) else None
+
+
+def _download_to_stream(
+    url: str,
+    stream: BinaryIO,
+    timeout: float | None,
+    md5: bool,
+    progress: Callable[[DownloadProgress], None] | None,
+    start: float,
+    fd: int | None,
+) -> DownloadResult:
+    """Writes a file to a stream as it arrives, and flushes it to disk through `fd`, if given."""
+    response = _get(url, timeout, 0, None)
+    hashes = _hashes(md5)
+    written = 0
+    try:
+        with response:
+            for chunk in _chunks(response, url, 0, _expected_size(response, 0), start, progress):
+                stream.write(chunk)
+                for digest in hashes:
+                    digest.update(chunk)
+                written += len(chunk)
+    except requests.RequestException as e:
+        raise DownloadError(url) from e
+    stream.flush()
+    if fd is not None:
+        os.fsync(fd)
+
+    return DownloadResult(
+        path=None,
+        downloaded=True,
+        size=written,
+        sha256=hashes[0].hexdigest(),
+        md5=hashes[1].hexdigest() if md5 else None,
+        received=written,
+        elapsed=_record(url, response, written, start),
+    )
+
+
+def _stream_file(stream: BinaryIO) -> int:
+    """Returns the file descriptor of a stream backed by a file, which can be flushed to disk."""
+    try:
+        fd = stream.fileno()
+    except (OSError, ValueError) as e:
+        raise ValueError(_ERR_STREAM_FSYNC) from e
+    if not stat.S_ISREG(os.fstat(fd).st_mode):
+        raise ValueError(_ERR_STREAM_FSYNC)
+    return fd
 
+
+def _get(url: str, timeout: float | None, offset: int, validator: str | None) -> requests.Response:
+    """Requests a file as a stream, from `offset` on if it is not 0.
+
+    A resumed request carries `validator` as If-Range, so a server answers with the whole file (a
+    200) if the file has changed. A 206 that names a different validator anyway, from a server that
+    ignores If-Range, restarts the download from the beginning.
+
+    A resumed download that already has every byte gets a 416 (Range Not Satisfiable) response,
+    which is returned as it is when its Content-Range confirms the file is `offset` bytes long;
+    any other 416 restarts the download from the beginning.
+    """
+    headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset and validator else None
+    try:
+        response = http.get(url, timeout=timeout, stream=True, headers=headers)
+        if headers and response.status_code in (206, 416):
+            if _resumes(response, offset, validator):
+                return response
+            response.close()
+            response = http.get(url, timeout=timeout, stream=True)
+        if not response.ok:
+            response.close()
+        response.raise_for_status()
     except requests.RequestException as e:
         raise DownloadError(url) from e
+    return response
+
+
+def _validator(headers: Mapping[str, str]) -> str | None:
+    """Returns what identifies the version of a file to resume it with: its strong ETag, or its Last-Modified date.
+
+    Weak ETags cannot be used with If-Range.
+    """
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+def _resumes(response: requests.Response, offset: int, validator: str | None) -> bool:
+    """Whether a 206 or 416 response continues the version of a file `validator` names from `offset`."""
+    current = _validator(response.headers)
+    if current is not None and current != validator:
+        return False
+    return response.status_code == 206 or response.headers.get("Content-Range", "") == f"bytes */{offset}"
+
+
+def _hashes(md5: bool) -> list["hashlib._Hash"]:
+    if md5:
+        return [hashlib.sha256(), hashlib.md5(usedforsecurity=False)]
+    return [hashlib.sha256()]
+
+
+def _expected_size(response: requests.Response, offset: int) -> int | None:
+    """Returns the size the file will have, if the server sent the length of an unencoded body."""
+    if response.status_code == 416:
+        return offset
+    length = response.headers.get("Content-Length", "")
+    identity = response.headers.get("Content-Encoding", "identity") == "identity"
+    return offset + int(length) if length.isdigit() and identity else None
+
+
+def _chunks(
+    response: requests.Response,
+    url: str,
+    offset: int,
+    size: int | None,
+    start: float,
+    progress: Callable[[DownloadProgress], None] | None,
+) -> Iterator[bytes]:
+    """Returns the chunks of a response, throttled to the bandwidth limits and reported to `progress`."""
+    # the body of a 416 (see `_get`) is an error page, not part of the file
+    body = iter(()) if response.status_code == 416 else response.iter_content(CHUNK_SIZE)
+    chunks = _throttled(body, urlparse(url).netloc)
+    return _reported(chunks, offset, size, start, progress) if progress else chunks
+
+
+def _record(url: str, response: requests.Response, received: int, start: float) -> float:
+    """Reports a finished download to observers, returning how long it took."""
+    elapsed = time.perf_counter() - start
+    record_download(
+        RequestTiming(
+            method="GET",
+            url=url,
+            host=urlparse(url).netloc,
+            status=response.status_code,
+            bytes_received=received,
+            latency=elapsed,
+        )
+    )
+    return elapsed
+
+
+def _throttled(chunks: Iterator[bytes], host: str) -> Iterator[bytes]:
+    """Passes chunks through, pausing after each one as long as the bandwidth limits require."""
+    for chunk in chunks:
+        yield chunk
+        BANDWIDTH.consume(host, len(chunk))
+
+
+def _reported(
+    chunks: Iterator[bytes],
+    offset: int,
+    total: int | None,
+    start: float,
+    progress: Callable[[DownloadProgress], None],
+) -> Iterator[bytes]:
+    """Passes chunks through, reporting progress when they start, every `PROGRESS_INTERVAL` and when they end."""
+    done = offset
+    reported = time.perf_counter()
+    progress(DownloadProgress(done, total, 0, reported - start))
+    for chunk in chunks:
+        yield chunk
+        done += len(chunk)
+        if (now := time.perf_counter()) - reported >= PROGRESS_INTERVAL:
+            progress(DownloadProgress(done, total, done - offset, now - start))
+            reported = now
+    progress(DownloadProgress(done, done, done - offset, time.perf_counter() - start))
+
+
+def _write(
+    chunks: Iterable[bytes],
+    part: Path,
+    offset: int,
+    size: int | None,
+    hashes: list["hashlib._Hash"],
+    checkpoint: Callable[[int, str | None], None] | None,
+    validator: str | None,
+    fsync: bool,
+) -> int:
+    """Writes chunks into the partial file from `offset`, hashing the kept bytes and then every chunk.
+
+    Checkpoints are passed `validator`, which identifies the version of the file being written.
+
+    Returns:
+        int: The size of the partial file
+    """
+    written = offset
+    with open(part, "r+b" if offset else "wb") as f:
+        while f.tell() < offset and (chunk := f.read(min(CHUNK_SIZE, offset - f.tell()))):
+            for digest in hashes:
+                digest.update(chunk)
+        f.seek(offset)
+        f.truncate()
+        if size is not None and size > offset:
+            _preallocate(f.fileno(), offset, size - offset)
+        unreported = 0
+        for chunk in chunks:
+            f.write(chunk)
+            for digest in hashes:
+                digest.update(chunk)
+            written += len(chunk)
+            unreported += len(chunk)
+            if checkpoint and unreported >= CHECKPOINT_INTERVAL:
+                f.flush()
+                if fsync:
+                    os.fsync(f.fileno())
+                checkpoint(written, validator)
+                unreported = 0
+        # drop whatever was preallocated but not sent
+        f.truncate()
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    return written
+
+
+def _preallocate(fd: int, offset: int, length: int) -> None:
+    """Reserves disk space for a file, where the platform and file system support it."""
+    if not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(fd, offset, length)
+    except OSError as e:
+        if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL, errno.ENOSYS):
+            raise
+
+
+def _fsync_directory(directory: Path) -> None:
+    """Flushes a directory's entries to disk, so a rename into it survives a crash (POSIX only)."""
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def partial_path(output_path: Path) -> Path:
+    """Returns where an unfinished download of `output_path` is kept."""
+    return output_path.with_name(output_path.name + ".part")
+
 
-    with open(output_path, "wb") as f:
-        _ = f.write(response.content)
+def output_name(extraction: Extraction) -> str:
+    """Returns a safe file name for an extraction, keeping the extension of its download URL."""
+    remote = PurePosixPath(urlparse(extraction.download_url).path)
+    name = _UNSAFE_CHARACTERS.sub("_", extraction.file_name or remote.name).strip("._") or "download"
+    if remote.suffix and not name.lower().endswith(remote.suffix.lower()):
+        name += remote.suffix
+    return name
@@ -16,6 +16,18 @@ class NetworkError(ExtractionError):
     pass
 
 
+class CircuitOpenError(NetworkError):
+    """Raised without contacting the site when an extractor's site has been failing repeatedly."""
+
+    pass
+
+
+class DeadlineExceededError(NetworkError):
+    """Raised when the time budget of an extraction runs out before it completes."""
+
+    pass
+
+
 class ContentExtractionError(ExtractionError):
     """Raised when required content cannot be extracted from the page."""
 
@@ -1,10 +1,18 @@
 import importlib
 import inspect
 import pkgutil
+import time
+from collections.abc import Iterator
 
 from . import extractors
+from .deadline import deadline as deadline_after
+from .deadline import remaining
 from .exceptions import ExtractorNotFoundError
+from .instrumentation import extractor_selected, record_cache, tracing
 from .models import Extraction, Extractor
+from .ratelimit import RATE_LIMITER
+from .retry import circuit_breaker
+from .singleflight import SingleFlight
 
 # Dynamically build EXTRACTORS list
 EXTRACTORS: list[Extractor] = []
@@ -14,14 +22,153 @@ for _, name, _ in pkgutil.iter_modules(extractors.__path__):
         # Check if it's a class and ends with 'Extractor' (excluding the base class if you have one)
         if inspect.isclass(object=obj) and issubclass(obj, Extractor) and obj is not Extractor:
             EXTRACTORS.append(obj())
+            for host, limit in obj.RATE_LIMITS.items():
+                RATE_LIMITER.configure(host, limit)
 
+_in_flight: SingleFlight[Extraction] = SingleFlight()
 
-def extract(url: str) -> Extraction:
-    """Extracts the download URL, title, and file format from a given URL."""
+
+def extract(
+    url: str,
+    *,
+    trace: bool = False,
+    deadline: float | None = None,
+    fetch_metadata: bool = True,
+    lazy: bool = False,
+) -> Extraction:
+    """Extracts the download URL, title, and file format from a given URL.
+
+    Every call is timed per phase and reported to the registered observers
+    (see `torah_dl.core.instrumentation`). Extractors whose site keeps failing are
+    short-circuited by a per-extractor circuit breaker (see `torah_dl.core.retry`).
+    Concurrent calls for the same item (by `Extractor.canonical_id`) share one extraction.
+
+    With `fetch_metadata=False`, extractors that can build the download URL from the URL alone
+    (`Extractor.DERIVES_DOWNLOAD_URL`) return it without making any request, and without a title;
+    other extractors extract as usual.
+
+    With `lazy=True` the extraction is returned as soon as the download URL is known; fields the
+    extractor deferred (see `Extraction.defer`) are fetched when first used.
+
+    Args:
+        url: The URL to extract from
+        trace: Attach the `ExtractionTrace` of this call to the returned extraction
+        deadline: Seconds the whole extraction may take, across all of its requests
+        fetch_metadata: Fetch the title and validate the download URL even when the URL alone is enough
+        lazy: Leave deferred fields unresolved until they are used
+
+    Returns:
+        Extraction: The extracted data
+
+    Raises:
+        ExtractorNotFoundError: If no extractor can handle the URL
+        CircuitOpenError: If the extractor's site has been failing and is not being contacted for now
+        DeadlineExceededError: If the deadline passed before the extraction completed
+    """
+    with tracing(url) as record, deadline_after(deadline):
+        start = time.perf_counter()
+        for extractor in EXTRACTORS:
+            if extractor.can_handle(url):
+                record.extractor = extractor.name
+                record.dispatch_time = time.perf_counter() - start
+                extractor_selected(record)
+
+                start = time.perf_counter()
+                if not fetch_metadata and extractor.DERIVES_DOWNLOAD_URL:
+                    try:
+                        derived = extractor.derive(url)
+                    finally:
+                        record.extract_time = time.perf_counter() - start
+                    if derived is not None:
+                        if trace:
+                            derived.trace = record
+                        return derived
+
+                try:
+                    extraction, shared = _in_flight.do(
+                        (extractor.name, extractor.canonical_id(url), lazy),
+                        lambda extractor=extractor: _run_extractor(extractor, url, resolve=not lazy),
+                        timeout=remaining(),
+                    )
+                finally:
+                    record.extract_time = time.perf_counter() - start
+
+                record_cache("extract_in_flight", hit=shared)
+                if shared:
+                    extraction = extraction.model_copy(update={"trace": None})
+                if trace:
+                    extraction.trace = record
+                return extraction
+
+        record.dispatch_time = time.perf_counter() - start
+        raise ExtractorNotFoundError(url)
+
+
+def _run_extractor(extractor: Extractor, url: str, resolve: bool) -> Extraction:
+    """Runs an extractor, and if asked resolves its deferred fields, behind its circuit breaker."""
+    breaker = circuit_breaker(extractor.name)
+    breaker.before_call()
+    try:
+        extraction = extractor.extract(url)
+        if resolve:
+            extraction.resolve()
+    except Exception as e:
+        breaker.record(e)
+        raise
+    breaker.record(None)
+    return extraction
+
+
+def extract_all(url: str) -> Iterator[Extraction]:
+    """Yields every item a series, speaker or feed URL points at; an item URL yields just that item.
+
+    Items are extracted only as they are consumed, so downloading can start after the first one.
+    An item URL is extracted with `extract`; fetching a listing is guarded by the same circuit
+    breaker. Only extractors with feeds (see `Extractor.feed_url`) list more than one item.
+
+    Args:
+        url: The URL to extract from
+
+    Returns:
+        Iterator[Extraction]: The extraction of each item
+
+    Raises:
+        ExtractorNotFoundError: If no extractor can handle the URL
+        CircuitOpenError: If the extractor's site has been failing and is not being contacted for now
+    """
+    return _extract_all(get_extractor(url), url)
+
+
+def _extract_all(extractor: Extractor, url: str) -> Iterator[Extraction]:
+    items = extractor.extract_all(url)
+    if items is None:
+        yield extract(url)
+        return
+
+    # the breaker covers fetching the listing up to its first item, not the caller's work between items
+    breaker = circuit_breaker(extractor.name)
+    breaker.before_call()
+    try:
+        first = next(items, None)
+    except Exception as e:
+        breaker.record(e)
+        raise
+    breaker.record(None)
+
+    if first is not None:
+        yield first
+        yield from items
+
+
+def get_extractor(url: str) -> Extractor:
+    """Returns the extractor that handles a given URL.
+
+    Raises:
+        ExtractorNotFoundError: If no extractor can handle the URL
+    """
     for extractor in EXTRACTORS:
         if extractor.can_handle(url):
-            return extractor.extract(url)
-
+            return extractor
     raise ExtractorNotFoundError(url)
 
 
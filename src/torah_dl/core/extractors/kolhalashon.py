@@ -4,8 +4,10 @@ from urllib.parse import parse_qs, urlparse
 
 import requests
 
+from .. import http
 from ..exceptions import DownloadURLError, NetworkError
 from ..models import Extraction, ExtractionExample, Extractor
+from ..ratelimit import RateLimit
 
 
 class KolHalashonExtractor(Extractor):
@@ -33,6 +35,11 @@ class KolHalashonExtractor(Extractor):
         ),
     ]
 
+    # kolhalashon.com blocks clients that send bursts of requests
+    RATE_LIMITS = {"kolhalashon.com": RateLimit(rate=2, burst=4)}  # noqa: RUF012
+
+    DERIVES_DOWNLOAD_URL = True
+
     URL_PATTERN = re.compile(r"https?://(?:www\.)?kolhalashon\.com/")
     FILE_ID_PATTERN = re.compile(r"(?<!\d)(\d{6,8})(?!\d)")
     PLAY_SHIUR_PATTERN = re.compile(r"/playShiur/(\d{1,8})(?:/|$)", re.IGNORECASE)
@@ -58,6 +65,11 @@ class KolHalashonExtractor(Extractor):
 
         return None
 
+    def canonical_id(self, url: str) -> str:
+        if file_id := self._extract_file_id(url):
+            return f"kolhalashon:{file_id.zfill(8)}"
+        return super().canonical_id(url)
+
     def _build_download_url(self, file_id: str) -> str:
         # regularSite/playShiur URLs can use short numeric ids; the media path uses an 8-digit zero-padded id.
         normalized_id = file_id.zfill(8)
@@ -86,9 +98,8 @@ class KolHalashonExtractor(Extractor):
     def _extract_title_from_id3(self, download_url: str) -> str | None:
         """Extract title from mp3 ID3 metadata (TIT2 frame)."""
         try:
-            response = requests.get(
+            response = http.get(
                 download_url,
-                timeout=20,
                 headers={"User-Agent": "torah-dl/1.0", "Range": "bytes=0-131071"},
             )
             response.raise_for_status()
@@ -130,16 +141,23 @@ class KolHalashonExtractor(Extractor):
 
         return None
 
-    def extract(self, url: str) -> Extraction:
+    def derive(self, url: str) -> Extraction:
         if not (file_id := self._extract_file_id(url)):
             raise DownloadURLError()
 
-        download_url = self._build_download_url(file_id)
+        return Extraction(
+            download_url=self._build_download_url(file_id),
+            file_format="audio/mp3",
+            file_name=f"{file_id.zfill(8)}.mp3",
+        )
+
+    def extract(self, url: str) -> Extraction:
+        extraction = self.derive(url)
+        download_url = extraction.download_url
 
         try:
-            response = requests.head(
+            response = http.head(
                 download_url,
-                timeout=20,
                 headers={"User-Agent": "torah-dl/1.0"},
                 allow_redirects=True,
             )
@@ -150,12 +168,9 @@ class KolHalashonExtractor(Extractor):
         if "audio/" not in response.headers.get("content-type", "").lower():
             raise DownloadURLError()
 
-        normalized_id = file_id.zfill(8)
-        title = self._extract_title_from_id3(download_url) or f"Shiur {normalized_id}"
+        if (content_length := response.headers.get("content-length", "")).isdigit():
+            extraction.size = int(content_length)
 
-        return Extraction(
-            download_url=download_url,
-            title=title,
-            file_format="audio/mp3",
-            file_name=f"{normalized_id}.mp3",
-        )
+        # The title needs a second, ranged request for the ID3 tag, so it waits until it is used
+        normalized_id = extraction.file_name.removesuffix(".mp3")
+        return extraction.defer(title=lambda: self._extract_title_from_id3(download_url) or f"Shiur {normalized_id}")
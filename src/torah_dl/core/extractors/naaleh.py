@@ -7,6 +7,7 @@ import requests
 from bs4 import BeautifulSoup, Tag
 from typing_extensions import override
 
+from .. import http
 from ..exceptions import DownloadURLError, NetworkError
 from ..models import Extraction, ExtractionExample, Extractor
 
@@ -74,7 +75,7 @@ class NaalehExtractor(Extractor):
             raise DownloadURLError()
 
         try:
-            response = requests.get(url, timeout=30, headers={"User-Agent": "torah-dl/1.0"})
+            response = http.get(url, headers={"User-Agent": "torah-dl/1.0"})
             response.raise_for_status()
         except requests.RequestException as e:
             raise NetworkError(str(e)) from e
@@ -5,6 +5,7 @@ from typing import ClassVar
 import requests
 from bs4 import BeautifulSoup, Tag
 
+from .. import http
 from ..exceptions import DownloadURLError, NetworkError
 from ..models import Extraction, ExtractionExample, Extractor
 
@@ -53,7 +54,7 @@ class NishmatExtractor(Extractor):
 
     def extract(self, url: str) -> Extraction:
         try:
-            response = requests.get(url, timeout=30, headers={"User-Agent": "torah-dl/1.0"})
+            response = http.get(url, headers={"User-Agent": "torah-dl/1.0"})
             response.raise_for_status()
         except requests.RequestException as e:
             raise NetworkError(str(e)) from e
@@ -2,11 +2,9 @@ import re
 from re import Pattern
 from urllib.parse import parse_qs, urlparse
 
-import requests
-from bs4 import BeautifulSoup
-
-from ..exceptions import ContentExtractionError, DownloadURLError, NetworkError
+from ..exceptions import ContentExtractionError
 from ..models import Extraction, ExtractionExample, Extractor
+from .yutorah import resolve_classic_lecture
 
 
 class OraytaExtractor(Extractor):
@@ -72,26 +70,22 @@ class OraytaExtractor(Extractor):
             requests.RequestException: If there are network-related issues
         """
         shiur_id, shiur_title = self._extract_shiur_info(url)
-        yutorah_url = self._construct_classic_yutorah_url(shiur_id, shiur_title)
-
-        try:
-            response = requests.get(yutorah_url, timeout=30, headers={"User-Agent": "torah-dl/1.0"})
-            response.raise_for_status()
-        except requests.RequestException as e:
-            raise NetworkError(str(e)) from e  # pragma: no cover
-
-        # classic.yutorah pages still expose the direct mp3 URL in html
-        mp3_match = re.search(r"https?://[^\"'\s>]+\.mp3(?:\?[^\"'\s<]*)?", response.text, re.IGNORECASE)
-        if not mp3_match:
-            raise DownloadURLError()
-
-        download_url = mp3_match.group(0)
-        file_name = download_url.split("/")[-1].split("?")[0]
-        title = self._extract_title(response.text, shiur_title)
+
+        # Orayta shiurim are hosted on YUTorah, so resolve them through the shared YUTorah path
+        lecture = resolve_classic_lecture(shiur_id)
+
+        # Fallback to the Orayta URL slug if title parsing changes upstream
+        title = lecture.title or shiur_title.replace("-", " ").strip()
         if not title:
             raise ContentExtractionError()
 
-        return Extraction(download_url=download_url, title=title, file_format="audio/mp3", file_name=file_name)
+        return Extraction(
+            download_url=lecture.download_url, title=title, file_format="audio/mp3", file_name=lecture.file_name
+        )
+
+    def canonical_id(self, url: str) -> str:
+        shiur_id = parse_qs(urlparse(url).query).get("shiurID", [None])[0]
+        return f"yutorah:{shiur_id}" if shiur_id else super().canonical_id(url)
 
     def _extract_shiur_info(self, url: str) -> tuple[str, str]:
         """Extract shiurID and shiurTitle from the Orayta URL.
@@ -115,31 +109,3 @@ class OraytaExtractor(Extractor):
             raise ContentExtractionError()
 
         return shiur_id, shiur_title
-
-    def _construct_classic_yutorah_url(self, shiur_id: str, shiur_title: str) -> str:
-        """Construct the classic YUTorah iframe URL.
-
-        Args:
-            shiur_id: The shiur ID
-            shiur_title: The shiur title
-
-        Returns:
-            str: The classic YUTorah URL
-        """
-        title_slug = shiur_title.lower().replace(" ", "-")
-        return f"https://classic.yutorah.org/lectures/lecture_iframe.cfm/{shiur_id}/{title_slug}"
-
-    def _extract_title(self, html: str, fallback_title: str) -> str:
-        """Extract title from the classic YUTorah page title."""
-        soup = BeautifulSoup(html, "html.parser")
-        page_title = soup.title.get_text(strip=True) if soup.title else ""
-
-        # Example: "YUTorah Online - Reuven, Yehudah, and the Quest for Leadership (Rabbi Yitzchak Blau)"
-        if page_title.startswith("YUTorah Online - "):
-            title = page_title.replace("YUTorah Online - ", "", 1)
-            title = re.sub(r"\s+\(Rabbi.*\)$", "", title).strip()
-            if title:
-                return title
-
-        # Fallback to the Orayta URL slug if title parsing changes upstream
-        return fallback_title.replace("-", " ").strip()
@@ -5,6 +5,7 @@ from re import Pattern
 import requests
 from bs4 import BeautifulSoup
 
+from .. import http
 from ..exceptions import ContentExtractionError, DownloadURLError, NetworkError
 from ..models import Extraction, ExtractionExample, Extractor
 
@@ -68,7 +69,7 @@ class OutorahExtractor(Extractor):
             requests.RequestException: If there are network-related issues
         """
         try:
-            response = requests.get(url, timeout=30, headers={"User-Agent": "torah-dl/1.0"})
+            response = http.get(url, headers={"User-Agent": "torah-dl/1.0"})
             response.raise_for_status()
         except requests.RequestException as e:
             raise NetworkError(str(e)) from e  # pragma: no cover
@@ -3,6 +3,7 @@ from re import Pattern
 
 import requests
 
+from .. import http
 from ..exceptions import ContentExtractionError, DownloadURLError, NetworkError, TitleExtractionError
 from ..models import Extraction, ExtractionExample, Extractor
 
@@ -75,7 +76,7 @@ class TorahAnytimeExtractor(Extractor):
             requests.RequestException: If there are network-related issues
         """
         try:
-            response = requests.get(url, timeout=30, headers={"User-Agent": "torah-dl/1.0"})
+            response = http.get(url, headers={"User-Agent": "torah-dl/1.0"})
             response.raise_for_status()
         except (requests.RequestException, requests.HTTPError) as e:
             raise NetworkError(str(e)) from e  # pragma: no cover
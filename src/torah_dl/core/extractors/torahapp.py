@@ -2,14 +2,18 @@ import re
 
 # nosemgrep: python.lang.security.use-defused-xml.use-defused-xml
 import xml.etree.ElementTree as ET  # noqa: S405
+from collections.abc import Iterable, Iterator
+from contextlib import closing
 from re import Pattern
-from urllib.parse import ParseResult, unquote, urlparse
+from urllib.parse import ParseResult, quote, unquote, urlparse
 
 import defusedxml.ElementTree as DET
 import requests
 
-from ..exceptions import ContentExtractionError
-from ..models import Extraction, ExtractionExample, Extractor
+from .. import http
+from ..exceptions import ContentExtractionError, NetworkError
+from ..instrumentation import record_cache
+from ..models import FEED_CHUNK_SIZE, Extraction, ExtractionExample, Extractor
 
 
 class TorahAppExtractor(Extractor):
@@ -97,7 +101,7 @@ class TorahAppExtractor(Extractor):
 
         Raises:
             ValueError: If the URL is invalid or content cannot be extracted
-            requests.RequestException: If there are network-related issues
+            NetworkError: If there are network-related issues
         """
         self._get_podcast_metadata()
         parsed = urlparse(url)
@@ -106,10 +110,42 @@ class TorahAppExtractor(Extractor):
         episode_id = self._get_value(parsed, self.EPISODE_ID_PATTERN, self.EPISODE_ID_GET_PATTERN)
 
         rss = self.podcasts_to_rss[podcast_id]
-        root = self._get_xml_file(rss)
-        result = self._get_download_link(root, episode_id)
+        with closing(self._get_feed(rss)) as items:
+            return self._get_download_link(items, episode_id)
 
-        return result
+    def extract_all(self, url: str) -> Iterator[Extraction] | None:
+        """List every episode of a podcast; an episode link points at a single item."""
+        parsed = urlparse(url)
+        if self.EPISODE_ID_PATTERN.search(parsed.path) or self.EPISODE_ID_GET_PATTERN.search(parsed.query):
+            return None
+        return super().extract_all(url)
+
+    def feed_url(self, url: str) -> str:
+        """Return the RSS feed of the podcast a torahapp.org URL belongs to.
+
+        Raises:
+            NetworkError: If the list of podcasts cannot be fetched
+            NoIDFoundError: If the URL does not name a known podcast
+        """
+        self._get_podcast_metadata()
+        podcast_id = self._get_value(urlparse(url), self.PODCAST_ID_PATTERN, self.PODCAST_ID_GET_PATTERN)
+        if podcast_id not in self.podcasts_to_rss:
+            raise NoIDFoundError(url)
+        return self.podcasts_to_rss[podcast_id]
+
+    def parse_feed(self, content: Iterable[bytes], url: str) -> Iterator[tuple[str, Extraction]]:
+        """List the episodes of a podcast feed, with a share URL for each.
+
+        Items without a download link or title are skipped.
+        """
+        podcast_id = self._get_value(urlparse(url), self.PODCAST_ID_PATTERN, self.PODCAST_ID_GET_PATTERN)
+        for item in self._feed_items(content):
+            try:
+                extraction = self._item_extraction(item)
+            except NoDownloadURLFoundError:
+                continue
+            guid = item.find("guid").text
+            yield f"https://torahapp.org/share/p/{podcast_id}?e={quote(guid, safe='')}", extraction
 
     # get 'e' or 'p' value from parsed url
     # Example: https://torahapp.org/share/p/YU_80714_all/e/yu:1021736
@@ -129,44 +165,92 @@ class TorahAppExtractor(Extractor):
         return str(results.pop()).strip()
 
     def _get_podcast_metadata(self):
+        record_cache("torahapp_podcasts", hit=bool(self.podcasts_to_rss))
         if self.podcasts_to_rss:
             return
 
-        response = requests.get("https://feeds.thetorahapp.org/data/podcasts_metadata.min.json", timeout=30)
-        response.raise_for_status()
+        try:
+            response = http.get("https://feeds.thetorahapp.org/data/podcasts_metadata.min.json")
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise NetworkError(str(e)) from e
         data = response.json()
 
         self.podcasts_to_rss = {x["pId"]: x["u"] for x in data["podcasts"]}
 
-    def _get_xml_file(self, rss_url: str) -> ET.Element:
-        response = requests.get(str(rss_url), timeout=30)
-        response.raise_for_status()
-        html = response.text.replace("&feature=youtu.be</guid>", "</guid>")
-        root = DET.fromstring(html)
-        return root
-
-    def _get_download_link(self, root: ET.Element, episode_id: str) -> Extraction:
-        items = root.findall("channel/item")
+    def _get_feed(self, rss_url: str) -> Iterator[ET.Element]:
+        try:
+            response = http.get(str(rss_url), stream=True)
+        except requests.RequestException as e:
+            raise NetworkError(str(e)) from e
+
+        with response:
+            try:
+                response.raise_for_status()
+                yield from self._feed_items(response.iter_content(FEED_CHUNK_SIZE))
+            except requests.RequestException as e:
+                raise NetworkError(str(e)) from e
+
+    def _feed_items(self, chunks: Iterable[bytes]) -> Iterator[ET.Element]:
+        path = []
+        for event, element in DET.iterparse(_FeedReader(chunks), events=("start", "end")):
+            if event == "start":
+                path.append(element)
+                continue
+            path.pop()
+            if element.tag == "item" and len(path) == 2 and path[1].tag == "channel":
+                yield element
+                # items are dropped once listed, so a feed of any length is parsed in constant memory
+                path[1].remove(element)
+
+    def _get_download_link(self, items: Iterable[ET.Element], episode_id: str) -> Extraction:
         for item in items:
             guid = item.find("guid").text
             if guid == episode_id:
-                enclosure = item.find("enclosure")
-                # ex. http://outorah.org/p/81351 => http:__outorah.org_p_81351
-                file_name = guid.replace("/", "_")
-                download_url = enclosure.get("url")
-                episode_title = item.find("title").text
-                # use this to determine if mp3 or whatever file type
-                file_format = enclosure.get("type")
-                if file_format != "audio/mp3":
-                    file_format = f"audio/{download_url.split('.')[-1]}"
-
-                if not download_url or not episode_title:
-                    raise NoDownloadURLFoundError(episode_id)
-                return Extraction(
-                    download_url=download_url, title=episode_title, file_format=file_format, file_name=file_name
-                )
+                return self._item_extraction(item)
         raise GUIDNotFoundError(episode_id)
 
+    def _item_extraction(self, item: ET.Element) -> Extraction:
+        guid = item.find("guid").text
+        enclosure = item.find("enclosure")
+        # ex. http://outorah.org/p/81351 => http:__outorah.org_p_81351
+        file_name = guid.replace("/", "_")
+        download_url = enclosure.get("url") if enclosure is not None else None
+        title_element = item.find("title")
+        episode_title = title_element.text if title_element is not None else None
+
+        if not download_url or not episode_title:
+            raise NoDownloadURLFoundError(guid)
+
+        # use this to determine if mp3 or whatever file type
+        file_format = enclosure.get("type")
+        if file_format != "audio/mp3":
+            file_format = f"audio/{download_url.split('.')[-1]}"
+
+        return Extraction(download_url=download_url, title=episode_title, file_format=file_format, file_name=file_name)
+
+
+class _FeedReader:
+    """A file-like view of a feed's body chunks, fixing the guids some feeds end with an unescaped YouTube suffix."""
+
+    BROKEN_GUID_END = b"&feature=youtu.be</guid>"
+    GUID_END = b"</guid>"
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._tail = b""
+
+    def read(self, size: int = -1) -> bytes:
+        keep = len(self.BROKEN_GUID_END) - 1
+        for chunk in self._chunks:
+            data = (self._tail + chunk).replace(self.BROKEN_GUID_END, self.GUID_END)
+            # a broken guid can be split between chunks, so the end waits for the next chunk
+            data, self._tail = data[:-keep], data[-keep:]
+            if data:
+                return data
+        data, self._tail = self._tail, b""
+        return data
+
 
 class GUIDNotFoundError(ContentExtractionError):
     def __init__(self, episode_id: str):
@@ -4,6 +4,7 @@ from re import Pattern
 import requests
 from bs4 import BeautifulSoup
 
+from .. import http
 from ..exceptions import DownloadURLError
 from ..models import Extraction, ExtractionExample, Extractor
 
@@ -45,6 +46,8 @@ class TorahMediaAmericaExtractor(Extractor):
         ),
     ]
 
+    DERIVES_DOWNLOAD_URL = True
+
     # URL pattern for TorahMediaAmerica.com pages
     URL_PATTERN = re.compile(r"https?://(?:www\.)?torahmediaamerica\.com/shiur-([\w-]+)\.html")
 
@@ -57,8 +60,13 @@ class TorahMediaAmericaExtractor(Extractor):
         match = self.URL_PATTERN.search(url)
         return bool(match)
 
-    def extract(self, url: str) -> Extraction:
-        """Extract download URL and title from a TorahMediaAmerica.com page."""
+    def canonical_id(self, url: str) -> str:
+        if (match := self.URL_PATTERN.search(url)) and match.group(1).isdigit():
+            return f"torahmediaamerica:{match.group(1)}"
+        return super().canonical_id(url)
+
+    def derive(self, url: str) -> Extraction:
+        """Build the download URL from the numeric ID in a TorahMediaAmerica.com URL."""
         match = self.URL_PATTERN.search(url)
         if not match:
             raise DownloadURLError()
@@ -66,12 +74,24 @@ class TorahMediaAmericaExtractor(Extractor):
         # Only allow numeric IDs for extraction
         if not shiur_id.isdigit():
             raise DownloadURLError()
-        download_url = f"https://torahcdn.net/tdn/{shiur_id}.mp3"
-        file_name = f"{shiur_id}.mp3"
+        return Extraction(
+            download_url=f"https://torahcdn.net/tdn/{shiur_id}.mp3",
+            file_format="audio/mp3",
+            file_name=f"{shiur_id}.mp3",
+        )
 
+    def extract(self, url: str) -> Extraction:
+        """Extract download URL and title from a TorahMediaAmerica.com page.
+
+        The download URL comes from the URL itself; the page is only fetched for the title,
+        when it is first used.
+        """
+        return self.derive(url).defer(title=lambda: self._fetch_title(url))
+
+    def _fetch_title(self, url: str) -> str:
         # Fetch the page and extract the title
         try:
-            response = requests.get(url, timeout=30, headers={"User-Agent": "torah-dl/1.0"})
+            response = http.get(url, headers={"User-Agent": "torah-dl/1.0"})
             response.raise_for_status()
         except requests.RequestException as e:
             raise DownloadURLError(str(e)) from e
@@ -91,6 +111,4 @@ class TorahMediaAmericaExtractor(Extractor):
             if (div_title := soup.find("div", class_="title")) and div_title.get_text(strip=True):
                 title = div_title.get_text(strip=True)
 
-        title = "" if not title else title.split(" - ")[0].strip()
-
-        return Extraction(download_url=download_url, title=title, file_format="audio/mp3", file_name=file_name)
+        return "" if not title else title.split(" - ")[0].strip()
@@ -4,10 +4,87 @@ from urllib.parse import parse_qs, urlparse
 
 import requests
 from bs4 import BeautifulSoup
+from pydantic import BaseModel
 
+from .. import http
+from ..cache import TTLCache
 from ..exceptions import ContentExtractionError, DownloadURLError, NetworkError
 from ..models import Extraction, ExtractionExample, Extractor
 
+CLASSIC_LECTURE_URL = "https://classic.yutorah.org/lectures/lecture_iframe.cfm/{shiur_id}"
+DOWNLOAD_URL_PATTERN = re.compile(r"https?://[^\"'\s>]+\.mp3(?:\?[^\"'\s<]*)?", re.IGNORECASE)
+
+
+class ClassicLecture(BaseModel):
+    """What the classic YUTorah lecture page says about a shiur."""
+
+    shiur_id: str
+    download_url: str
+    file_name: str
+    title: str | None = None
+
+
+_classic_lectures: TTLCache[ClassicLecture] = TTLCache("yutorah_classic", maxsize=4096, ttl=3600)
+
+
+def resolve_classic_lecture(shiur_id: str, *, strip_trailing_dash: bool = False) -> ClassicLecture:
+    """Fetch and parse the classic YUTorah lecture page of a shiur.
+
+    This is the single YUTorah resolution path shared by every extractor whose content is hosted
+    on YUTorah (YUTorah itself and Orayta), so they share its cache and in-flight fetches.
+
+    Args:
+        shiur_id: The numeric YUTorah shiur ID
+        strip_trailing_dash: Turn "-.mp3" in the download URL into ".mp3", as the YUTorah extractor
+            always has; the cached lecture keeps the URL as found on the page
+
+    Returns:
+        ClassicLecture: The download URL, file name and (if the page has one) title of the shiur
+
+    Raises:
+        NetworkError: If the page cannot be fetched
+        DownloadURLError: If the page does not contain an MP3 link
+    """
+    if not (lecture := _classic_lectures.get(shiur_id)):
+        lecture = _fetch_classic_lecture(shiur_id)
+        _classic_lectures.set(shiur_id, lecture)
+
+    if strip_trailing_dash and "-.mp3" in lecture.download_url:
+        download_url = lecture.download_url.replace("-.mp3", ".mp3")
+        file_name = download_url.split("/")[-1].split("?")[0]
+        return lecture.model_copy(update={"download_url": download_url, "file_name": file_name})
+    return lecture
+
+
+def _fetch_classic_lecture(shiur_id: str) -> ClassicLecture:
+    try:
+        response = http.get(CLASSIC_LECTURE_URL.format(shiur_id=shiur_id), headers={"User-Agent": "torah-dl/1.0"})
+        response.raise_for_status()
+    except requests.RequestException as e:
+        raise NetworkError(str(e)) from e  # pragma: no cover
+
+    if not (match := DOWNLOAD_URL_PATTERN.search(response.text)):
+        raise DownloadURLError()
+
+    download_url = match.group(0)
+    return ClassicLecture(
+        shiur_id=shiur_id,
+        download_url=download_url,
+        file_name=download_url.split("/")[-1].split("?")[0],
+        title=_extract_classic_title(response.text),
+    )
+
+
+def _extract_classic_title(html: str) -> str | None:
+    # Example: "YUTorah Online - Reuven, Yehudah, and the Quest for Leadership (Rabbi Yitzchak Blau)"
+    soup = BeautifulSoup(html, "html.parser")
+    page_title = soup.title.get_text(strip=True) if soup.title else ""
+    if page_title.startswith("YUTorah Online - "):
+        title = page_title.replace("YUTorah Online - ", "", 1)
+        title = re.sub(r"\s+\(Rabbi.*\)$", "", title).strip()
+        return title or None
+    return None
+
 
 class YutorahExtractor(Extractor):
     """Extract audio content from YUTorah.org.
@@ -65,7 +142,6 @@ class YutorahExtractor(Extractor):
     # URL pattern for YUTorah.org pages
     URL_PATTERN = re.compile(r"https?://(?:www\.)?yutorah\.org/")
 
-    DOWNLOAD_URL_PATTERN = re.compile(r"https?://[^\"'\s>]+\.mp3(?:\?[^\"'\s<]*)?", re.IGNORECASE)
     SHIUR_ID_PATTERN = re.compile(r"/(?:lectures|sidebar/lecturedata)/(?:details\?shiurid=)?(\d+)")
 
     @property
@@ -94,23 +170,18 @@ class YutorahExtractor(Extractor):
         if not shiur_id:
             raise ContentExtractionError()
 
-        classic_url = f"https://classic.yutorah.org/lectures/lecture_iframe.cfm/{shiur_id}"
-        try:
-            response = requests.get(classic_url, timeout=30, headers={"User-Agent": "torah-dl/1.0"})
-            response.raise_for_status()
-        except requests.RequestException as e:
-            raise NetworkError(str(e)) from e  # pragma: no cover
-
-        if not (match := self.DOWNLOAD_URL_PATTERN.search(response.text)):
-            raise DownloadURLError()
-
-        download_url = match.group(0).replace("-.mp3", ".mp3")
-        file_name = download_url.split("/")[-1].split("?")[0]
-        title = self._extract_title(response.text)
-        if not title:
+        lecture = resolve_classic_lecture(shiur_id, strip_trailing_dash=True)
+        if not lecture.title:
             raise ContentExtractionError()
 
-        return Extraction(download_url=download_url, title=title, file_format="audio/mp3", file_name=file_name)
+        return Extraction(
+            download_url=lecture.download_url, title=lecture.title, file_format="audio/mp3", file_name=lecture.file_name
+        )
+
+    def canonical_id(self, url: str) -> str:
+        if shiur_id := self._extract_shiur_id(url):
+            return f"yutorah:{shiur_id}"
+        return super().canonical_id(url)
 
     def _extract_shiur_id(self, url: str) -> str | None:
         query = parse_qs(urlparse(url).query)
@@ -125,12 +196,3 @@ class YutorahExtractor(Extractor):
         if match := self.SHIUR_ID_PATTERN.search(url):
             return match.group(1)
         return None
-
-    def _extract_title(self, html: str) -> str | None:
-        soup = BeautifulSoup(html, "html.parser")
-        page_title = soup.title.get_text(strip=True) if soup.title else ""
-        if page_title.startswith("YUTorah Online - "):
-            title = page_title.replace("YUTorah Online - ", "", 1)
-            title = re.sub(r"\s+\(Rabbi.*\)$", "", title).strip()
-            return title or None
-        return None
@@ -0,0 +1,202 @@
+import threading
+import time
+import weakref
+from collections.abc import Iterator
+from typing import Any
+from urllib.parse import urlparse
+
+import requests
+
+from .concurrency import CONCURRENCY, AIMDLimiter
+from .deadline import remaining, request_timeout
+from .exceptions import DeadlineExceededError
+from .instrumentation import RequestTiming, record_backoff, record_cache, record_request, request_started
+from .ratelimit import RATE_LIMITER
+from .retry import RetryPolicy, get_retry_policy, is_transient
+from .singleflight import SingleFlight
+from .transport import get_transport
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+_in_flight: SingleFlight[requests.Response] = SingleFlight()
+
+# The arguments of GETs that can share a fetch; any other argument, e.g. `params` or `stream`, makes a GET its own
+_COALESCED_ARGUMENTS = frozenset({"headers", "timeout"})
+
+
+def request(method: str, url: str, retry: RetryPolicy | None = None, **kwargs: Any) -> requests.Response:
+    """Sends an HTTP request through the active transport, reporting its timing to any observers.
+
+    Each attempt first waits for the per-host rate limiter and then for a slot from the host's
+    adaptive concurrency limit, so every request path shares one politeness schedule. A streamed
+    response keeps its slot until its body has been read or it is closed.
+    Idempotent requests that fail transiently are retried with exponential backoff and jitter;
+    once the attempts run out the last response is returned or the last error raised.
+
+    Unless a `timeout` is given, the configured connect and read timeouts are used. Either way they
+    are capped by the current deadline (see `torah_dl.core.deadline`), and no retry is scheduled past it.
+
+    Concurrent GETs that are not streamed share a single fetch if they are identical: the same URL,
+    headers, timeout and retry policy, and no other arguments.
+
+    Args:
+        method: The HTTP method, e.g. "GET" or "HEAD"
+        url: The URL to request
+        retry: The retry policy for this request; defaults to the global policy
+        **kwargs: Keyword arguments accepted by `requests.Session.request`
+
+    Returns:
+        requests.Response: The response to the request
+    """
+    if method.upper() != "GET" or (key := _flight_key(url, retry, kwargs)) is None:
+        return _request(method, url, retry, **kwargs)
+
+    response, shared = _in_flight.do(key, lambda: _request(method, url, retry, **kwargs), timeout=remaining())
+    record_cache("http_in_flight", hit=shared)
+    return response
+
+
+def _flight_key(url: str, retry: RetryPolicy | None, kwargs: dict[str, Any]) -> tuple | None:
+    """Returns what identifies a GET among those in flight, or None if it takes arguments that are not compared."""
+    if not kwargs.keys() <= _COALESCED_ARGUMENTS:
+        return None
+    headers = tuple(sorted((name.lower(), value) for name, value in (kwargs.get("headers") or {}).items()))
+    timeout = kwargs.get("timeout")
+    return (url, headers, tuple(timeout) if isinstance(timeout, list) else timeout, retry and retry.model_dump_json())
+
+
+def _request(method: str, url: str, retry: RetryPolicy | None, **kwargs: Any) -> requests.Response:
+    """Sends a request, retrying transient failures."""
+    policy = retry or get_retry_policy()
+    attempts = policy.max_attempts if method.upper() in IDEMPOTENT_METHODS else 1
+    for attempt in range(attempts - 1):
+        try:
+            response = _send(method, url, **kwargs)
+        except requests.RequestException as e:
+            if not is_transient(e) or not _wait_before_retry(policy.delay(attempt)):
+                raise
+            continue
+
+        if not is_transient(status=response.status_code) or not _wait_before_retry(
+            policy.delay(attempt, response.headers.get("Retry-After"))
+        ):
+            return response
+        response.close()
+
+    return _send(method, url, **kwargs)
+
+
+def _wait_before_retry(delay: float) -> bool:
+    """Sleeps before a retry, unless the retry could not start before the deadline."""
+    left = remaining()
+    if left is not None and delay >= left:
+        return False
+    time.sleep(delay)
+    record_backoff(delay)
+    return True
+
+
+def _send(method: str, url: str, **kwargs: Any) -> requests.Response:
+    """Sends a single attempt of a request."""
+    host = urlparse(url).netloc
+    queued = RATE_LIMITER.acquire(host, timeout=remaining())
+    limiter = CONCURRENCY.limiter(host)
+    queued += limiter.acquire(timeout=remaining())
+    try:
+        kwargs["timeout"] = request_timeout(kwargs.get("timeout"))
+    except DeadlineExceededError:
+        limiter.cancel()
+        raise
+    timing = RequestTiming(method=method.upper(), url=url, host=host, latency=0.0, queued=queued)
+    request_started(timing)
+    start = time.perf_counter()
+    try:
+        response = get_transport().send(method, url, **kwargs)
+    except Exception as e:
+        timing.latency = time.perf_counter() - start
+        timing.error = type(e).__name__
+        limiter.release(timing.latency, overloaded=isinstance(e, requests.Timeout))
+        record_request(timing)
+        left = remaining()
+        if isinstance(e, requests.Timeout) and left is not None and left <= 0:
+            raise DeadlineExceededError() from e
+        raise
+
+    timing.latency = time.perf_counter() - start
+    timing.status = response.status_code
+    # streamed bodies have not been read yet, so fall back to the advertised size
+    if kwargs.get("stream"):
+        timing.bytes_received = int(response.headers.get("Content-Length") or 0)
+        _hold_slot(response, limiter, start)
+        if (left := remaining()) is not None:
+            _bound_body(response, time.monotonic() + left)
+    else:
+        limiter.release(timing.latency, overloaded=is_overloaded(response.status_code))
+        timing.bytes_received = len(response.content)
+    record_request(timing)
+    return response
+
+
+def _hold_slot(response: requests.Response, limiter: AIMDLimiter, start: float) -> None:
+    """Keeps the concurrency slot of a streamed response until its body has been read or it is closed.
+
+    The body is still being transferred when the response is returned, so only then is the request
+    done with the host, and only then is its latency known.
+    """
+    once = threading.Lock()
+    overloaded = is_overloaded(response.status_code)
+
+    def release() -> None:
+        if once.acquire(blocking=False):
+            limiter.release(time.perf_counter() - start, overloaded=overloaded)
+
+    # the wrappers only hold a weak reference, so a response that is dropped without being read or
+    # closed is collected at once, and gives its slot back then
+    cls, ref = type(response), weakref.ref(response)
+
+    def close_and_release() -> None:
+        try:
+            cls.close(ref())
+        finally:
+            release()
+
+    def iter_content_and_release(*args: Any, **kwargs: Any) -> Iterator[Any]:
+        yield from cls.iter_content(ref(), *args, **kwargs)
+        release()
+
+    response.close = close_and_release
+    response.iter_content = iter_content_and_release
+    weakref.finalize(response, release)
+
+
+def _bound_body(response: requests.Response, expires: float) -> None:
+    """Makes reading a streamed body raise `DeadlineExceededError` once the deadline has passed.
+
+    The read timeout only bounds the wait for each chunk, so without this a server trickling
+    out bytes could keep a download going long past the deadline.
+    """
+    iter_content, ref = response.iter_content, weakref.ref(response)
+
+    def bounded_iter_content(*args: Any, **kwargs: Any) -> Iterator[Any]:
+        for chunk in iter_content(*args, **kwargs):
+            if time.monotonic() >= expires:
+                ref().close()
+                raise DeadlineExceededError()
+            yield chunk
+
+    response.iter_content = bounded_iter_content
+
+
+def is_overloaded(status: int) -> bool:
+    """Whether a status code means the server is shedding load."""
+    return status == 429 or status >= 500
+
+
+def get(url: str, **kwargs: Any) -> requests.Response:
+    """Sends a GET request through the active transport."""
+    return request("GET", url, **kwargs)
+
+
+def head(url: str, **kwargs: Any) -> requests.Response:
+    """Sends a HEAD request through the active transport."""
+    return request("HEAD", url, **kwargs)
@@ -0,0 +1,188 @@
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from pydantic import BaseModel, Field
+
+from . import exceptions
+
+
+class RequestTiming(BaseModel):
+    """Timing and size of a single HTTP request."""
+
+    method: str
+    url: str
+    host: str
+    status: int | None = None
+    bytes_received: int = 0
+    latency: float
+    queued: float = 0.0
+    error: str | None = None
+
+
+class ExtractionTrace(BaseModel):
+    """Per-phase timing of a single `extract()` call.
+
+    `dispatch_time` covers finding the extractor, `extract_time` covers the extractor itself,
+    and the latter is split into time spent waiting on HTTP requests, waiting for the rate and
+    concurrency limits to let them through, backing off before retrying them, and parsing.
+    """
+
+    url: str
+    extractor: str | None = None
+    dispatch_time: float = 0.0
+    extract_time: float = 0.0
+    requests: list[RequestTiming] = Field(default_factory=list)
+    backoff_time: float = Field(default=0.0, description="Time spent waiting before retrying failed requests")
+    error: str | None = None
+    outcome: str = "success"
+
+    @property
+    def network_time(self) -> float:
+        """Total time spent waiting on HTTP requests."""
+        return sum(request.latency for request in self.requests)
+
+    @property
+    def queue_time(self) -> float:
+        """Total time HTTP requests waited for the rate and concurrency limits before they were sent."""
+        return sum(request.queued for request in self.requests)
+
+    @property
+    def parse_time(self) -> float:
+        """Time spent inside the extractor that was not spent on HTTP requests, queued or backing off."""
+        return max(self.extract_time - self.network_time - self.queue_time - self.backoff_time, 0.0)
+
+    @property
+    def total_time(self) -> float:
+        """Wall-clock time of the whole `extract()` call."""
+        return self.dispatch_time + self.extract_time
+
+
+class Observer:
+    """Receives instrumentation events; override the hooks you are interested in."""
+
+    def on_extractor_selected(self, trace: ExtractionTrace) -> None:
+        """Called once an extractor has been chosen for a URL."""
+
+    def on_request_start(self, timing: RequestTiming) -> None:
+        """Called just before an HTTP request is sent; the same object is later passed to `on_request`."""
+
+    def on_request(self, timing: RequestTiming, trace: ExtractionTrace | None) -> None:
+        """Called after every HTTP request, with the trace of the enclosing extraction if there is one."""
+
+    def on_extraction(self, trace: ExtractionTrace) -> None:
+        """Called when an `extract()` call finishes, whether it succeeded or not."""
+
+    def on_download(self, timing: RequestTiming) -> None:
+        """Called when `download()` has finished writing a file."""
+
+    def on_cache(self, cache: str, hit: bool) -> None:
+        """Called whenever one of the library's caches is consulted."""
+
+    def on_limit_change(self, host: str, limit: float) -> None:
+        """Called when the adaptive concurrency limit of a host changes."""
+
+
+_observers: tuple[Observer, ...] = ()
+_current_trace: ContextVar[ExtractionTrace | None] = ContextVar("torah_dl_current_trace", default=None)
+
+
+def add_observer(observer: Observer) -> None:
+    """Registers an observer for all subsequent extractions and requests."""
+    global _observers
+    _observers = (*_observers, observer)
+
+
+def remove_observer(observer: Observer) -> None:
+    """Unregisters a previously added observer."""
+    global _observers
+    _observers = tuple(o for o in _observers if o is not observer)
+
+
+@contextmanager
+def observe(observer: Observer) -> Generator[Observer, None, None]:
+    """Registers an observer for the duration of a `with` block."""
+    add_observer(observer)
+    try:
+        yield observer
+    finally:
+        remove_observer(observer)
+
+
+def current_trace() -> ExtractionTrace | None:
+    """Returns the trace of the extraction running in the current context, if any."""
+    return _current_trace.get()
+
+
+@contextmanager
+def tracing(url: str) -> Generator[ExtractionTrace, None, None]:
+    """Collects an `ExtractionTrace` for everything that happens inside the block.
+
+    The trace records the name of any exception raised, and is handed to observers when the block exits.
+    """
+    trace = ExtractionTrace(url=url)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    except Exception as e:
+        trace.error = type(e).__name__
+        trace.outcome = error_outcome(e)
+        raise
+    finally:
+        _current_trace.reset(token)
+        for observer in _observers:
+            observer.on_extraction(trace)
+
+
+def extractor_selected(trace: ExtractionTrace) -> None:
+    """Notifies observers that an extractor was chosen."""
+    for observer in _observers:
+        observer.on_extractor_selected(trace)
+
+
+def error_outcome(error: BaseException) -> str:
+    """Maps an exception to the name of the closest public `TorahDLError` class, or "other"."""
+    for cls in type(error).__mro__:
+        if issubclass(cls, exceptions.TorahDLError) and getattr(exceptions, cls.__name__, None) is cls:
+            return cls.__name__
+    return "other"
+
+
+def request_started(timing: RequestTiming) -> None:
+    """Notifies observers that a request is about to be sent."""
+    for observer in _observers:
+        observer.on_request_start(timing)
+
+
+def record_request(timing: RequestTiming) -> None:
+    """Adds a request to the current trace and notifies observers."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.requests.append(timing)
+    for observer in _observers:
+        observer.on_request(timing, trace)
+
+
+def record_backoff(delay: float) -> None:
+    """Adds time spent waiting before a retry to the current trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.backoff_time += delay
+
+
+def record_download(timing: RequestTiming) -> None:
+    """Notifies observers that a download has finished."""
+    for observer in _observers:
+        observer.on_download(timing)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Notifies observers of a cache lookup."""
+    for observer in _observers:
+        observer.on_cache(cache, hit)
+
+
+def record_limit(host: str, limit: float) -> None:
+    """Notifies observers that the concurrency limit of a host changed."""
+    for observer in _observers:
+        observer.on_limit_change(host, limit)
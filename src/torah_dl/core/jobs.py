@@ -0,0 +1,617 @@
+import multiprocessing
+import os
+import queue as queue_module
+import signal
+import socket
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from functools import partial
+from multiprocessing.context import BaseContext
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from .deadline import Timeouts, get_timeouts, set_timeouts
+from .download import DownloadProgress, download, output_name
+from .extract import extract
+from .manifest import Manifest, ManifestEntry
+from .metrics import REGISTRY, enable_metrics, metrics_enabled
+from .models import Extraction
+from .ratelimit import BANDWIDTH, RATE_LIMITER, SharedTokenBucket
+from .retry import RetryPolicy, get_retry_policy, set_retry_policy
+from .store import MediaStore
+
+# How often worker processes report their metrics, and the pool reports progress, in seconds
+REPORT_INTERVAL = 1.0
+
+# How often workers renew their claims, and how long a claim that is not renewed lasts, in seconds
+HEARTBEAT_INTERVAL = 30.0
+CLAIM_LEASE = 300.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    state TEXT NOT NULL,
+    download_url TEXT,
+    title TEXT,
+    output_path TEXT,
+    offset INTEGER NOT NULL DEFAULT 0,
+    validator TEXT,
+    size INTEGER,
+    sha256 TEXT,
+    error TEXT,
+    error_message TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_by TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claimable ON jobs (claimed_by, state);
+"""
+
+_FIELDS = (
+    "id",
+    "url",
+    "state",
+    "download_url",
+    "title",
+    "output_path",
+    "offset",
+    "validator",
+    "size",
+    "sha256",
+    "error",
+    "error_message",
+    "attempts",
+    "claimed_by",
+    "updated_at",
+)
+_SELECT = "SELECT " + ", ".join(_FIELDS) + " FROM jobs"  # noqa: S608
+
+
+class JobState(str, Enum):
+    """Where a job is on its way from URL to file."""
+
+    PENDING = "pending"
+    EXTRACTED = "extracted"
+    DOWNLOADING = "downloading"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class Job(BaseModel):
+    """A URL to extract and download, and how far it got."""
+
+    id: int
+    url: str
+    state: JobState
+    download_url: str | None = None
+    title: str | None = None
+    output_path: str | None = None
+    offset: int = 0
+    validator: str | None = None
+    size: int | None = None
+    sha256: str | None = None
+    error: str | None = None
+    error_message: str | None = None
+    attempts: int = 0
+    claimed_by: str | None = None
+    updated_at: datetime
+
+
+class JobQueue:
+    """A durable queue of download jobs, kept in a SQLite database in WAL mode.
+
+    Every state change is committed as it happens, including the byte offset of downloads in
+    progress and the version of the file they came from, so a worker killed mid-download resumes it
+    rather than starting over, unless the file has changed upstream in the meantime.
+
+    Args:
+        path: The database file
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(_SCHEMA)
+
+    def add(self, urls: Iterable[str]) -> int:
+        """Queues URLs that are not queued yet, returning how many were added."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                before = self._connection.total_changes
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO jobs (url, state, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                    ((url, JobState.PENDING.value, now, now) for url in urls),
+                )
+                added = self._connection.total_changes - before
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return added
+
+    def claim(self, worker: str) -> Job | None:
+        """Takes the oldest unfinished job nobody else has claimed, or returns None if there is none."""
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute(
+                    f"{_SELECT} WHERE claimed_by IS NULL AND state IN (?, ?, ?) ORDER BY id LIMIT 1",
+                    (JobState.PENDING.value, JobState.EXTRACTED.value, JobState.DOWNLOADING.value),
+                ).fetchone()
+                if row is not None:
+                    self._connection.execute(
+                        "UPDATE jobs SET claimed_by = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                        (worker, time.time(), row[0]),
+                    )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = self._job(row)
+        job.claimed_by = worker
+        job.attempts += 1
+        return job
+
+    def extracted(self, job_id: int, extraction: Extraction, output_path: Path) -> None:
+        """Records where a job's file comes from and where it goes."""
+        self._update(
+            job_id,
+            state=JobState.EXTRACTED.value,
+            download_url=extraction.download_url,
+            title=extraction.title,
+            output_path=str(output_path),
+            offset=0,
+            validator=None,
+        )
+
+    def progress(self, job_id: int, offset: int, validator: str | None = None) -> None:
+        """Records how many bytes of a job's file are safely in its partial file, and the validator
+        (ETag or Last-Modified date) of the version of the file they came from, to resume it with.
+        """
+        self._update(job_id, state=JobState.DOWNLOADING.value, offset=offset, validator=validator)
+
+    def done(self, job_id: int, size: int, sha256: str | None = None) -> None:
+        """Marks a job finished and releases it."""
+        self._update(
+            job_id,
+            state=JobState.DONE.value,
+            size=size,
+            sha256=sha256,
+            error=None,
+            error_message=None,
+            claimed_by=None,
+        )
+
+    def failed(self, job_id: int, error: BaseException) -> None:
+        """Marks a job failed with the class and message of its error, and releases it."""
+        self._update(
+            job_id,
+            state=JobState.FAILED.value,
+            error=type(error).__name__,
+            error_message=str(error),
+            claimed_by=None,
+        )
+
+    def release(self, job_id: int) -> None:
+        """Gives a claimed job back to the queue as it is."""
+        self._update(job_id, claimed_by=None)
+
+    def heartbeat(self, worker_prefix: str) -> int:
+        """Renews the claims of the workers whose name starts with a prefix, see `recover_stale()`."""
+        return self._execute(
+            "UPDATE jobs SET updated_at = ? WHERE claimed_by IS NOT NULL AND substr(claimed_by, 1, ?) = ?",
+            (time.time(), len(worker_prefix), worker_prefix),
+        )
+
+    def recover(self, worker_prefix: str = "") -> int:
+        """Releases the jobs claimed by workers whose name starts with a prefix (by default, all of them).
+
+        Only call it for workers that are no longer running; `recover_stale()` is safe while other
+        workers are using the queue.
+        """
+        return self._execute(
+            "UPDATE jobs SET claimed_by = NULL WHERE claimed_by IS NOT NULL AND substr(claimed_by, 1, ?) = ?",
+            (len(worker_prefix), worker_prefix),
+        )
+
+    def recover_stale(self, lease: float = CLAIM_LEASE) -> int:
+        """Releases the jobs whose worker is gone: its process on this host has exited, or it has not
+        renewed its claim (see `heartbeat()`) for `lease` seconds, e.g. because its host crashed.
+
+        Workers are identified by names starting with `host:pid:`, as `process_queue` gives them.
+        """
+        with self._lock:
+            claims = self._connection.execute(
+                "SELECT id, claimed_by, updated_at FROM jobs WHERE claimed_by IS NOT NULL"
+            ).fetchall()
+        expired = time.time() - lease
+        stale = [
+            (job_id, claimed_by)
+            for job_id, claimed_by, updated_at in claims
+            if updated_at < expired or not _owner_alive(claimed_by)
+        ]
+        # a job is only released if it is still claimed by the same worker
+        return sum(
+            self._execute("UPDATE jobs SET claimed_by = NULL WHERE id = ? AND claimed_by = ?", stale_claim)
+            for stale_claim in stale
+        )
+
+    def retry_failed(self) -> int:
+        """Queues every failed job again, keeping what it had already extracted."""
+        return self._execute(
+            "UPDATE jobs SET state = CASE WHEN download_url IS NULL THEN ? ELSE ? END, error = NULL, "
+            "error_message = NULL WHERE state = ?",
+            (JobState.PENDING.value, JobState.EXTRACTED.value, JobState.FAILED.value),
+        )
+
+    def get(self, url: str) -> Job | None:
+        """Returns the job of a URL, if it is queued."""
+        with self._lock:
+            row = self._connection.execute(f"{_SELECT} WHERE url = ?", (url,)).fetchone()
+        return None if row is None else self._job(row)
+
+    def failures(self) -> list[Job]:
+        """Returns every failed job."""
+        with self._lock:
+            rows = self._connection.execute(f"{_SELECT} WHERE state = ? ORDER BY id", (JobState.FAILED.value,))
+            return [self._job(row) for row in rows.fetchall()]
+
+    def manifest(self, directory: Path) -> Manifest:
+        """Returns a manifest of the finished jobs, with paths relative to `directory` where possible."""
+        with self._lock:
+            rows = self._connection.execute(f"{_SELECT} WHERE state = ? ORDER BY id", (JobState.DONE.value,)).fetchall()
+        manifest = Manifest()
+        for row in rows:
+            job = self._job(row)
+            path = Path(job.output_path)
+            manifest.entries[job.download_url] = ManifestEntry(
+                source_url=job.url,
+                download_url=job.download_url,
+                path=str(path.relative_to(directory)) if path.is_relative_to(directory) else str(path),
+                title=job.title,
+                size=job.size,
+                sha256=job.sha256,
+                downloaded_at=job.updated_at,
+            )
+        return manifest
+
+    def counts(self) -> dict[JobState, int]:
+        """Returns how many jobs are in each state."""
+        with self._lock:
+            rows = self._connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = dict.fromkeys(JobState, 0)
+        counts.update({JobState(state): count for state, count in rows})
+        return counts
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "JobQueue":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def _update(self, job_id: int, **values: object) -> None:
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        self._execute(
+            f"UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ?",  # noqa: S608
+            (*values.values(), time.time(), job_id),
+        )
+
+    def _execute(self, sql: str, params: tuple = ()) -> int:
+        with self._lock:
+            return self._connection.execute(sql, params).rowcount
+
+    @staticmethod
+    def _job(row: tuple) -> Job:
+        return Job(**dict(zip(_FIELDS, row, strict=True)))
+
+
+def worker_prefix() -> str:
+    """Returns the `host:pid` prefix of the names of this process's workers."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(worker: str) -> bool:
+    """Whether the process of a worker named `host:pid:...` may still be running."""
+    host, _, rest = worker.partition(":")
+    pid, _, _ = rest.partition(":")
+    if host != socket.gethostname() or not pid.isdigit() or os.name == "nt":
+        # only processes on this host can be checked, and only where signal 0 probes them
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def process_job(
+    queue: JobQueue,
+    job: Job,
+    directory: Path,
+    store: MediaStore | None = None,
+    fsync: bool = False,
+    progress: Callable[[DownloadProgress], None] | None = None,
+) -> None:
+    """Extracts and downloads a claimed job, resuming from wherever it stopped last time.
+
+    A file already in `directory` from an earlier run is kept if it is unchanged upstream. With a
+    `store`, media it already holds is linked rather than downloaded. See `download()` for `fsync`
+    and `progress`.
+
+    Any error is recorded on the job rather than raised.
+    """
+    try:
+        if job.state is JobState.PENDING:
+            extraction = extract(job.url)
+            output_path = directory / output_name(extraction)
+            queue.extracted(job.id, extraction, output_path)
+            job.download_url, job.output_path, job.offset = extraction.download_url, str(output_path), 0
+            job.validator = None
+
+        output_path = Path(job.output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        queue.progress(job.id, job.offset, job.validator)
+        result = (store.download if store else download)(
+            job.download_url,
+            output_path,
+            offset=job.offset,
+            validator=job.validator,
+            checkpoint=partial(queue.progress, job.id),
+            skip_unchanged=True,
+            fsync=fsync,
+            progress=progress,
+        )
+        queue.done(job.id, result.size, result.sha256)
+    except Exception as e:
+        queue.failed(job.id, e)
+
+
+def process_queue(
+    queue: JobQueue,
+    directory: Path,
+    workers: int = 4,
+    stop: threading.Event | None = None,
+    name: str | None = None,
+    recover: bool = True,
+    store: MediaStore | None = None,
+    fsync: bool = False,
+    on_progress: Callable[[Job, DownloadProgress | None], None] | None = None,
+) -> None:
+    """Works through a queue with a pool of threads until it is empty or `stop` is set.
+
+    Setting `stop` is a graceful shutdown: no new job is started, but downloads in progress are
+    finished. While it runs, the claims of its workers are renewed every `HEARTBEAT_INTERVAL`.
+
+    Args:
+        queue: The queue to work through
+        directory: Where to save the files
+        workers: How many jobs to work on at once
+        stop: Set to stop after the jobs in progress
+        name: Identifies this process's claims in the queue; defaults to `worker_prefix()`, which
+            lets `recover_stale()` tell when this process has exited
+        recover: First release the claims left behind by workers that are gone, see
+            `JobQueue.recover_stale()`
+        store: Download through this content-addressed store
+        fsync: Flush every file and checkpoint to disk before recording it, see `download()`
+        on_progress: Called with a job and the progress of its download as it runs, and with None
+            once the job is done or has failed
+    """
+    stop = stop or threading.Event()
+    name = name or worker_prefix()
+    if recover:
+        queue.recover_stale()
+
+    def work(worker: str) -> None:
+        while not stop.is_set() and (job := queue.claim(worker)) is not None:
+            progress = partial(on_progress, job) if on_progress else None
+            process_job(queue, job, directory, store, fsync, progress)
+            if on_progress:
+                on_progress(job, None)
+
+    done = threading.Event()
+
+    def heartbeat() -> None:
+        while not done.wait(HEARTBEAT_INTERVAL):
+            queue.heartbeat(f"{name}:")
+
+    threads = [threading.Thread(target=work, args=(f"{name}:{i}",), name=f"{name}:{i}") for i in range(workers)]
+    heartbeat_thread = threading.Thread(target=heartbeat, name=f"{name}:heartbeat", daemon=True)
+    for thread in threads:
+        thread.start()
+    heartbeat_thread.start()
+    # join with a timeout, so the main thread stays responsive to signals while it waits
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    finally:
+        done.set()
+        heartbeat_thread.join()
+
+
+def process_queue_in_processes(
+    path: str | Path,
+    directory: Path,
+    processes: int | None = None,
+    threads: int = 4,
+    stop: threading.Event | None = None,
+    on_progress: Callable[[dict[JobState, int]], None] | None = None,
+    store: Path | None = None,
+    fsync: bool = False,
+) -> None:
+    """Works through a queue with a pool of processes, each running `threads` worker threads.
+
+    Parsing pages is CPU-bound, so one process cannot use more than one core; each worker process
+    has its own HTTP session, caches and database connection, and they coordinate only through the
+    queue. While metrics are enabled, every worker's metrics are merged into this process's, so
+    `generate_metrics()` and `serve_metrics()` report the whole pool. The workers take on this
+    process's timeouts and retry policy, and its request rate limits and bandwidth limits hold for
+    the whole pool: its processes draw on the same shared buckets.
+
+    Setting `stop` is a graceful shutdown, as in `process_queue`; so is SIGTERM reaching a worker
+    process, e.g. from a service manager stopping the whole process group. Claims left behind by
+    workers that are gone (see `JobQueue.recover_stale()`), including worker processes of this pool
+    that die, are released; claims of workers still running elsewhere are left alone.
+
+    Args:
+        path: The queue's database file
+        directory: Where to save the files
+        processes: How many worker processes to start; defaults to the number of CPUs
+        threads: How many jobs each process works on at once
+        stop: Set to stop after the jobs in progress
+        on_progress: Called with the number of jobs in each state about once a second
+        store: The root of a `MediaStore` to download through
+        fsync: Flush every file and checkpoint to disk before recording it, see `download()`
+    """
+    context = multiprocessing.get_context("spawn")
+    worker_stop = context.Event()
+    reports = context.Queue()
+
+    processes = processes or os.cpu_count() or 1
+    settings = _SharedSettings.share(context)
+
+    with JobQueue(path) as queue:
+        queue.recover_stale()
+        pool = [
+            context.Process(
+                target=_worker_process,
+                args=(
+                    path,
+                    directory,
+                    threads,
+                    worker_stop,
+                    reports,
+                    metrics_enabled(),
+                    store,
+                    fsync,
+                    settings,
+                ),
+                name=f"torah-dl-worker-{i}",
+            )
+            for i in range(processes)
+        ]
+        for process in pool:
+            process.start()
+
+        while any(process.is_alive() for process in pool):
+            if stop is not None and stop.is_set():
+                worker_stop.set()
+            _merge_reports(reports, REPORT_INTERVAL)
+            # hands the jobs of a worker process that died to the others
+            queue.recover_stale()
+            if on_progress:
+                on_progress(queue.counts())
+
+        for process in pool:
+            process.join()
+        _merge_reports(reports, 0)
+        queue.recover_stale()
+        if on_progress:
+            on_progress(queue.counts())
+
+
+def _merge_reports(reports: multiprocessing.Queue, timeout: float) -> None:
+    """Merges the metrics reported by worker processes, waiting up to `timeout` for the first one."""
+    try:
+        while True:
+            source, snapshot = reports.get(timeout=timeout) if timeout else reports.get_nowait()
+            REGISTRY.merge_remote(source, snapshot)
+            timeout = 0
+    except queue_module.Empty:
+        pass
+
+
+@dataclass(frozen=True)
+class _SharedSettings:
+    """The settings worker processes take on from the pool, with its limits in shared memory."""
+
+    bandwidth: dict[str | None, SharedTokenBucket]
+    rate_limits: dict[str, SharedTokenBucket | None]
+    default_rate_limits: list[SharedTokenBucket]
+    timeouts: Timeouts
+    retry_policy: RetryPolicy
+
+    @classmethod
+    def share(cls, context: BaseContext) -> "_SharedSettings":
+        """Captures this process's settings, for processes started from `context`."""
+        rate_limits, default_rate_limits = RATE_LIMITER.shared_buckets(context)
+        return cls(
+            bandwidth=BANDWIDTH.shared_buckets(context),
+            rate_limits=rate_limits,
+            default_rate_limits=default_rate_limits,
+            timeouts=get_timeouts(),
+            retry_policy=get_retry_policy(),
+        )
+
+    def apply(self) -> None:
+        """Makes these the settings of this process."""
+        # the workers draw on the same buckets, so whatever one does not use is left to the others
+        BANDWIDTH.use_buckets(self.bandwidth)
+        RATE_LIMITER.use_buckets(self.rate_limits, self.default_rate_limits)
+        set_timeouts(self.timeouts.connect, self.timeouts.read)
+        set_retry_policy(self.retry_policy)
+
+
+def _worker_process(
+    path: str | Path,
+    directory: Path,
+    threads: int,
+    stop: threading.Event,
+    reports: multiprocessing.Queue,
+    collect_metrics: bool,
+    store_root: Path | None,
+    fsync: bool,
+    settings: _SharedSettings,
+) -> None:
+    """Runs `process_queue` in a worker process, reporting its metrics to the parent."""
+    # Ctrl-C reaches the whole process group; the parent turns it into a graceful stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # so does SIGTERM, but it may reach only the workers, so they stop gracefully themselves
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    if collect_metrics:
+        enable_metrics()
+    settings.apply()
+
+    # named after this process, so the pool can tell when it has died
+    name = worker_prefix()
+    done = threading.Event()
+
+    def report() -> None:
+        while not done.wait(REPORT_INTERVAL):
+            reports.put((name, REGISTRY.snapshot()))
+
+    reporter = threading.Thread(target=report, name="torah-dl-metrics-report", daemon=True)
+    reporter.start()
+    store = MediaStore(store_root) if store_root is not None else None
+    try:
+        with JobQueue(path) as queue:
+            process_queue(
+                queue, directory, workers=threads, stop=stop, name=name, recover=False, store=store, fsync=fsync
+            )
+    finally:
+        if store is not None:
+            store.close()
+        done.set()
+        reporter.join()
+        reports.put((name, REGISTRY.snapshot()))
@@ -0,0 +1,94 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pydantic import BaseModel, Field
+
+MANIFEST_NAME = "torah-dl.manifest.json"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class FeedState(BaseModel):
+    """What a feed looked like the last time it was synced in full."""
+
+    etag: str | None = None
+    last_modified: str | None = None
+    synced_at: datetime = Field(default_factory=_now)
+
+    def conditional_headers(self) -> dict[str, str]:
+        """Returns the headers that ask the server to answer 304 if the feed has not changed."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ManifestEntry(BaseModel):
+    """A file downloaded into a directory."""
+
+    source_url: str = Field(description="The URL the item was extracted from")
+    download_url: str
+    path: str = Field(description="Where the file was saved, relative to the manifest's directory")
+    title: str | None = None
+    size: int | None = None
+    sha256: str | None = None
+    md5: str | None = None
+    downloaded_at: datetime = Field(default_factory=_now)
+
+
+class Manifest(BaseModel):
+    """Records what has been downloaded into a directory, so later runs only fetch what is new.
+
+    Entries are keyed by download URL.
+    """
+
+    feeds: dict[str, FeedState] = Field(default_factory=dict)
+    entries: dict[str, ManifestEntry] = Field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path) -> "Manifest":
+        """Reads a manifest, or returns an empty one if the file does not exist."""
+        try:
+            return cls.model_validate_json(path.read_bytes())
+        except FileNotFoundError:
+            return cls()
+
+    def save(self, path: Path) -> None:
+        """Writes the manifest atomically, so an interrupted run never leaves it half written."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.model_dump_json(indent=2))
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def merge(self, other: "Manifest") -> "Manifest":
+        """Adds the feeds and entries of another manifest, e.g. one written by another shard.
+
+        Where both have an entry for the same download URL (or state for the same feed), the more
+        recent one is kept.
+
+        Returns:
+            Manifest: This manifest
+        """
+        for url, entry in other.entries.items():
+            if url not in self.entries or entry.downloaded_at > self.entries[url].downloaded_at:
+                self.entries[url] = entry
+        for url, feed in other.feeds.items():
+            if url not in self.feeds or feed.synced_at > self.feeds[url].synced_at:
+                self.feeds[url] = feed
+        return self
+
+    def has_file(self, download_url: str, directory: Path) -> bool:
+        """Whether the file of a download URL was recorded and is still in `directory`."""
+        entry = self.entries.get(download_url)
+        return entry is not None and (directory / entry.path).exists()
@@ -0,0 +1,330 @@
+import abc
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TypeVar
+
+from .instrumentation import ExtractionTrace, Observer, RequestTiming, add_observer, remove_observer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+
+
+class Metric(abc.ABC):
+    """Base class for a labelled metric in the Prometheus text exposition format."""
+
+    kind: str
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _format_labels(self, key: tuple[str, ...], extra: dict[str, str] | None = None) -> str:
+        pairs = list(zip(self.labelnames, key, strict=True)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    @abc.abstractmethod
+    def samples(self) -> list[str]:
+        """Returns the sample lines of this metric."""
+
+    @abc.abstractmethod
+    def snapshot(self) -> object:
+        """Returns this process's values in a picklable form, for `merge_remote` in another process."""
+
+    @abc.abstractmethod
+    def merge_remote(self, source: str, snapshot: object) -> None:
+        """Adds the latest snapshot of another process to this metric, replacing that process's previous one."""
+
+    def render(self) -> str:
+        """Returns the HELP, TYPE and sample lines of this metric."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """A monotonically increasing value."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._remote: dict[str, dict[tuple[str, ...], float]] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._totals().get(self._key(labels), 0.0)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            totals = self._totals()
+        return [f"{self.name}{self._format_labels(key)} {_number(v)}" for key, v in sorted(totals.items())]
+
+    def snapshot(self) -> dict[tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def merge_remote(self, source: str, snapshot: dict[tuple[str, ...], float]) -> None:
+        with self._lock:
+            self._remote[source] = snapshot
+
+    def _totals(self) -> dict[tuple[str, ...], float]:
+        totals = dict(self._values)
+        for values in self._remote.values():
+            for key, value in values.items():
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+
+class Gauge(Counter):
+    """A value that can go up and down."""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """Counts observations into cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        self._counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = {}
+        self._remote: dict[str, tuple[dict[tuple[str, ...], list[int]], dict[tuple[str, ...], float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            counts = self._totals()[0].get(self._key(labels))
+        return counts[-1] if counts else 0
+
+    def samples(self) -> list[str]:
+        lines = []
+        with self._lock:
+            all_counts, sums = self._totals()
+        for key, counts in sorted(all_counts.items()):
+            for bound, count in zip(self.buckets, counts, strict=True):
+                le = "+Inf" if bound == math.inf else _number(bound)
+                lines.append(f"{self.name}_bucket{self._format_labels(key, {'le': le})} {count}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_number(sums[key])}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {counts[-1]}")
+        return lines
+
+    def snapshot(self) -> tuple[dict[tuple[str, ...], list[int]], dict[tuple[str, ...], float]]:
+        with self._lock:
+            return {key: list(counts) for key, counts in self._counts.items()}, dict(self._sums)
+
+    def merge_remote(
+        self, source: str, snapshot: tuple[dict[tuple[str, ...], list[int]], dict[tuple[str, ...], float]]
+    ) -> None:
+        with self._lock:
+            self._remote[source] = snapshot
+
+    def _totals(self) -> tuple[dict[tuple[str, ...], list[int]], dict[tuple[str, ...], float]]:
+        all_counts = {key: list(counts) for key, counts in self._counts.items()}
+        sums = dict(self._sums)
+        for remote_counts, remote_sums in self._remote.values():
+            for key, counts in remote_counts.items():
+                merged = all_counts.setdefault(key, [0] * len(self.buckets))
+                for i, count in enumerate(counts):
+                    merged[i] += count
+            for key, value in remote_sums.items():
+                sums[key] = sums.get(key, 0.0) + value
+        return all_counts, sums
+
+
+M = TypeVar("M", bound=Metric)
+
+
+class MetricsRegistry:
+    """A collection of metrics rendered together."""
+
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: M) -> M:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+    def snapshot(self) -> dict[str, object]:
+        """Returns the values of every metric in this process, to be merged into another process's registry."""
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def merge_remote(self, source: str, snapshot: dict[str, object]) -> None:
+        """Includes the latest snapshot of another process, e.g. a worker, in every metric.
+
+        Later snapshots from the same source replace earlier ones, since they already include them.
+        """
+        for metric in self.metrics:
+            if metric.name in snapshot:
+                metric.merge_remote(source, snapshot[metric.name])
+
+
+REGISTRY = MetricsRegistry()
+
+EXTRACTIONS = REGISTRY.register(
+    Counter("torah_dl_extractions_total", "Extractions by extractor and outcome.", ("extractor", "outcome"))
+)
+EXTRACTION_DURATION = REGISTRY.register(
+    Histogram("torah_dl_extraction_duration_seconds", "Wall-clock time of extract() calls.", ("extractor",))
+)
+HTTP_REQUESTS = REGISTRY.register(
+    Counter("torah_dl_http_requests_total", "HTTP requests by host and status.", ("host", "status"))
+)
+HTTP_DURATION = REGISTRY.register(
+    Histogram("torah_dl_http_request_duration_seconds", "HTTP request latency by host.", ("host",))
+)
+HTTP_IN_FLIGHT = REGISTRY.register(
+    Gauge("torah_dl_http_requests_in_flight", "HTTP requests currently waiting on a response.", ("host",))
+)
+HOST_CONCURRENCY_LIMIT = REGISTRY.register(
+    Gauge("torah_dl_host_concurrency_limit", "Adaptive concurrency limit by host.", ("host",))
+)
+DOWNLOADED_BYTES = REGISTRY.register(
+    Counter("torah_dl_downloaded_bytes_total", "Bytes written by download() by host.", ("host",))
+)
+CACHE_HITS = REGISTRY.register(Counter("torah_dl_cache_hits_total", "Cache hits by cache.", ("cache",)))
+CACHE_MISSES = REGISTRY.register(Counter("torah_dl_cache_misses_total", "Cache misses by cache.", ("cache",)))
+
+
+class MetricsObserver(Observer):
+    """Feeds instrumentation events into the metrics registry."""
+
+    def __init__(self):
+        # requests counted as in flight, by id; holding the timing keeps its id from being reused
+        self._started: dict[int, RequestTiming] = {}
+        self._lock = threading.Lock()
+
+    def on_request_start(self, timing: RequestTiming) -> None:
+        with self._lock:
+            self._started[id(timing)] = timing
+        HTTP_IN_FLIGHT.inc(host=timing.host)
+
+    def on_request(self, timing: RequestTiming, trace: ExtractionTrace | None) -> None:
+        # a request that started before metrics were enabled was never counted as in flight
+        with self._lock:
+            started = self._started.pop(id(timing), None) is not None
+        if started:
+            HTTP_IN_FLIGHT.dec(host=timing.host)
+        HTTP_REQUESTS.inc(host=timing.host, status=str(timing.status or timing.error))
+        HTTP_DURATION.observe(timing.latency, host=timing.host)
+
+    def on_extraction(self, trace: ExtractionTrace) -> None:
+        extractor = trace.extractor or "none"
+        EXTRACTIONS.inc(extractor=extractor, outcome=trace.outcome)
+        EXTRACTION_DURATION.observe(trace.total_time, extractor=extractor)
+
+    def on_download(self, timing: RequestTiming) -> None:
+        DOWNLOADED_BYTES.inc(timing.bytes_received, host=timing.host)
+
+    def on_cache(self, cache: str, hit: bool) -> None:
+        (CACHE_HITS if hit else CACHE_MISSES).inc(cache=cache)
+
+    def on_limit_change(self, host: str, limit: float) -> None:
+        HOST_CONCURRENCY_LIMIT.set(limit, host=host)
+
+
+_observer: MetricsObserver | None = None
+
+
+def enable_metrics() -> None:
+    """Starts collecting metrics from every extraction, request and download."""
+    global _observer
+    if _observer is None:
+        _observer = MetricsObserver()
+        add_observer(_observer)
+
+
+def disable_metrics() -> None:
+    """Stops collecting metrics; values collected so far are kept."""
+    global _observer
+    if _observer is not None:
+        remove_observer(_observer)
+        _observer = None
+
+
+def metrics_enabled() -> bool:
+    """Whether metrics are being collected."""
+    return _observer is not None
+
+
+def generate_metrics() -> str:
+    """Returns all metrics in the Prometheus text exposition format."""
+    return REGISTRY.render()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        body = generate_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002
+        pass
+
+
+def serve_metrics(port: int, address: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Enables metrics and serves them over HTTP from a background thread.
+
+    Args:
+        port: The port to listen on; 0 picks a free port
+        address: The address to bind to
+
+    Returns:
+        ThreadingHTTPServer: The running server; call `shutdown()` on it to stop serving
+    """
+    enable_metrics()
+    server = ThreadingHTTPServer((address, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="torah-dl-metrics", daemon=True).start()
+    return server
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
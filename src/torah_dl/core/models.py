@@ -1,22 +1,219 @@
+import threading
 from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from dataclasses import dataclass
 from re import Pattern
-from typing import ClassVar
+from typing import Any, ClassVar
+from urllib.parse import urlsplit, urlunsplit
 
-from pydantic import BaseModel
+import requests
+from pydantic import BaseModel, Field, PrivateAttr, SerializerFunctionWrapHandler, model_serializer
+
+from . import http
+from .exceptions import ExtractionError, NetworkError
+from .instrumentation import ExtractionTrace
+from .ratelimit import RateLimit
+
+_ERR_NO_FEED = "{name} has no feeds to parse"
+
+# feeds are parsed as they download, a chunk at a time
+FEED_CHUNK_SIZE = 64 * 1024
+
+# bound once, since looking them up is a noticeable part of `Extraction.trusted`
+_new = object.__new__
+_setattr = object.__setattr__
+
+# the default of the optional arguments of `Extraction.trusted`, so it can tell which were passed
+_UNSET: Any = object()
+
+
+class _Deferred:
+    """A field value computed by `fn` on first use, once, even when several threads ask for it."""
+
+    def __init__(self, fn: Callable[[], Any]):
+        self.fn = fn
+        self.resolved = False
+        self.value: Any = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        with self._lock:
+            if not self.resolved:
+                self.value = self.fn()
+                self.resolved = True
+                # the resolver may hold a session or a lock; it is never needed again
+                self.fn = None
+        return self.value
 
 
 class Extraction(BaseModel):
-    """Represents the extracted data from a source."""
+    """Represents the extracted data from a source.
+
+    Fields other than `download_url` may be deferred by the extractor (see `defer`); they are
+    resolved on first access, by `resolve()`, or when the extraction is serialized.
+    """
 
     title: str | None = None
     download_url: str
     file_format: str | None = None
     file_name: str | None = None
+    size: int | None = Field(default=None, description="Size of the file in bytes, when known")
     # Add other common fields that all extractions should have
+    trace: ExtractionTrace | None = Field(default=None, exclude=True, repr=False)
 
+    _deferred: dict[str, _Deferred] = PrivateAttr(default_factory=dict)
 
-class ExtractionExample(BaseModel):
-    """Represents an example of an extraction."""
+    @classmethod
+    def trusted(
+        cls,
+        download_url: str,
+        title: str | None = _UNSET,
+        file_format: str | None = _UNSET,
+        file_name: str | None = _UNSET,
+        size: int | None = _UNSET,
+    ) -> "Extraction":
+        """
+        Builds an extraction without validating it, for values already known to be valid.
+
+        Meant for bulk work that rebuilds extractions from its own storage; anything coming from
+        users or sites goes through the validating constructor. Unlike `model_construct`, this
+        is cheaper than validation. As with the validating constructor, only the fields passed
+        count as set.
+        """
+        values = {
+            "title": title,
+            "download_url": download_url,
+            "file_format": file_format,
+            "file_name": file_name,
+            "size": size,
+        }
+        fields_set = set()
+        for name, value in values.items():
+            if value is _UNSET:
+                values[name] = None
+            else:
+                fields_set.add(name)
+        values["trace"] = None
+
+        extraction = _new(cls)
+        _setattr(extraction, "__dict__", values)
+        _setattr(extraction, "__pydantic_fields_set__", fields_set)
+        _setattr(extraction, "__pydantic_extra__", None)
+        _setattr(extraction, "__pydantic_private__", {"_deferred": {}})
+        return extraction
+
+    def to_record(self) -> "ExtractionRecord":
+        """Returns the compact form of this extraction, resolving any deferred fields."""
+        return ExtractionRecord(self.download_url, self.title, self.file_format, self.file_name, self.size)
+
+    def defer(self, **resolvers: Callable[[], Any]) -> "Extraction":
+        """
+        Defers fields until they are first used.
+
+        Args:
+            **resolvers: A function computing the value of each deferred field
+
+        Returns:
+            Extraction: This extraction
+        """
+        for name, fn in resolvers.items():
+            if name not in type(self).model_fields or name == "download_url":
+                raise AttributeError(name)
+            self._deferred[name] = _Deferred(fn)
+            self.__dict__.pop(name, None)
+        return self
+
+    def resolve(self) -> "Extraction":
+        """
+        Resolves every deferred field now.
+
+        Returns:
+            Extraction: This extraction
+
+        Raises:
+            TorahDLError: If resolving a field failed
+        """
+        for name in list(self._deferred):
+            getattr(self, name)
+        return self
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes missing from __dict__, which is where deferred fields live until resolved
+        fields = type(self).model_fields
+        if name in fields and (deferred := self._deferred.get(name)) is not None:
+            value = deferred.get()
+            # Swap in a new __dict__ in field order, so a resolved extraction serializes like an eager one
+            values = {**self.__dict__, name: value}
+            object.__setattr__(self, "__dict__", {field: values[field] for field in fields if field in values})
+            self._deferred.pop(name, None)
+            return value
+        if name in fields and name in self.__dict__:
+            # resolved by another thread since this lookup missed __dict__
+            return self.__dict__[name]
+        return super().__getattr__(name)
+
+    def __eq__(self, other: object) -> bool:
+        # Compares without resolving anything, so pending fields are only equal in copies of one extraction
+        if not isinstance(other, Extraction):
+            return NotImplemented
+        return type(self) is type(other) and self._known_values() == other._known_values()
+
+    def _known_values(self) -> dict[str, Any]:
+        """Returns the field values, with each field that is still pending represented by its resolver."""
+        values = dict(self.__dict__)
+        for name, deferred in list(self._deferred.items()):
+            values.setdefault(name, deferred.value if deferred.resolved else deferred)
+        return values
+
+    def __copy__(self) -> "Extraction":
+        copy = super().__copy__()
+        # copies share each pending resolution, but resolving a field only drops it from one copy
+        copy._deferred = dict(self._deferred)
+        return copy
+
+    def model_copy(self, *, update: Mapping[str, Any] | None = None, deep: bool = False) -> "Extraction":
+        copy = super().model_copy(update=update, deep=deep)
+        for name in update or ():
+            copy._deferred.pop(name, None)
+        return copy
+
+    def __deepcopy__(self, memo: dict[int, Any] | None = None) -> "Extraction":
+        self.resolve()
+        return super().__deepcopy__(memo)
+
+    def __getstate__(self) -> dict[Any, Any]:
+        # resolvers are closures and hold locks, so only resolved extractions can be pickled
+        self.resolve()
+        return super().__getstate__()
+
+    @model_serializer(mode="wrap")
+    def _serialize(self, handler: SerializerFunctionWrapHandler) -> dict[str, Any]:
+        self.resolve()
+        return handler(self)
+
+
+@dataclass(frozen=True, slots=True)
+class ExtractionRecord:
+    """Compact, unvalidated form of an `Extraction`, for holding many of them at once."""
+
+    download_url: str
+    title: str | None = None
+    file_format: str | None = None
+    file_name: str | None = None
+    size: int | None = None
+
+    def to_extraction(self) -> Extraction:
+        """Returns the full `Extraction` for this record."""
+        return Extraction.trusted(self.download_url, self.title, self.file_format, self.file_name, self.size)
+
+
+@dataclass(frozen=True, slots=True)
+class ExtractionExample:
+    """Represents an example of an extraction.
+
+    Examples are written alongside each extractor and built when its module is imported, so they
+    are not validated.
+    """
 
     name: str
     url: str
@@ -34,6 +231,12 @@ class Extractor(ABC):
 
     EXAMPLES: ClassVar[list[ExtractionExample]] = []
 
+    # Per-host request rate limits this extractor's sites need; applied when the extractor is registered
+    RATE_LIMITS: ClassVar[dict[str, RateLimit]] = {}
+
+    # Whether `derive` can build the download URL from the URL alone, without any request
+    DERIVES_DOWNLOAD_URL: ClassVar[bool] = False
+
     @property
     @abstractmethod
     def url_patterns(self) -> Pattern | list[Pattern]:
@@ -59,6 +262,106 @@ class Extractor(ABC):
 
         return any(pattern.match(url) for pattern in patterns)
 
+    def canonical_id(self, url: str) -> str:
+        """
+        Returns an identifier shared by every URL that points at the same item.
+
+        The default is the URL with a lowercase scheme and host and without its fragment;
+        extractors that can read a stable id from the URL override this.
+
+        Args:
+            url: A URL this extractor can handle
+
+        Returns:
+            str: The canonical id of the item
+        """
+        parts = urlsplit(url.strip())
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, ""))
+
+    def derive(self, url: str) -> Extraction | None:
+        """
+        Builds the extraction from the URL alone, without making any request.
+
+        Only extractors that set `DERIVES_DOWNLOAD_URL` implement this. The download URL is not
+        checked against the site and the title is left unset; call `extract` to get both.
+
+        Args:
+            url: A URL this extractor can handle
+
+        Returns:
+            Extraction | None: The extraction, without a title, or None if the extractor cannot
+                derive download URLs
+
+        Raises:
+            DownloadURLError: If the URL does not identify an item
+        """
+        return None
+
+    def feed_url(self, url: str) -> str | None:
+        """
+        Returns the URL of a feed listing every item of the series a URL points at.
+
+        Extractors whose sites publish such feeds override this together with `parse_feed`.
+
+        Args:
+            url: A URL this extractor can handle
+
+        Returns:
+            str | None: The feed URL, or None if the site has no feed for it
+        """
+        return None
+
+    def parse_feed(self, content: Iterable[bytes], url: str) -> Iterator[tuple[str, Extraction]]:
+        """
+        Lists the items of a feed fetched from `feed_url(url)`, parsing its body as it arrives.
+
+        Args:
+            content: The body of the feed, in chunks
+            url: The URL the feed was looked up for
+
+        Returns:
+            Iterator[tuple[str, Extraction]]: The URL and extraction of each item
+
+        Raises:
+            ExtractionError: If the extractor has no feeds, i.e. `feed_url` always returns None
+        """
+        raise ExtractionError(_ERR_NO_FEED.format(name=self.name))
+
+    def extract_all(self, url: str) -> Iterator[Extraction] | None:
+        """
+        Lists every item a series, speaker or feed URL points at, fetching only as they are consumed.
+
+        By default the items of the URL's feed are listed if the extractor has one (see `feed_url`).
+        Extractors of sites with paginated listings override this. Use `torah_dl.extract_all`, which
+        also extracts the URLs of single items.
+
+        Args:
+            url: A URL this extractor can handle
+
+        Returns:
+            Iterator[Extraction] | None: The extraction of each item, or None if the URL points at a single item
+
+        Raises:
+            NetworkError: If the feed cannot be fetched
+        """
+        if (feed_url := self.feed_url(url)) is None:
+            return None
+        return self._list_feed(feed_url, url)
+
+    def _list_feed(self, feed_url: str, url: str) -> Iterator[Extraction]:
+        try:
+            response = http.get(feed_url, stream=True)
+        except requests.RequestException as e:
+            raise NetworkError(str(e)) from e
+
+        with response:
+            try:
+                response.raise_for_status()
+                for _, extraction in self.parse_feed(response.iter_content(FEED_CHUNK_SIZE), url):
+                    yield extraction
+            except requests.RequestException as e:
+                raise NetworkError(str(e)) from e
+
     @abstractmethod
     def extract(self, url: str) -> Extraction:
         """
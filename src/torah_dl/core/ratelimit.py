@@ -0,0 +1,297 @@
+import threading
+import time
+import zlib
+from collections.abc import Callable
+from multiprocessing.context import BaseContext
+from urllib.parse import urlparse
+
+from pydantic import BaseModel, Field
+
+from .exceptions import DeadlineExceededError
+
+# How many buckets of the default rate limit are shared between processes, see `HostRateLimiter.use_buckets()`
+SHARED_DEFAULT_BUCKETS = 64
+
+
+class RateLimit(BaseModel):
+    """A sustained request rate and the burst allowed on top of it."""
+
+    rate: float = Field(gt=0, description="Requests per second")
+    burst: float = Field(default=1.0, ge=1, description="Requests that may be sent back to back")
+
+
+class TokenBucket:
+    """A thread-safe token bucket.
+
+    Callers reserve tokens up front and then sleep off any deficit outside the lock,
+    so concurrent callers are served in the order they arrived.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Takes tokens from the bucket, returning how long the caller must wait before using them."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1.0, timeout: float | None = None) -> float:
+        """Blocks until tokens are available, returning the time spent waiting.
+
+        Raises:
+            DeadlineExceededError: If the wait would be longer than `timeout`; the tokens are returned
+        """
+        wait = self.reserve(tokens)
+        if timeout is not None and wait > timeout:
+            self._refund(tokens)
+            raise DeadlineExceededError()
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def _refund(self, tokens: float) -> None:
+        with self._lock:
+            self._tokens += tokens
+
+
+class SharedTokenBucket(TokenBucket):
+    """A token bucket whose tokens are shared by every process it is passed to.
+
+    Its state lives in shared memory, so a copy passed to a process started from `context` draws
+    on the same tokens. The clock must be the same in every process, as `time.monotonic` is.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        context: BaseContext,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        super().__init__(rate, burst, clock, sleep)
+        # the number of tokens, and when it was last brought up to date
+        self._state = context.Array("d", [burst, clock()])
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        with self._state.get_lock():
+            now = self._clock()
+            available = min(self.burst, self._state[0] + (now - self._state[1]) * self.rate) - tokens
+            self._state[0], self._state[1] = available, now
+        return 0.0 if available >= 0 else -available / self.rate
+
+    def _refund(self, tokens: float) -> None:
+        with self._state.get_lock():
+            self._state[0] += tokens
+
+    def __getstate__(self) -> dict[str, object]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict[str, object]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+class HostRateLimiter:
+    """Keeps one token bucket per host so each site is paced independently."""
+
+    def __init__(self, default: RateLimit | None = None):
+        self.default = default
+        self._limits: dict[str, RateLimit | None] = {}
+        self._buckets: dict[str, TokenBucket] = {}
+        self._default_buckets: list[TokenBucket] = []
+        self._lock = threading.Lock()
+
+    def configure(self, host: str, limit: RateLimit | None) -> None:
+        """Sets the rate limit of a host; None removes any limit."""
+        host = normalize_host(host)
+        with self._lock:
+            self._limits[host] = limit
+            self._buckets.pop(host, None)
+
+    def set_default(self, limit: RateLimit | None) -> None:
+        """Sets the rate limit of hosts that were not configured individually."""
+        with self._lock:
+            self.default = limit
+            self._buckets.clear()
+            self._default_buckets = []
+
+    def shared_buckets(
+        self, context: BaseContext
+    ) -> tuple[dict[str, SharedTokenBucket | None], list[SharedTokenBucket]]:
+        """Returns buckets in shared memory for processes started from `context`, see `use_buckets()`.
+
+        Returns:
+            tuple: A bucket for each host configured individually (None where it is unlimited), and
+                `SHARED_DEFAULT_BUCKETS` buckets of the default limit, which other hosts are spread over
+        """
+        with self._lock:
+            buckets = {
+                host: SharedTokenBucket(limit.rate, limit.burst, context) if limit is not None else None
+                for host, limit in self._limits.items()
+            }
+            default = self.default
+        if default is None:
+            return buckets, []
+        return buckets, [SharedTokenBucket(default.rate, default.burst, context) for _ in range(SHARED_DEFAULT_BUCKETS)]
+
+    def use_buckets(self, buckets: dict[str, TokenBucket | None], default_buckets: list[TokenBucket]) -> None:
+        """Replaces every limit with the given buckets, e.g. from `shared_buckets()` in another process.
+
+        Hosts that were not configured individually draw on one of `default_buckets`, chosen by a hash
+        of their name that is the same in every process. So the limits hold for all the processes
+        together; two such hosts may share a bucket, which only ever makes them slower.
+        """
+        with self._lock:
+            self._limits = {
+                host: RateLimit(rate=bucket.rate, burst=bucket.burst) if bucket is not None else None
+                for host, bucket in buckets.items()
+            }
+            self._buckets = {host: bucket for host, bucket in buckets.items() if bucket is not None}
+            self._default_buckets = list(default_buckets)
+            self.default = (
+                RateLimit(rate=default_buckets[0].rate, burst=default_buckets[0].burst) if default_buckets else None
+            )
+
+    def limit_for(self, host: str) -> RateLimit | None:
+        """Returns the rate limit that applies to a host."""
+        return self._limits.get(normalize_host(host), self.default)
+
+    def acquire(self, host: str, timeout: float | None = None) -> float:
+        """Blocks until a request to the host is allowed, returning the time spent waiting."""
+        host = normalize_host(host)
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            with self._lock:
+                if (bucket := self._buckets.get(host)) is None:
+                    if (limit := self._limits.get(host, self.default)) is None:
+                        return 0.0
+                    if host not in self._limits and self._default_buckets:
+                        index = zlib.crc32(host.encode()) % len(self._default_buckets)
+                        bucket = self._buckets[host] = self._default_buckets[index]
+                    else:
+                        bucket = self._buckets[host] = TokenBucket(limit.rate, limit.burst)
+        return bucket.acquire(timeout=timeout)
+
+
+class BandwidthLimiter:
+    """Caps the bytes per second that downloads in this process receive, overall and per host.
+
+    A download takes tokens for every chunk it receives and sleeps off any deficit before reading
+    the next one, so it never has more than one chunk waiting: concurrent downloads share the budget
+    equally, served in the order their chunks arrived, and whatever one does not use is left to the
+    others. While a download sleeps its socket is not read, so TCP slows the sender down.
+    """
+
+    def __init__(
+        self,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self._clock = clock
+        self._sleep = sleep
+        self._rates: dict[str | None, float] = {}
+        self._buckets: dict[str | None, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, rate: float | None, host: str | None = None) -> None:
+        """Sets the bytes per second of a host, or of all downloads together if `host` is None.
+
+        A rate of None removes the cap.
+        """
+        key = normalize_host(host) if host is not None else None
+        with self._lock:
+            if rate is None:
+                self._rates.pop(key, None)
+            else:
+                self._rates[key] = rate
+            self._buckets.pop(key, None)
+
+    def limits(self) -> dict[str | None, float]:
+        """Returns the configured caps, keyed by host, with None for the overall cap."""
+        with self._lock:
+            return dict(self._rates)
+
+    def shared_buckets(self, context: BaseContext) -> dict[str | None, SharedTokenBucket]:
+        """Returns a bucket in shared memory for each configured cap, for processes started from `context`.
+
+        Passing them to `use_buckets()` in each of those processes makes the caps hold for all of
+        them together, rather than for each one.
+        """
+        return {key: SharedTokenBucket(rate, burst=rate, context=context) for key, rate in self.limits().items()}
+
+    def use_buckets(self, buckets: dict[str | None, TokenBucket]) -> None:
+        """Replaces every cap with the given buckets, e.g. from `shared_buckets()` in another process."""
+        with self._lock:
+            self._rates = {key: bucket.rate for key, bucket in buckets.items()}
+            self._buckets = dict(buckets)
+
+    def consume(self, host: str, size: int) -> float:
+        """Accounts for `size` bytes received from a host, sleeping as long as needed to keep under the caps.
+
+        Returns:
+            float: The time spent sleeping
+        """
+        buckets = [bucket for key in (None, normalize_host(host)) if (bucket := self._bucket(key)) is not None]
+        wait = max((bucket.reserve(size) for bucket in buckets), default=0.0)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def _bucket(self, key: str | None) -> TokenBucket | None:
+        if (bucket := self._buckets.get(key)) is not None or key not in self._rates:
+            return bucket
+        with self._lock:
+            if (bucket := self._buckets.get(key)) is None and (rate := self._rates.get(key)) is not None:
+                # allow a second's worth of bytes at once, so a download can start at full speed
+                bucket = self._buckets[key] = TokenBucket(rate, burst=rate, clock=self._clock)
+            return bucket
+
+
+def normalize_host(host_or_url: str) -> str:
+    """Reduces a host or URL to a lowercase host name without port or leading "www."."""
+    host = urlparse(host_or_url).hostname if "://" in host_or_url else host_or_url.split(":")[0]
+    host = (host or "").lower()
+    return host.removeprefix("www.")
+
+
+RATE_LIMITER = HostRateLimiter()
+
+
+def set_rate_limit(host: str, rate: float | None, burst: float = 1.0) -> None:
+    """Limits requests to a host to `rate` per second; a rate of None removes the limit."""
+    RATE_LIMITER.configure(host, RateLimit(rate=rate, burst=burst) if rate is not None else None)
+
+
+def set_default_rate_limit(rate: float | None, burst: float = 1.0) -> None:
+    """Sets the rate limit for hosts without one of their own; None means unlimited."""
+    RATE_LIMITER.set_default(RateLimit(rate=rate, burst=burst) if rate is not None else None)
+
+
+BANDWIDTH = BandwidthLimiter()
+
+
+def set_bandwidth_limit(rate: float | None, host: str | None = None) -> None:
+    """Limits downloads from a host, or all downloads if `host` is None, to `rate` bytes per second.
+
+    A rate of None removes the limit.
+    """
+    BANDWIDTH.configure(rate, host)
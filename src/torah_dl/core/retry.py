@@ -0,0 +1,169 @@
+import random
+import threading
+import time
+from collections.abc import Callable
+
+import requests
+from pydantic import BaseModel, Field
+
+from .exceptions import CircuitOpenError, ContentExtractionError, DeadlineExceededError, NetworkError
+from .transport import CassetteMissError
+
+TRANSIENT_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class RetryPolicy(BaseModel):
+    """How often and how patiently transient request failures are retried.
+
+    Delays grow exponentially from `base_delay` up to `max_delay`; with `jitter` each delay is
+    drawn uniformly from zero to that bound ("full jitter") so retrying clients spread out.
+    """
+
+    max_attempts: int = Field(default=3, ge=1)
+    base_delay: float = Field(default=0.5, ge=0)
+    max_delay: float = Field(default=10.0, ge=0)
+    jitter: bool = True
+
+    def delay(self, attempt: int, retry_after: str | None = None) -> float:
+        """Returns how long to wait before retrying after the given (zero-based) attempt failed."""
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_delay)
+        bound = min(self.max_delay, self.base_delay * 2**attempt)
+        return random.uniform(0, bound) if self.jitter else bound  # noqa: S311
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+_retry_policy = RetryPolicy()
+
+
+def get_retry_policy() -> RetryPolicy:
+    """Returns the retry policy applied to every request."""
+    return _retry_policy
+
+
+def set_retry_policy(policy: RetryPolicy) -> None:
+    """Replaces the retry policy applied to every request; use `NO_RETRY` to disable retries."""
+    global _retry_policy
+    _retry_policy = policy
+
+
+def is_transient(error: BaseException | None = None, status: int | None = None) -> bool:
+    """Whether a failed request is worth retrying.
+
+    Timeouts, dropped connections and 408/429/5xx responses are transient; anything else, including
+    a 404 or a page that does not contain a download URL, will fail the same way again.
+    """
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    if isinstance(error, CassetteMissError):
+        return False
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code in TRANSIENT_STATUSES
+    return isinstance(error, (requests.Timeout, requests.ConnectionError))
+
+
+class CircuitBreaker:
+    """Fails fast for a site that keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls fail immediately
+    with `CircuitOpenError`. Once `reset_timeout` seconds have passed a single trial call is let
+    through: if it succeeds the circuit closes, otherwise it stays open for another `reset_timeout`.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    def before_call(self) -> None:
+        """Raises `CircuitOpenError` unless a call may go ahead."""
+        with self._lock:
+            if self._state == self.OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError(self.name)
+                # let exactly one trial call through; the others keep failing fast until it reports back
+                self._state = self.HALF_OPEN
+            elif self._state == self.HALF_OPEN:
+                raise CircuitOpenError(self.name)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._state = self.CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+    def record(self, error: BaseException | None) -> None:
+        """Records the outcome of a call; only errors suggesting the site is down count as failures.
+
+        A `NetworkError` is judged by the request error it wraps, so a 404 does not count, and a
+        `DeadlineExceededError` never does: it says the caller ran out of time, not that the site is down.
+        """
+        if error is None or isinstance(error, ContentExtractionError):
+            self.record_success()
+        elif isinstance(error, DeadlineExceededError):
+            with self._lock:
+                if self._state == self.HALF_OPEN:
+                    # the trial call was cut short; the next call becomes the trial instead
+                    self._state = self.OPEN
+        elif _is_site_failure(error):
+            self.record_failure()
+        else:
+            # the site answered, so the call says nothing about whether it is down
+            with self._lock:
+                if self._state == self.HALF_OPEN:
+                    self._state = self.CLOSED
+
+
+def _is_site_failure(error: BaseException) -> bool:
+    """Whether an error suggests the site is down, looking through a `NetworkError` to its cause."""
+    if isinstance(error, NetworkError) and error.__cause__ is not None:
+        error = error.__cause__
+    elif isinstance(error, NetworkError):
+        return True
+    return is_transient(error)
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker(name: str) -> CircuitBreaker:
+    """Returns the circuit breaker of an extractor, creating it on first use."""
+    if (breaker := _breakers.get(name)) is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def reset_circuit_breakers() -> None:
+    """Closes every circuit breaker, e.g. after a site has been fixed."""
+    with _breakers_lock:
+        _breakers.clear()
@@ -0,0 +1,69 @@
+import hashlib
+from collections.abc import Iterable, Iterator
+
+from pydantic import BaseModel, Field, model_validator
+
+from .exceptions import ExtractorNotFoundError
+from .extract import get_extractor
+
+
+class InvalidShardError(ValueError):
+    """Raised when a shard is not given as i/N with 1 <= i <= N."""
+
+    def __init__(self, shard: str):
+        super().__init__(f"invalid shard {shard!r}; expected i/N with 1 <= i <= N")
+
+
+class Shard(BaseModel):
+    """One of `count` disjoint parts of a list of URLs, numbered from 1."""
+
+    index: int = Field(ge=1)
+    count: int = Field(ge=1)
+
+    @model_validator(mode="after")
+    def _index_in_range(self) -> "Shard":
+        if self.index > self.count:
+            raise InvalidShardError(f"{self.index}/{self.count}")
+        return self
+
+    @classmethod
+    def parse(cls, shard: str) -> "Shard":
+        """Parses a shard written as i/N, e.g. "2/8"."""
+        index, _, count = shard.partition("/")
+        try:
+            return cls(index=int(index), count=int(count))
+        except ValueError:
+            raise InvalidShardError(shard) from None
+
+    def contains(self, url: str) -> bool:
+        """Whether a URL belongs to this shard.
+
+        URLs are assigned by a stable hash of the item they point at (see `shard_key`), so every
+        node agrees on the split without coordinating, and different URLs of the same item always
+        land in the same shard.
+        """
+        digest = hashlib.sha256(shard_key(url).encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") % self.count == self.index - 1
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+def shard_key(url: str) -> str:
+    """Returns the identity of the item a URL points at: its canonical id, or the URL itself.
+
+    Canonical ids are not prefixed with the extractor, as the same item can be reached through
+    different sites, e.g. a YUTorah shiur through Orayta.
+    """
+    try:
+        extractor = get_extractor(url)
+    except ExtractorNotFoundError:
+        return url.strip()
+    return extractor.canonical_id(url)
+
+
+def shard_urls(urls: Iterable[str], shard: Shard | str) -> Iterator[str]:
+    """Yields the URLs that belong to a shard."""
+    if isinstance(shard, str):
+        shard = Shard.parse(shard)
+    return (url for url in urls if shard.contains(url))
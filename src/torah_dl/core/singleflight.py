@@ -0,0 +1,64 @@
+import threading
+from collections.abc import Callable, Hashable
+from typing import Generic, TypeVar
+
+from .exceptions import DeadlineExceededError
+
+T = TypeVar("T")
+
+
+class _Call(Generic[T]):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: T | None = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight(Generic[T]):
+    """Coalesces concurrent calls for the same key into one.
+
+    The first caller for a key runs the function; callers arriving while it is still running
+    wait for it and share its result, or its exception. Nothing is cached once the call ends.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, _Call[T]] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], T], timeout: float | None = None) -> tuple[T, bool]:
+        """Runs `fn`, or waits for an identical call already in flight.
+
+        Args:
+            key: Identifies calls that may share a result
+            fn: The function to run
+            timeout: How long a waiting caller may wait for the call in flight
+
+        Returns:
+            tuple[T, bool]: The result, and whether it was shared with another caller
+
+        Raises:
+            DeadlineExceededError: If a waiting caller timed out
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise DeadlineExceededError()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
@@ -0,0 +1,181 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from pydantic import BaseModel
+
+from .download import DownloadResult, download
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl that makes a file share the extents of another, copy-on-write (Btrfs, XFS, ...)
+_FICLONE = 0x40049409
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    download_url TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    md5 TEXT,
+    size INTEGER NOT NULL,
+    added_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS media_sha256 ON media (sha256);
+"""
+
+
+class StoredMedia(BaseModel):
+    """A download URL whose content is in a `MediaStore`."""
+
+    download_url: str
+    sha256: str
+    md5: str | None = None
+    size: int
+
+
+class MediaStore:
+    """A content-addressed store of downloaded files, so the same media is only kept, and fetched, once.
+
+    Files are kept under `root/objects`, named by their SHA-256, and an index in `root/index.db`
+    maps every download URL to the hash of its content. Output paths are hard links to the stored
+    file, or reflinks (copy-on-write clones) where hard links are not possible; keep the store on
+    the same file system as the output directories, or files are copied instead.
+
+    A download URL already in the index is never fetched again, and a file whose content is
+    already stored under another URL (e.g. a YUTorah shiur also reached through TorahApp) is
+    replaced by a link to the stored copy.
+
+    Hard links share their content with the store, so files should not be modified in place.
+
+    Args:
+        root: The directory holding the store
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        (self.root / "objects").mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(
+            self.root / "index.db", check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(_SCHEMA)
+
+    def object_path(self, sha256: str) -> Path:
+        """Returns where the file with a given SHA-256 is stored."""
+        return self.root / "objects" / sha256[:2] / sha256
+
+    def get(self, download_url: str) -> StoredMedia | None:
+        """Returns what is stored for a download URL, if its file is still in the store."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT download_url, sha256, md5, size FROM media WHERE download_url = ?", (download_url,)
+            ).fetchone()
+        if row is None:
+            return None
+        media = StoredMedia(download_url=row[0], sha256=row[1], md5=row[2], size=row[3])
+        return media if self.object_path(media.sha256).exists() else None
+
+    def add(self, download_url: str, path: Path, sha256: str, md5: str | None = None) -> Path:
+        """Stores a downloaded file and indexes its download URL.
+
+        If the content is already stored, `path` is replaced by a link to the stored copy;
+        otherwise the stored copy is linked to `path`.
+
+        Returns:
+            Path: Where the content is stored
+        """
+        stored = self.object_path(sha256)
+        if stored.exists():
+            _link(stored, path)
+        else:
+            stored.parent.mkdir(exist_ok=True)
+            _link(path, stored)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO media (download_url, sha256, md5, size, added_at) VALUES (?, ?, ?, ?, ?)",
+                (download_url, sha256, md5, path.stat().st_size, time.time()),
+            )
+        return stored
+
+    def download(self, url: str, output_path: Path | BinaryIO, **kwargs: Any) -> DownloadResult:
+        """Downloads a file through the store.
+
+        A URL whose content is stored is linked to `output_path` without any request; anything
+        else is downloaded with `download()`, which takes the same keyword arguments, and stored.
+        A stream is given the stored copy if there is one, and is otherwise passed to `download()`;
+        what is written to a stream is not stored.
+
+        Returns:
+            DownloadResult: As `download()`; `downloaded` is False if the file came from the store
+        """
+        if not isinstance(output_path, str | os.PathLike):
+            if (media := self.get(url)) is None:
+                return download(url, output_path, **kwargs)
+            with open(self.object_path(media.sha256), "rb") as f:
+                shutil.copyfileobj(f, output_path)
+            output_path.flush()
+            if kwargs.get("fsync"):
+                os.fsync(output_path.fileno())
+            return DownloadResult(path=None, downloaded=False, size=media.size, sha256=media.sha256, md5=media.md5)
+
+        output_path = Path(output_path)
+        if (media := self.get(url)) is not None:
+            _link(self.object_path(media.sha256), output_path)
+            return DownloadResult(
+                path=output_path, downloaded=False, size=media.size, sha256=media.sha256, md5=media.md5
+            )
+
+        result = download(url, output_path, **kwargs)
+        if result.sha256 is not None:
+            self.add(url, output_path, result.sha256, result.md5)
+        return result
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM media").fetchone()[0]
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "MediaStore":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+def _link(source: Path, target: Path) -> None:
+    """Atomically replaces `target` with a hard link to `source`, or a reflink or copy of it."""
+    if target.exists() and os.path.samefile(source, target):
+        return
+    temp = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.link")
+    try:
+        try:
+            os.link(source, temp)
+        except OSError:
+            if not _reflink(source, temp):
+                shutil.copyfile(source, temp)
+        os.replace(temp, target)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+
+
+def _reflink(source: Path, target: Path) -> bool:
+    """Clones `source` into a new file at `target`, if the file system supports it."""
+    if fcntl is None:
+        return False
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        except OSError:
+            return False
+    return True
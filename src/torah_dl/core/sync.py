@@ -0,0 +1,108 @@
+from pathlib import Path
+
+import requests
+from pydantic import BaseModel, Field
+
+from . import http
+from .download import download, output_name
+from .exceptions import DownloadError, ExtractionError, NetworkError
+from .extract import get_extractor
+from .manifest import MANIFEST_NAME, FeedState, Manifest, ManifestEntry
+from .store import MediaStore
+
+
+class SyncNotSupportedError(ExtractionError):
+    """Raised when a URL does not point at a series that can be synced."""
+
+    def __init__(self, url: str):
+        super().__init__(f"no feed to sync for: {url}")
+
+
+class SyncResult(BaseModel):
+    """What a sync did."""
+
+    feed_url: str
+    not_modified: bool = Field(default=False, description="The feed was unchanged, so nothing was checked")
+    downloaded: list[str] = Field(default_factory=list, description="Paths of the files that were downloaded")
+    skipped: int = Field(default=0, description="Items whose files were already present")
+    failed: dict[str, str] = Field(default_factory=dict, description="The error of each download URL that failed")
+
+
+def sync(url: str, directory: Path, md5: bool = False, store: MediaStore | None = None) -> SyncResult:
+    """Downloads the items of a series that are not in a directory yet.
+
+    The feed is requested with the ETag and Last-Modified of the last complete sync, so an unchanged
+    feed costs a single 304. Items already recorded in the directory's manifest (and still on disk),
+    or whose file is already there and unchanged upstream, are skipped; the manifest is saved after
+    every download, so an interrupted sync resumes where it stopped. The feed's validators are only
+    stored once every item has been downloaded.
+
+    Args:
+        url: A URL of the series, e.g. a TorahApp podcast share link
+        directory: Where to save the files and the manifest
+        md5: Record the MD5 of each file in the manifest as well as its SHA-256
+        store: Download through this content-addressed store
+
+    Returns:
+        SyncResult: What was downloaded, skipped or failed
+
+    Raises:
+        ExtractorNotFoundError: If no extractor can handle the URL
+        SyncNotSupportedError: If the extractor cannot list the series
+        NetworkError: If the feed could not be fetched
+    """
+    extractor = get_extractor(url)
+    if (feed_url := extractor.feed_url(url)) is None:
+        raise SyncNotSupportedError(url)
+
+    manifest_path = directory / MANIFEST_NAME
+    manifest = Manifest.load(manifest_path)
+    result = SyncResult(feed_url=feed_url)
+
+    feed = manifest.feeds.get(feed_url)
+    try:
+        response = http.get(feed_url, headers=feed.conditional_headers() if feed else None)
+        if response.status_code == 304:
+            result.not_modified = True
+            return result
+        response.raise_for_status()
+    except requests.RequestException as e:
+        raise NetworkError(str(e)) from e
+
+    directory.mkdir(parents=True, exist_ok=True)
+    # the body is read up front, since the feed's connection would otherwise stay open through every download
+    for source_url, extraction in extractor.parse_feed((response.content,), url):
+        if manifest.has_file(extraction.download_url, directory):
+            result.skipped += 1
+            continue
+
+        path = directory / output_name(extraction)
+        try:
+            downloaded = (store.download if store else download)(
+                extraction.download_url, path, skip_unchanged=True, md5=md5
+            )
+        except DownloadError as e:
+            result.failed[extraction.download_url] = str(e.__cause__ or e)
+            continue
+
+        manifest.entries[extraction.download_url] = ManifestEntry(
+            source_url=source_url,
+            download_url=extraction.download_url,
+            path=path.name,
+            title=extraction.title,
+            size=downloaded.size,
+            sha256=downloaded.sha256,
+            md5=downloaded.md5,
+        )
+        manifest.save(manifest_path)
+        if downloaded.downloaded:
+            result.downloaded.append(str(path))
+        else:
+            result.skipped += 1
+
+    if not result.failed:
+        manifest.feeds[feed_url] = FeedState(
+            etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified")
+        )
+    manifest.save(manifest_path)
+    return result
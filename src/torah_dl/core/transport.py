@@ -0,0 +1,179 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Generator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Error messages
+_ERR_NO_CASSETTE_DIR = "TORAH_DL_CASSETTE_DIR must be set to record or replay"
+_ERR_UNKNOWN_MODE = "TORAH_DL_TRANSPORT must be one of: live, record, replay"
+
+# Request headers that change what the server sends back, and therefore form part of a cassette key.
+KEYED_HEADERS = ("Range", "If-None-Match", "If-Modified-Since")
+
+
+class CassetteMissError(requests.ConnectionError):
+    """Raised in replay mode when no recorded response exists for a request."""
+
+    def __init__(self, method: str, url: str):
+        super().__init__(f"no recorded response for {method.upper()} {url}")
+
+
+class Transport(ABC):
+    """Abstract base class for the layer that actually performs HTTP requests.
+
+    Every extractor and `download()` send their requests through the active transport,
+    so swapping it changes how the whole library talks to the network.
+    """
+
+    @abstractmethod
+    def send(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """
+        Performs a single HTTP request.
+
+        Args:
+            method: The HTTP method, e.g. "GET" or "HEAD"
+            url: The URL to request
+            **kwargs: Keyword arguments accepted by `requests.Session.request`
+
+        Returns:
+            requests.Response: The response to the request
+
+        Raises:
+            requests.RequestException: If the request fails
+        """
+        ...  # pragma: no cover
+
+
+class LiveTransport(Transport):
+    """Sends requests over the network using a pooled `requests.Session`."""
+
+    def __init__(self, session: requests.Session | None = None):
+        self.session = session or requests.Session()
+
+    def send(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        return self.session.request(method, url, **kwargs)
+
+
+class RecordingTransport(Transport):
+    """Sends requests through another transport and writes every exchange to a cassette directory."""
+
+    def __init__(self, cassette_dir: Path | str, inner: Transport | None = None):
+        self.cassette_dir = Path(cassette_dir)
+        self.inner = inner or LiveTransport()
+        self._lock = threading.Lock()
+
+    def send(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        response = self.inner.send(method, url, **kwargs)
+        # reading the body here also means streamed callers iterate over the in-memory copy
+        content = response.content
+        cassette = {
+            "request": {"method": method.upper(), "url": url, "headers": keyed_headers(kwargs.get("headers"))},
+            "response": {
+                "status_code": response.status_code,
+                "reason": response.reason,
+                "url": response.url,
+                "headers": dict(response.headers),
+                "body": base64.b64encode(content).decode("ascii"),
+            },
+        }
+        path = cassette_path(self.cassette_dir, method, url, kwargs.get("headers"))
+        with self._lock:
+            self.cassette_dir.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(cassette, indent=2, ensure_ascii=False), encoding="utf-8")
+        return response
+
+
+class ReplayTransport(Transport):
+    """Serves previously recorded responses from a cassette directory without touching the network."""
+
+    def __init__(self, cassette_dir: Path | str):
+        self.cassette_dir = Path(cassette_dir)
+
+    def send(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        path = cassette_path(self.cassette_dir, method, url, kwargs.get("headers"))
+        try:
+            cassette = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            raise CassetteMissError(method, url) from None
+
+        recorded = cassette["response"]
+        response = requests.Response()
+        response.status_code = recorded["status_code"]
+        response.reason = recorded["reason"]
+        response.url = recorded["url"]
+        response.headers = CaseInsensitiveDict(recorded["headers"])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response._content = base64.b64decode(recorded["body"])
+        response._content_consumed = True
+        return response
+
+
+def cassette_path(cassette_dir: Path, method: str, url: str, headers: dict[str, str] | None = None) -> Path:
+    """Returns the cassette file that stores the exchange for a given request."""
+    key = json.dumps([method.upper(), url, keyed_headers(headers)], sort_keys=True)
+    return cassette_dir / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]}.json"
+
+
+def keyed_headers(headers: dict[str, str] | None) -> dict[str, str]:
+    """Returns the request headers that change the response, and so identify a request along with its URL."""
+    if not headers:
+        return {}
+    lowered = {name.lower(): value for name, value in headers.items()}
+    return {name: lowered[name.lower()] for name in KEYED_HEADERS if name.lower() in lowered}
+
+
+_transport: Transport = LiveTransport()
+
+
+def get_transport() -> Transport:
+    """Returns the transport currently used for all requests."""
+    return _transport
+
+
+def set_transport(transport: Transport) -> None:
+    """Replaces the transport used for all requests."""
+    global _transport
+    _transport = transport
+
+
+@contextmanager
+def use_transport(transport: Transport) -> Generator[Transport, None, None]:
+    """Temporarily replaces the transport used for all requests."""
+    previous = get_transport()
+    set_transport(transport)
+    try:
+        yield transport
+    finally:
+        set_transport(previous)
+
+
+def transport_from_env() -> Transport | None:
+    """Builds a transport from the `TORAH_DL_TRANSPORT` and `TORAH_DL_CASSETTE_DIR` environment variables.
+
+    `TORAH_DL_TRANSPORT` may be "live", "record" or "replay"; the latter two require `TORAH_DL_CASSETTE_DIR`.
+
+    Returns:
+        Transport | None: The configured transport, or None when the default live transport should be used
+    """
+    mode = os.environ.get("TORAH_DL_TRANSPORT", "live").lower()
+    if mode == "live":
+        return None
+
+    cassette_dir = os.environ.get("TORAH_DL_CASSETTE_DIR")
+    if not cassette_dir:
+        raise ValueError(_ERR_NO_CASSETTE_DIR)
+
+    if mode == "record":
+        return RecordingTransport(cassette_dir)
+    if mode == "replay":
+        return ReplayTransport(cassette_dir)
+    raise ValueError(_ERR_UNKNOWN_MODE)
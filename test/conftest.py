@@ -0,0 +1,22 @@
+import pytest
+
+from torah_dl.core.retry import reset_circuit_breakers
+from torah_dl.core.transport import transport_from_env, use_transport
+
+
+@pytest.fixture(autouse=True, scope="session")
+def cassette_transport():
+    """Record or replay every request when TORAH_DL_TRANSPORT is set, so the suite can run offline."""
+    transport = transport_from_env()
+    if transport is None:
+        yield None
+        return
+
+    with use_transport(transport):
+        yield transport
+
+
+@pytest.fixture(autouse=True)
+def closed_circuit_breakers():
+    """Start every test with closed circuit breakers, so failures in one test cannot short-circuit the next."""
+    reset_circuit_breakers()
@@ -1,8 +1,15 @@
 import os
+import re
 
+import requests
 from typer.testing import CliRunner
 
 from torah_dl.cli import __version__, app
+from torah_dl.core.catalog import Catalog
+from torah_dl.core.jobs import JobQueue
+from torah_dl.core.manifest import MANIFEST_NAME, Manifest
+from torah_dl.core.models import Extraction
+from torah_dl.core.transport import Transport, use_transport
 
 runner = CliRunner()
 
@@ -58,3 +65,102 @@ def test_download_url(tmp_path):
     )
     assert result.exit_code == 0
     assert os.path.exists(tmp_path / "test.mp3")
+
+
+def test_search(tmp_path):
+    with Catalog(tmp_path / "catalog.db") as catalog:
+        catalog.add(
+            "http://torahmediaamerica.com/shiur-1024531.html",
+            Extraction(download_url="https://torahcdn.net/tdn/1024531.mp3", title="01 Introduction to Shoftim"),
+        )
+
+    result = runner.invoke(app, ["search", "shoftim", "--catalog", str(tmp_path / "catalog.db")])
+    assert result.exit_code == 0
+    assert "https://torahcdn.net/tdn/1024531.mp3" in result.output
+
+
+def test_queue_add_and_status(tmp_path):
+    queue = str(tmp_path / "queue.db")
+    result = runner.invoke(app, ["queue", "add", "--queue", queue], input="https://a.org/1\nhttps://a.org/2\n\n")
+    assert result.exit_code == 0
+    assert "Queued 2 new URLs" in result.output
+
+    result = runner.invoke(app, ["queue", "status", "--queue", queue])
+    assert result.exit_code == 0
+    assert re.search(r"pending\s+2", result.output)
+
+
+def test_queue_recover(tmp_path):
+    queue_path = tmp_path / "queue.db"
+    with JobQueue(queue_path) as queue:
+        queue.add(["https://a.org/1", "https://a.org/2"])
+        queue.claim("elsewhere:1:0")
+
+    result = runner.invoke(app, ["queue", "recover", "--queue", str(queue_path)])
+    assert result.exit_code == 0
+    assert "Released 1 claimed URLs" in result.output
+    with JobQueue(queue_path) as queue:
+        assert queue.get("https://a.org/1").claimed_by is None
+
+
+def test_queue_add_shard(tmp_path):
+    queue = str(tmp_path / "queue.db")
+    urls = [f"https://a.org/{i}" for i in range(20)]
+    added = 0
+    for shard in ("1/2", "2/2"):
+        result = runner.invoke(app, ["queue", "add", "--queue", queue, "--shard", shard, *urls])
+        assert result.exit_code == 0
+        added += int(re.search(r"Queued (\d+) new URLs", result.output).group(1))
+    assert added == len(urls)
+
+    result = runner.invoke(app, ["queue", "add", "--queue", queue, "--shard", "3/2", *urls])
+    assert result.exit_code != 0
+
+
+class _Site(Transport):
+    """Serves the same small page for every URL, so it is both a TorahMediaAmerica page and its audio."""
+
+    def send(self, method, url, **kwargs):
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200
+        response._content = b"<html><h2>Queued Shiur - Rabbi Example</h2></html>"
+        response._content_consumed = True
+        return response
+
+
+def test_queue_run_downloads_and_writes_the_manifest(tmp_path):
+    queue = str(tmp_path / "queue.db")
+    urls = [f"http://torahmediaamerica.com/shiur-{i}.html" for i in range(3)]
+    runner.invoke(app, ["queue", "add", "--queue", queue, *urls])
+
+    with use_transport(_Site()):
+        result = runner.invoke(app, ["queue", "run", "--queue", queue, str(tmp_path / "audio")])
+    assert result.exit_code == 0, result.output
+    assert re.search(r"done\s+3", result.output)
+    assert len(Manifest.load(tmp_path / "audio" / MANIFEST_NAME).entries) == 3
+
+
+def test_download_to_stdout(tmp_path):
+    with use_transport(_Site()):
+        result = runner.invoke(app, ["download", "http://torahmediaamerica.com/shiur-1.html", "-"])
+    assert result.exit_code == 0, result.output
+    assert result.stdout_bytes == b"<html><h2>Queued Shiur - Rabbi Example</h2></html>"
+
+
+class _Offline(Transport):
+    """Fails every request, as if there were no network."""
+
+    def send(self, method, url, **kwargs):
+        raise requests.ConnectionError(url)
+
+
+def test_extract_no_fetch():
+    url = "https://www.kolhalashon.com/new/Media/PlayShiur.aspx?FileName=34412186&English=True&Lang=English"
+    with use_transport(_Offline()):
+        result = runner.invoke(app, ["extract", url, "--url-only", "--no-fetch"])
+    assert result.exit_code == 0
+    assert result.output.strip() == "https://www.kolhalashon.com/mp3/NewArchive/34412/34412186.mp3"
+
+    result = runner.invoke(app, ["extract", url, "--no-fetch", "--record"])
+    assert result.exit_code != 0
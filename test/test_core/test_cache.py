@@ -0,0 +1,73 @@
+from utils import StubTransport
+
+from torah_dl import extract
+from torah_dl.core.cache import TTLCache
+from torah_dl.core.extractors.yutorah import resolve_classic_lecture
+from torah_dl.core.instrumentation import Observer, observe
+from torah_dl.core.transport import use_transport
+
+YUTORAH_HTML = b"""
+<html>
+  <head><title>YUTorah Online - Cached Shiur (Rabbi Example)</title></head>
+  <body><a href="https://download.yutorah.org/2024/1/2220001/cached-shiur-.mp3">mp3</a></body>
+</html>
+"""
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _CacheObserver(Observer):
+    def __init__(self):
+        self.lookups = []
+
+    def on_cache(self, cache, hit):
+        self.lookups.append((cache, hit))
+
+
+def test_entries_expire_and_evict():
+    clock = _FakeClock()
+    cache = TTLCache("test", maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    clock.now += 10
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+
+def test_lookups_are_reported():
+    cache = TTLCache("reported")
+    with observe(_CacheObserver()) as observer:
+        cache.get("missing")
+        cache.set("present", 1)
+        cache.get("present")
+
+    assert observer.lookups == [("reported", False), ("reported", True)]
+
+
+def test_yutorah_and_orayta_share_cached_resolution():
+    transport = StubTransport(YUTORAH_HTML)
+    with use_transport(transport):
+        yutorah = extract("https://www.yutorah.org/lectures/2220001/")
+        orayta = extract(
+            "https://www.orayta.org/orayta-torah/audio-shiurim.html?page=lecture&shiurID=2220001&shiurTitle=Cached"
+        )
+        lecture = resolve_classic_lecture("2220001")
+
+    assert len(transport.calls) == 1
+    assert yutorah.title == orayta.title == "Cached Shiur"
+    # only YUTorah drops the dash before the extension; Orayta keeps the URL as linked
+    assert yutorah.download_url.endswith("/cached-shiur.mp3")
+    assert yutorah.file_name == "cached-shiur.mp3"
+    assert orayta.download_url == lecture.download_url
+    assert orayta.download_url.endswith("/cached-shiur-.mp3")
@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+
+from torah_dl.core.catalog import Catalog
+from torah_dl.core.exceptions import ExtractorNotFoundError
+from torah_dl.core.models import Extraction
+
+
+def _extraction(shiur_id: int, title: str) -> Extraction:
+    return Extraction.trusted(
+        download_url=f"https://torahcdn.net/tdn/{shiur_id}.mp3",
+        title=title,
+        file_format="audio/mp3",
+        file_name=f"{shiur_id}.mp3",
+    )
+
+
+@pytest.fixture
+def catalog():
+    with Catalog() as catalog:
+        yield catalog
+
+
+def test_add_and_get(catalog):
+    catalog.add("http://torahmediaamerica.com/shiur-1024531.html", _extraction(1024531, "Introduction to Shoftim"))
+
+    entry = catalog.get("https://www.torahmediaamerica.com/shiur-1024531.html")
+    assert entry.canonical_id == "torahmediaamerica:1024531"
+    assert entry.extractor == "TorahMediaAmerica"
+    assert entry.to_extraction() == _extraction(1024531, "Introduction to Shoftim")
+    assert catalog.get("http://torahmediaamerica.com/shiur-1.html") is None
+
+
+def test_re_extraction_updates_the_entry(catalog):
+    url = "http://torahmediaamerica.com/shiur-1024531.html"
+    catalog.add(url, _extraction(1024531, "Old title"))
+    catalog.add(url, _extraction(1024531, "New title"))
+
+    assert len(catalog) == 1
+    entry = catalog.get(url)
+    assert entry.title == "New title"
+    assert entry.last_seen >= entry.first_seen
+    assert catalog.search("old") == []
+    assert [entry.title for entry in catalog.search("new")] == ["New title"]
+
+
+def test_add_many_in_batches(catalog):
+    items = (
+        (
+            f"http://torahmediaamerica.com/shiur-{i}.html",
+            _extraction(i, f"Shiur {i} on {'Shabbos' if i % 2 else 'Tefila'}"),
+        )
+        for i in range(2500)
+    )
+
+    assert catalog.add_many(items, batch_size=1000) == 2500
+    assert len(catalog) == 2500
+    assert len(catalog.search("shab", limit=5000)) == 1250
+    assert len(catalog.search("tefila shiur", limit=10)) == 10
+    assert catalog.search('"') == []
+
+
+def test_unknown_urls_are_rejected(catalog):
+    with pytest.raises(ExtractorNotFoundError):
+        catalog.add("https://www.gashmius.xyz/", _extraction(1, "Nothing"))
+
+
+def test_search_without_full_text(tmp_path, monkeypatch):
+    monkeypatch.setattr("torah_dl.core.catalog._FTS_SCHEMA", "CREATE VIRTUAL TABLE t USING no_such_module(x);")
+    with Catalog(tmp_path / "catalog.db") as catalog:
+        assert not catalog.full_text
+        catalog.add("http://torahmediaamerica.com/shiur-1.html", _extraction(1, "Hilchos Shabbos"))
+        assert [entry.title for entry in catalog.search("shabbos")] == ["Hilchos Shabbos"]
+
+    assert sqlite3.connect(tmp_path / "catalog.db").execute("SELECT COUNT(*) FROM extractions").fetchone() == (1,)
@@ -0,0 +1,113 @@
+import threading
+
+import pytest
+import requests
+from utils import StubTransport
+
+from torah_dl.core import http
+from torah_dl.core.concurrency import CONCURRENCY, AIMDLimiter, concurrency_limits
+from torah_dl.core.transport import use_transport
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_limit_grows_while_latency_is_stable():
+    limiter = AIMDLimiter(initial=2, maximum=4)
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release(0.1)
+
+    assert limiter.limit == pytest.approx(4)
+    assert limiter.in_flight == 0
+
+
+def test_limit_holds_when_latency_degrades():
+    limiter = AIMDLimiter(initial=2)
+    limiter.acquire()
+    limiter.release(0.1)
+    grown = limiter.limit
+
+    limiter.acquire()
+    limiter.release(5.0)
+    assert limiter.limit == pytest.approx(grown)
+
+
+def test_overload_backs_off_once_per_window():
+    clock = _FakeClock()
+    changes = []
+    limiter = AIMDLimiter(initial=16, on_change=changes.append, clock=clock)
+    limiter.acquire()
+    limiter.release(1.0)
+
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(1.0, overloaded=True)
+    assert int(limiter.limit) == 8
+
+    clock.now += 2
+    limiter.acquire()
+    limiter.release(1.0, overloaded=True)
+    assert int(limiter.limit) == 4
+    assert [int(c) for c in changes] == [8, 4]
+
+
+def test_acquire_blocks_at_limit():
+    limiter = AIMDLimiter(initial=1)
+    limiter.acquire()
+    acquired = threading.Event()
+
+    def _second():
+        limiter.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=_second)
+    thread.start()
+    assert not acquired.wait(0.05)
+
+    limiter.release(0.1)
+    assert acquired.wait(1)
+    thread.join()
+
+
+def test_server_errors_reduce_host_limit():
+    url = "https://overloaded.example/feed.xml"
+    with use_transport(StubTransport(b"", status_code=503)):
+        http.get(url)
+
+    assert concurrency_limits()["overloaded.example"] < CONCURRENCY.initial
+
+
+def test_timeouts_release_their_slot():
+    class _TimeoutTransport(StubTransport):
+        def send(self, method, url, **kwargs):
+            raise requests.Timeout()
+
+    with use_transport(_TimeoutTransport(b"")), pytest.raises(requests.Timeout):
+        http.get("https://slow.example/")
+
+    assert CONCURRENCY.limiter("slow.example").in_flight == 0
+
+
+def test_streamed_responses_hold_their_slot_until_read_or_closed():
+    limiter = CONCURRENCY.limiter("stream.example")
+    with use_transport(StubTransport(b"audio")):
+        read = http.get("https://stream.example/1.mp3", stream=True)
+        closed = http.get("https://stream.example/2.mp3", stream=True)
+        assert limiter.in_flight == 2
+
+        assert b"".join(read.iter_content(2)) == b"audio"
+        assert limiter.in_flight == 1
+        closed.close()
+        closed.close()
+        assert limiter.in_flight == 0
+
+        dropped = http.get("https://stream.example/3.mp3", stream=True)
+        assert limiter.in_flight == 1
+        del dropped
+        assert limiter.in_flight == 0
@@ -0,0 +1,108 @@
+import time
+
+import pytest
+from utils import StubTransport
+
+from torah_dl import extract
+from torah_dl.core import http
+from torah_dl.core.deadline import deadline, get_timeouts, remaining, request_timeout, set_timeouts
+from torah_dl.core.exceptions import DeadlineExceededError
+from torah_dl.core.transport import use_transport
+
+
+class _TimeoutRecordingTransport(StubTransport):
+    def __init__(self, delay: float = 0.0):
+        super().__init__(b"", headers={"Content-Type": "audio/mpeg"})
+        self.delay = delay
+        self.timeouts = []
+
+    def send(self, method, url, **kwargs):
+        self.timeouts.append(kwargs["timeout"])
+        time.sleep(self.delay)
+        return super().send(method, url, **kwargs)
+
+
+@pytest.fixture
+def timeouts():
+    previous = get_timeouts()
+    yield
+    set_timeouts(previous.connect, previous.read)
+
+
+def test_configured_timeouts_are_split(timeouts):
+    set_timeouts(connect=3, read=40)
+    transport = _TimeoutRecordingTransport()
+    with use_transport(transport):
+        http.get("https://example.org/")
+
+    assert transport.timeouts == [(3, 40)]
+
+
+def test_timeouts_are_capped_by_deadline():
+    with deadline(5):
+        connect, read = request_timeout(60)
+    assert 4 < connect <= 5
+    assert 4 < read <= 5
+    assert request_timeout((2, 60))[0] == 2
+
+
+def test_nested_deadline_cannot_extend():
+    with deadline(1):
+        with deadline(100):
+            assert remaining() <= 1
+        with deadline(None):
+            assert remaining() <= 1
+    assert remaining() is None
+
+
+def test_expired_deadline_cancels_further_requests():
+    transport = _TimeoutRecordingTransport(delay=0.05)
+    with use_transport(transport), deadline(0.03):
+        http.get("https://example.org/first")
+        with pytest.raises(DeadlineExceededError):
+            http.get("https://example.org/second")
+
+    assert len(transport.timeouts) == 1
+
+
+def test_extract_deadline_spans_all_requests():
+    transport = _TimeoutRecordingTransport(delay=0.05)
+    with use_transport(transport), pytest.raises(DeadlineExceededError):
+        # Kol Halashon needs a HEAD and then a ranged GET, which no longer fits in the budget
+        extract("https://www.kolhalashon.com/new/Media/PlayShiur.aspx?FileName=34412186", deadline=0.03)
+
+    assert len(transport.timeouts) == 1
+
+
+class _TrickleTransport(StubTransport):
+    """Streams a body one byte at a time, never waiting long enough to hit the read timeout."""
+
+    class _Body:
+        def __init__(self):
+            self.left = 50
+
+        def read(self, *_):
+            time.sleep(0.01)
+            self.left -= 1
+            return b"x" if self.left >= 0 else b""
+
+        def close(self):
+            pass
+
+    def send(self, method, url, **kwargs):
+        response = super().send(method, url, **kwargs)
+        response._content = False
+        response._content_consumed = False
+        response.raw = self._Body()
+        return response
+
+
+def test_deadline_bounds_streamed_body():
+    start = time.monotonic()
+    with use_transport(_TrickleTransport(b"")), deadline(0.05):
+        response = http.get("https://example.org/trickle.mp3", stream=True)
+        with pytest.raises(DeadlineExceededError):
+            for _ in response.iter_content(1):
+                pass
+
+    assert time.monotonic() - start < 0.4
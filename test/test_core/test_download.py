@@ -1,9 +1,54 @@
+import hashlib
+import io
 import os
 
 import pytest
+import requests
 
 from torah_dl import download
+from torah_dl.core.download import RemoteFile, partial_path, sidecar_path
 from torah_dl.core.exceptions import DownloadError
+from torah_dl.core.ratelimit import BandwidthLimiter
+from torah_dl.core.transport import Transport, use_transport
+
+AUDIO = b"ID3" + bytes(range(256)) * 16
+
+
+class _FileServer(Transport):
+    """Serves one file with an ETag that can be changed, counting the requests of each method.
+
+    Range requests are answered like a real server, including a 416 past the end of the file, and
+    the whole file is sent instead if their If-Range does not match the ETag.
+    """
+
+    def __init__(self, etag: str | None = '"v1"', length: int = len(AUDIO), content: bytes = AUDIO):
+        self.etag = etag
+        self.length = length
+        self.content = content
+        self.requests: list[str] = []
+
+    def send(self, method, url, **kwargs):
+        self.requests.append(method)
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200
+        response.headers["Content-Length"] = str(self.length)
+        if self.etag:
+            response.headers["ETag"] = self.etag
+        response._content = b"" if method == "HEAD" else self.content
+        headers = kwargs.get("headers") or {}
+        if (byte_range := headers.get("Range")) and headers.get("If-Range", self.etag) == self.etag:
+            start = int(byte_range.removeprefix("bytes=").rstrip("-"))
+            if start >= len(self.content):
+                response.status_code = 416
+                response.headers["Content-Range"] = f"bytes */{len(self.content)}"
+                response._content = b"<html>Range Not Satisfiable</html>"
+            else:
+                response.status_code = 206
+                response._content = self.content[start:]
+            response.headers["Content-Length"] = str(len(response._content))
+        response._content_consumed = True
+        return response
 
 
 def test_download(tmp_path):
@@ -17,3 +62,187 @@ def test_download(tmp_path):
 def test_download_failed(tmp_path):
     with pytest.raises(DownloadError):
         download("https://www.gashmius.xyz/", tmp_path / "test.mp3")
+
+
+def test_resuming_a_complete_partial_file_finishes_it(tmp_path):
+    output_path = tmp_path / "shiur.mp3"
+    partial_path(output_path).write_bytes(AUDIO)
+    with use_transport(_FileServer()):
+        result = download("https://example.com/shiur.mp3", output_path, offset=len(AUDIO), validator='"v1"')
+
+    assert (result.size, result.received) == (len(AUDIO), 0)
+    assert result.sha256 == hashlib.sha256(AUDIO).hexdigest()
+    assert output_path.read_bytes() == AUDIO
+    assert not partial_path(output_path).exists()
+
+
+def test_unsatisfiable_resume_starts_over(tmp_path):
+    output_path = tmp_path / "shiur.mp3"
+    partial_path(output_path).write_bytes(AUDIO + b"more than the file has")
+    server = _FileServer()
+    with use_transport(server):
+        result = download("https://example.com/shiur.mp3", output_path, offset=len(AUDIO) + 10, validator='"v1"')
+
+    assert server.requests == ["GET", "GET"]
+    assert result.received == len(AUDIO)
+    assert output_path.read_bytes() == AUDIO
+
+
+class _IgnoresIfRange(_FileServer):
+    """Answers Range requests without looking at If-Range."""
+
+    def send(self, method, url, **kwargs):
+        headers = {k: v for k, v in (kwargs.pop("headers", None) or {}).items() if k != "If-Range"}
+        return super().send(method, url, headers=headers, **kwargs)
+
+
+def test_resumed_downloads_start_over_if_the_file_changed(tmp_path, monkeypatch):
+    monkeypatch.setattr("torah_dl.core.download.CHECKPOINT_INTERVAL", 1000)
+    output_path = tmp_path / "shiur.mp3"
+    new = bytes(reversed(AUDIO))
+    checkpoints = []
+
+    for server, validator in (
+        (_FileServer('"v2"', content=new), '"v1"'),
+        (_IgnoresIfRange('"v2"', content=new), '"v1"'),
+        (_FileServer('"v2"', content=new), None),
+    ):
+        checkpoints.clear()
+        partial_path(output_path).write_bytes(AUDIO[:400])
+        with use_transport(server):
+            result = download(
+                "https://example.com/shiur.mp3",
+                output_path,
+                offset=400,
+                validator=validator,
+                checkpoint=lambda *checkpoint: checkpoints.append(checkpoint),
+            )
+        assert (result.received, output_path.read_bytes()) == (len(new), new)
+        assert checkpoints == [(len(new), '"v2"')]
+
+    # the version that was being downloaded is resumed
+    partial_path(output_path).write_bytes(new[:400])
+    with use_transport(_IgnoresIfRange('"v2"', content=new)):
+        result = download("https://example.com/shiur.mp3", output_path, offset=400, validator='"v2"')
+    assert (result.received, output_path.read_bytes()) == (len(new) - 400, new)
+
+
+def test_plain_downloads_leave_no_sidecar(tmp_path):
+    output_path = tmp_path / "shiur.mp3"
+    with use_transport(_FileServer()):
+        download("https://example.com/shiur.mp3", output_path, skip_unchanged=True)
+        download("https://example.com/shiur.mp3", output_path)
+        download("https://example.com/shiur.mp3", tmp_path / "other.mp3")
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["other.mp3", "shiur.mp3"]
+
+
+def test_unchanged_files_are_not_downloaded_again(tmp_path):
+    output_path = tmp_path / "shiur.mp3"
+    server = _FileServer()
+    with use_transport(server):
+        assert download("https://example.com/shiur.mp3", output_path, skip_unchanged=True).downloaded
+        assert RemoteFile.load(sidecar_path(output_path)) == RemoteFile(
+            etag='"v1"', size=len(AUDIO), sha256=hashlib.sha256(AUDIO).hexdigest()
+        )
+        skipped = download("https://example.com/shiur.mp3", output_path, skip_unchanged=True)
+        assert (skipped.downloaded, skipped.size, skipped.sha256) == (
+            False,
+            len(AUDIO),
+            hashlib.sha256(AUDIO).hexdigest(),
+        )
+        assert server.requests == ["GET", "HEAD"]
+
+        server.etag = '"v2"'
+        assert download("https://example.com/shiur.mp3", output_path, skip_unchanged=True).downloaded
+        assert server.requests == ["GET", "HEAD", "HEAD", "GET"]
+
+
+def test_files_are_downloaded_again_without_validators_or_if_modified_locally(tmp_path):
+    output_path = tmp_path / "shiur.mp3"
+    with use_transport(_FileServer(etag=None)):
+        download("https://example.com/shiur.mp3", output_path)
+        assert download("https://example.com/shiur.mp3", output_path, skip_unchanged=True).downloaded
+
+    with use_transport(_FileServer()):
+        download("https://example.com/shiur.mp3", output_path)
+        output_path.write_bytes(AUDIO[:100])
+        assert download("https://example.com/shiur.mp3", output_path, skip_unchanged=True).downloaded
+        assert output_path.read_bytes() == AUDIO
+
+
+def test_files_are_hashed_while_they_are_written(tmp_path):
+    with use_transport(_FileServer()):
+        result = download("https://example.com/shiur.mp3", tmp_path / "shiur.mp3", md5=True)
+    assert (result.size, result.sha256, result.md5) == (
+        len(AUDIO),
+        hashlib.sha256(AUDIO).hexdigest(),
+        hashlib.md5(AUDIO, usedforsecurity=False).hexdigest(),
+    )
+
+
+def test_files_are_preallocated_and_trimmed_to_what_was_sent(tmp_path, monkeypatch):
+    allocations = []
+    fallocate = getattr(os, "posix_fallocate", None)
+
+    def record(fd, offset, length):
+        allocations.append((offset, length))
+        if fallocate:
+            fallocate(fd, offset, length)
+
+    monkeypatch.setattr(os, "posix_fallocate", record, raising=False)
+    with use_transport(_FileServer(length=len(AUDIO) + 100)):
+        result = download("https://example.com/shiur.mp3", tmp_path / "shiur.mp3", fsync=True)
+
+    assert allocations == [(0, len(AUDIO) + 100)]
+    assert result.size == len(AUDIO)
+    assert (tmp_path / "shiur.mp3").read_bytes() == AUDIO
+
+
+def test_downloads_are_throttled(tmp_path, monkeypatch):
+    sleeps = []
+    limiter = BandwidthLimiter(clock=lambda: 0.0, sleep=sleeps.append)
+    limiter.configure(len(AUDIO) / 2, "example.com")
+    monkeypatch.setattr("torah_dl.core.download.BANDWIDTH", limiter)
+    with use_transport(_FileServer()):
+        download("https://example.com/shiur.mp3", tmp_path / "shiur.mp3")
+    assert sleeps == [pytest.approx(1.0)]
+
+
+def test_progress_is_reported_and_throughput_returned(tmp_path):
+    reports = []
+    with use_transport(_FileServer()):
+        result = download("https://example.com/shiur.mp3", tmp_path / "shiur.mp3", progress=reports.append)
+
+    assert (reports[0].done, reports[0].total) == (0, len(AUDIO))
+    assert (reports[-1].done, reports[-1].total, reports[-1].received) == (len(AUDIO), len(AUDIO), len(AUDIO))
+    assert reports[-1].eta == pytest.approx(0)
+    assert (result.received, result.size) == (len(AUDIO), len(AUDIO))
+    assert result.elapsed > 0
+    assert result.throughput == pytest.approx(len(AUDIO) / result.elapsed)
+
+
+def test_files_can_be_written_to_a_stream(tmp_path):
+    stream = io.BytesIO()
+    with use_transport(_FileServer()):
+        result = download("https://example.com/shiur.mp3", stream)
+        with pytest.raises(ValueError):
+            download("https://example.com/shiur.mp3", io.BytesIO(), offset=10)
+
+    assert stream.getvalue() == AUDIO
+    assert (result.path, result.size, result.sha256) == (None, len(AUDIO), hashlib.sha256(AUDIO).hexdigest())
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_streams_backed_by_a_file_can_be_flushed_to_disk(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(os, "fsync", synced.append)
+    with use_transport(_FileServer()):
+        with open(tmp_path / "shiur.mp3", "wb") as f:
+            download("https://example.com/shiur.mp3", f, fsync=True)
+            assert synced == [f.fileno()]
+        # a stream that is not backed by a file cannot be flushed to disk
+        with pytest.raises(ValueError):
+            download("https://example.com/shiur.mp3", io.BytesIO(), fsync=True)
+
+    assert (tmp_path / "shiur.mp3").read_bytes() == AUDIO
@@ -1,8 +1,9 @@
 import pytest
-from utils import get_all_the_tests
+from utils import StubTransport, get_all_the_tests
 
 from torah_dl import extract
-from torah_dl.core.exceptions import ExtractorNotFoundError
+from torah_dl.core.exceptions import DownloadURLError, ExtractorNotFoundError
+from torah_dl.core.transport import use_transport
 
 
 @pytest.mark.flaky(reruns=3)
@@ -17,3 +18,23 @@ def test_extract(extractor, url: str, download_url: str, title: str, file_format
 def test_extract_failed():
     with pytest.raises(ExtractorNotFoundError):
         extract("https://www.gashmius.xyz/")
+
+
+@pytest.mark.parametrize(
+    "extractor, url, download_url, title, file_format, valid",
+    [test for test in get_all_the_tests(only_valid=True) if test.values[0].DERIVES_DOWNLOAD_URL],
+)
+def test_extract_without_fetching_metadata(extractor, url, download_url, title, file_format, valid):
+    transport = StubTransport(b"")
+    with use_transport(transport):
+        extraction = extract(url, fetch_metadata=False)
+
+    assert transport.calls == []
+    assert extraction.download_url == download_url
+    assert extraction.file_format == file_format
+    assert extraction.title is None
+
+
+def test_extract_without_fetching_metadata_rejects_bad_urls():
+    with use_transport(StubTransport(b"")), pytest.raises(DownloadURLError):
+        extract("http://torahmediaamerica.com/shiur-foobar.html", fetch_metadata=False)
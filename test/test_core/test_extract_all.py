@@ -0,0 +1,113 @@
+import re
+import sys
+
+import pytest
+import requests
+
+from torah_dl import extract_all
+from torah_dl.core.exceptions import CircuitOpenError, ExtractorNotFoundError, NetworkError
+from torah_dl.core.extract import EXTRACTORS
+from torah_dl.core.extractors.torahapp import TorahAppExtractor
+from torah_dl.core.models import Extractor
+from torah_dl.core.transport import Transport, use_transport
+
+
+def _lecture(shiur_id: int) -> bytes:
+    return (
+        f"<html><head><title>YUTorah Online - Listed Shiur {shiur_id} (Rabbi Example)</title></head>"
+        f'<body><a href="https://download.yutorah.org/2024/1/{shiur_id}/listed-{shiur_id}.mp3">mp3</a></body></html>'
+    ).encode()
+
+
+class _Site(Transport):
+    """Serves fixed pages by URL and 404s everything else."""
+
+    def __init__(self, pages: dict[str, bytes]):
+        self.pages = pages
+        self.calls: list[str] = []
+
+    def send(self, method, url, **kwargs):
+        self.calls.append(url)
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200 if url in self.pages else 404
+        response._content = self.pages.get(url, b"")
+        response._content_consumed = True
+        return response
+
+
+def test_lecture_urls_yield_one_item():
+    site = _Site({"https://classic.yutorah.org/lectures/lecture_iframe.cfm/3310002": _lecture(3310002)})
+    with use_transport(site):
+        extractions = extract_all("https://www.yutorah.org/lectures/3310002/")
+        assert site.calls == []
+        extractions = list(extractions)
+
+    assert [extraction.title for extraction in extractions] == ["Listed Shiur 3310002"]
+
+
+class _DeadExtractor(Extractor):
+    """Handles a site that never answers."""
+
+    name = "Dead"
+    url_patterns = re.compile(r"https://dead\.example/")
+
+    def extract(self, url):
+        raise NetworkError() from requests.ConnectionError()
+
+
+def test_item_urls_count_towards_the_circuit(monkeypatch):
+    monkeypatch.setattr(sys.modules["torah_dl.core.extract"], "EXTRACTORS", [_DeadExtractor()])
+
+    for _ in range(5):
+        with pytest.raises(NetworkError):
+            list(extract_all("https://dead.example/a"))
+    with pytest.raises(CircuitOpenError):
+        list(extract_all("https://dead.example/a"))
+
+
+def test_feeds_are_listed(monkeypatch):
+    torahapp = next(extractor for extractor in EXTRACTORS if isinstance(extractor, TorahAppExtractor))
+    monkeypatch.setattr(torahapp, "podcasts_to_rss", {"TEST_2": "https://feeds.example.org/2.xml"})
+    items = "".join(
+        f'<item><guid>{guid}</guid><title>{title}</title><enclosure url="https://m.example.org/{guid}.mp3"/></item>'
+        for guid, title in [("a", "First"), ("b", "Second")]
+    )
+    feed = f"<rss><channel>{items}</channel></rss>".encode()
+    with use_transport(_Site({"https://feeds.example.org/2.xml": feed})):
+        series = [extraction.title for extraction in extract_all("https://torahapp.org/share/p/TEST_2")]
+        episode = [extraction.title for extraction in extract_all("https://torahapp.org/share/p/TEST_2/e/b")]
+
+    assert series == ["First", "Second"]
+    assert episode == ["Second"]
+
+
+def test_feed_lookup_failures_are_network_errors(monkeypatch):
+    torahapp = next(extractor for extractor in EXTRACTORS if isinstance(extractor, TorahAppExtractor))
+    monkeypatch.setattr(torahapp, "podcasts_to_rss", {})
+    with use_transport(_Site({})), pytest.raises(NetworkError):
+        list(extract_all("https://torahapp.org/share/p/TEST_3"))
+
+
+def test_unknown_urls_fail_immediately():
+    with pytest.raises(ExtractorNotFoundError):
+        extract_all("https://www.gashmius.xyz/")
+
+
+def test_feeds_are_parsed_as_they_arrive():
+    torahapp = next(extractor for extractor in EXTRACTORS if isinstance(extractor, TorahAppExtractor))
+    feed = (
+        b"<rss><channel><title>Podcast</title>"
+        b'<item><guid>https://youtu.be/a&feature=youtu.be</guid><title>First</title><enclosure url="https://m.example.org/a.mp3"/></item>'
+        b'<item><guid>b</guid><title>Second</title><enclosure url="https://m.example.org/b.mp3"/></item>'
+        b"</channel></rss>"
+    )
+    read = []
+    chunks = (read.append(i) or feed[i : i + 5] for i in range(0, len(feed), 5))
+
+    listed = torahapp.parse_feed(chunks, "https://torahapp.org/share/p/TEST_4")
+    first_url, first = next(listed)
+    assert len(read) < len(feed) / 5
+
+    assert first_url == "https://torahapp.org/share/p/TEST_4?e=https%3A%2F%2Fyoutu.be%2Fa"
+    assert [first.title, *(extraction.title for _, extraction in listed)] == ["First", "Second"]
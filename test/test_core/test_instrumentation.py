@@ -0,0 +1,69 @@
+import pytest
+from utils import StubTransport
+
+from torah_dl import extract
+from torah_dl.core.exceptions import ExtractorNotFoundError
+from torah_dl.core.instrumentation import Observer, observe
+from torah_dl.core.transport import use_transport
+
+VBM_HTML = b"""
+<html>
+  <head><title>Timed Title | VBM</title></head>
+  <body><audio src="https://cdn.example.org/timed.mp3"></audio></body>
+</html>
+"""
+
+
+class _RecordingObserver(Observer):
+    def __init__(self):
+        self.selected = []
+        self.requests = []
+        self.extractions = []
+
+    def on_extractor_selected(self, trace):
+        self.selected.append(trace.extractor)
+
+    def on_request(self, timing, trace):
+        self.requests.append((timing, trace))
+
+    def on_extraction(self, trace):
+        self.extractions.append(trace)
+
+
+def test_observer_receives_every_phase():
+    url = "https://etzion.org.il/en/timed"
+    with use_transport(StubTransport(VBM_HTML)), observe(_RecordingObserver()) as observer:
+        extraction = extract(url)
+
+    assert extraction.trace is None
+    assert observer.selected == ["Virtual Beit Midrash (Etzion)"]
+
+    (timing, trace) = observer.requests[0]
+    assert timing.host == "etzion.org.il"
+    assert timing.status == 200
+    assert timing.bytes_received == len(VBM_HTML)
+    assert trace.url == url
+
+    (trace,) = observer.extractions
+    assert trace.error is None
+    assert trace.requests == [timing]
+    assert trace.parse_time == pytest.approx(trace.extract_time - timing.latency - timing.queued)
+
+
+def test_trace_attached_to_result():
+    with use_transport(StubTransport(VBM_HTML)):
+        extraction = extract("https://etzion.org.il/en/timed", trace=True)
+
+    assert extraction.trace.extractor == "Virtual Beit Midrash (Etzion)"
+    assert len(extraction.trace.requests) == 1
+    assert extraction.trace.total_time >= extraction.trace.extract_time
+    assert "trace" not in extraction.model_dump()
+
+
+def test_failed_extraction_is_reported():
+    with observe(_RecordingObserver()) as observer, pytest.raises(ExtractorNotFoundError):
+        extract("https://www.gashmius.xyz/")
+
+    (trace,) = observer.extractions
+    assert trace.extractor is None
+    assert trace.error == "ExtractorNotFoundError"
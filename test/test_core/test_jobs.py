@@ -0,0 +1,203 @@
+import hashlib
+import multiprocessing
+import socket
+import threading
+import time
+
+import requests
+
+from torah_dl.core.deadline import get_timeouts, set_timeouts
+from torah_dl.core.download import partial_path
+from torah_dl.core.jobs import (
+    JobQueue,
+    JobState,
+    _SharedSettings,
+    process_queue,
+    process_queue_in_processes,
+    worker_prefix,
+)
+from torah_dl.core.metrics import EXTRACTIONS, disable_metrics, enable_metrics
+from torah_dl.core.models import Extraction
+from torah_dl.core.retry import NO_RETRY, get_retry_policy, set_retry_policy
+from torah_dl.core.transport import Transport, use_transport
+
+AUDIO = bytes(range(256)) * 64
+
+
+class _MediaSite(Transport):
+    """Serves TorahMediaAmerica pages and their audio, honoring Range requests."""
+
+    def __init__(self):
+        self.ranges: list[str | None] = []
+
+    def send(self, method, url, **kwargs):
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200
+        if url.startswith("http://torahmediaamerica.com/shiur-404"):
+            response.status_code = 404
+            response._content = b""
+        elif url.startswith("http://torahmediaamerica.com/"):
+            response._content = b"<html><h2>Queued Shiur - Rabbi Example</h2></html>"
+        else:
+            byte_range = (kwargs.get("headers") or {}).get("Range")
+            self.ranges.append(byte_range)
+            response.headers["ETag"] = '"v1"'
+            if byte_range:
+                response.status_code = 206
+                response._content = AUDIO[int(byte_range.removeprefix("bytes=").rstrip("-")) :]
+            else:
+                response._content = AUDIO
+        response._content_consumed = True
+        return response
+
+
+def test_jobs_are_queued_once_and_claimed_in_order(tmp_path):
+    with JobQueue(tmp_path / "queue.db") as queue:
+        assert queue.add(["https://a.org/1", "https://a.org/2"]) == 2
+        assert queue.add(["https://a.org/2", "https://a.org/3"]) == 1
+
+        first = queue.claim("w1")
+        second = queue.claim("w2")
+        assert (first.url, second.url) == ("https://a.org/1", "https://a.org/2")
+        assert queue.get("https://a.org/1").claimed_by == "w1"
+
+        assert queue.recover() == 2
+        assert queue.claim("w3").url == "https://a.org/1"
+        assert queue.counts()[JobState.PENDING] == 3
+
+
+def _dead_worker() -> str:
+    """Returns the name of a worker whose process on this host has exited."""
+    process = multiprocessing.get_context("spawn").Process(target=time.sleep, args=(0,))
+    process.start()
+    process.join()
+    return f"{socket.gethostname()}:{process.pid}:0"
+
+
+def test_only_stale_claims_are_recovered(tmp_path, monkeypatch):
+    with JobQueue(tmp_path / "queue.db") as queue:
+        queue.add([f"https://a.org/{i}" for i in range(4)])
+        dead = queue.claim(_dead_worker())
+        alive = queue.claim(f"{worker_prefix()}:0")
+        remote = queue.claim("elsewhere:1:0")
+        expired = queue.claim("elsewhere:2:0")
+
+        assert queue.recover_stale(lease=60) == 1
+        assert queue.get(dead.url).claimed_by is None
+        assert queue.get(alive.url).claimed_by == alive.claimed_by
+        assert queue.get(remote.url).claimed_by == remote.claimed_by
+
+        later = time.time() + 120
+        monkeypatch.setattr(time, "time", lambda: later)
+        queue.heartbeat(f"{worker_prefix()}:")
+        queue.heartbeat("elsewhere:1:")
+        assert queue.recover_stale(lease=60) == 1
+        assert queue.get(expired.url).claimed_by is None
+        assert queue.get(alive.url).claimed_by == alive.claimed_by
+        assert queue.get(remote.url).claimed_by == remote.claimed_by
+
+
+def test_running_workers_keep_their_claims(tmp_path):
+    with JobQueue(tmp_path / "queue.db") as queue, use_transport(_MediaSite()):
+        queue.add(["http://torahmediaamerica.com/shiur-5.html", "http://torahmediaamerica.com/shiur-6.html"])
+        other = queue.claim(f"{worker_prefix()}-other:0")
+        process_queue(queue, tmp_path, workers=1)
+
+        assert queue.get(other.url).claimed_by == other.claimed_by
+        assert queue.get(other.url).state is JobState.PENDING
+        assert queue.counts()[JobState.DONE] == 1
+
+
+def test_queue_is_processed_and_failures_recorded(tmp_path):
+    urls = ["http://torahmediaamerica.com/shiur-1.html", "http://torahmediaamerica.com/shiur-404.html"]
+    with JobQueue(tmp_path / "queue.db") as queue, use_transport(_MediaSite()):
+        queue.add(urls)
+        reports = []
+        process_queue(queue, tmp_path / "audio", workers=2, on_progress=lambda job, p: reports.append((job.url, p)))
+
+        done = queue.get(urls[0])
+        assert done.state is JobState.DONE
+        assert done.title == "Queued Shiur"
+        assert (tmp_path / "audio" / "1.mp3").read_bytes() == AUDIO
+        first = [progress for url, progress in reports if url == urls[0]]
+        assert first[-1] is None
+        assert first[-2].done == len(AUDIO)
+        assert [progress for url, progress in reports if url == urls[1]] == [None]
+        entry = queue.manifest(tmp_path / "audio").entries[done.download_url]
+        assert (entry.source_url, entry.path, entry.size) == (urls[0], "1.mp3", len(AUDIO))
+
+        failed = queue.get(urls[1])
+        assert failed.state is JobState.FAILED
+        assert failed.error == "DownloadURLError"
+        assert failed.claimed_by is None
+
+        assert queue.retry_failed() == 1
+        assert queue.get(urls[1]).state is JobState.PENDING
+
+
+def test_interrupted_download_resumes_from_its_checkpoint(tmp_path):
+    output_path = tmp_path / "2.mp3"
+    partial_path(output_path).write_bytes(AUDIO[:1000] + b"garbage written after the checkpoint")
+    site = _MediaSite()
+    with JobQueue(tmp_path / "queue.db") as queue, use_transport(site):
+        queue.add(["http://torahmediaamerica.com/shiur-2.html"])
+        job = queue.claim(_dead_worker())
+        queue.extracted(job.id, Extraction(download_url="https://torahcdn.net/tdn/2.mp3"), output_path)
+        queue.progress(job.id, 1000, '"v1"')
+        assert queue.get(job.url).validator == '"v1"'
+
+        process_queue(queue, tmp_path)
+
+        assert queue.get(job.url).state is JobState.DONE
+        assert queue.get(job.url).sha256 == hashlib.sha256(AUDIO).hexdigest()
+
+    assert site.ranges == ["bytes=1000-"]
+    assert output_path.read_bytes() == AUDIO
+    assert not partial_path(output_path).exists()
+
+
+def test_stopped_workers_start_nothing(tmp_path):
+    stop = threading.Event()
+    stop.set()
+    with JobQueue(tmp_path / "queue.db") as queue:
+        queue.add(["http://torahmediaamerica.com/shiur-3.html"])
+        process_queue(queue, tmp_path, stop=stop)
+        assert queue.counts()[JobState.PENDING] == 1
+
+
+def test_worker_processes_share_the_queue_and_report_metrics(tmp_path):
+    urls = [f"https://www.gashmius.xyz/{i}" for i in range(6)]
+    before = EXTRACTIONS.value(extractor="none", outcome="ExtractorNotFoundError")
+    progress = []
+    enable_metrics()
+    try:
+        with JobQueue(tmp_path / "queue.db") as queue:
+            queue.add([*urls, "https://www.gashmius.xyz/elsewhere"])
+            queue.claim(_dead_worker())
+            queue.claim("elsewhere:1:0")
+        process_queue_in_processes(tmp_path / "queue.db", tmp_path, processes=2, threads=2, on_progress=progress.append)
+    finally:
+        disable_metrics()
+
+    with JobQueue(tmp_path / "queue.db") as queue:
+        assert queue.counts()[JobState.FAILED] == 6
+        assert {job.error for job in queue.failures()} == {"ExtractorNotFoundError"}
+        assert all(job.claimed_by is None for job in queue.failures())
+        # a worker still running elsewhere keeps its job
+        assert queue.get(urls[1]).claimed_by == "elsewhere:1:0"
+    assert progress[-1][JobState.FAILED] == 6
+    assert EXTRACTIONS.value(extractor="none", outcome="ExtractorNotFoundError") - before == 6
+
+
+def test_worker_processes_take_on_the_settings_of_the_pool():
+    settings = _SharedSettings.share(multiprocessing.get_context("spawn"))
+    try:
+        set_timeouts(connect=1, read=2)
+        set_retry_policy(NO_RETRY)
+        settings.apply()
+        assert get_timeouts() == settings.timeouts
+        assert get_retry_policy() == settings.retry_policy
+    finally:
+        set_timeouts(settings.timeouts.connect, settings.timeouts.read)
+        set_retry_policy(settings.retry_policy)
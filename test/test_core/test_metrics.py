@@ -0,0 +1,90 @@
+import urllib.request
+
+import pytest
+from utils import StubTransport
+
+from torah_dl import download, extract
+from torah_dl.core import http
+from torah_dl.core.exceptions import ExtractorNotFoundError
+from torah_dl.core.metrics import (
+    DOWNLOADED_BYTES,
+    EXTRACTIONS,
+    HTTP_DURATION,
+    HTTP_IN_FLIGHT,
+    disable_metrics,
+    enable_metrics,
+    generate_metrics,
+    serve_metrics,
+)
+from torah_dl.core.transport import use_transport
+
+VBM_HTML = b"""
+<html>
+  <head><title>Metered | VBM</title></head>
+  <body><audio src="https://cdn.example.org/metered.mp3"></audio></body>
+</html>
+"""
+
+
+@pytest.fixture
+def metrics():
+    enable_metrics()
+    yield
+    disable_metrics()
+
+
+def test_extractions_are_counted_by_outcome(metrics):
+    extractor = "Virtual Beit Midrash (Etzion)"
+    before_ok = EXTRACTIONS.value(extractor=extractor, outcome="success")
+    before_missing = EXTRACTIONS.value(extractor="none", outcome="ExtractorNotFoundError")
+    before_requests = HTTP_DURATION.count(host="etzion.org.il")
+
+    with use_transport(StubTransport(VBM_HTML)):
+        extract("https://etzion.org.il/en/metered")
+    with pytest.raises(ExtractorNotFoundError):
+        extract("https://www.gashmius.xyz/")
+
+    assert EXTRACTIONS.value(extractor=extractor, outcome="success") == before_ok + 1
+    assert EXTRACTIONS.value(extractor="none", outcome="ExtractorNotFoundError") == before_missing + 1
+    assert HTTP_DURATION.count(host="etzion.org.il") == before_requests + 1
+    assert HTTP_IN_FLIGHT.value(host="etzion.org.il") == 0
+
+
+def test_downloaded_bytes(metrics, tmp_path):
+    before = DOWNLOADED_BYTES.value(host="cdn.example.org")
+    with use_transport(StubTransport(b"x" * 1000)):
+        download("https://cdn.example.org/metered.mp3", tmp_path / "metered.mp3")
+
+    assert DOWNLOADED_BYTES.value(host="cdn.example.org") == before + 1000
+    assert 'torah_dl_downloaded_bytes_total{host="cdn.example.org"}' in generate_metrics()
+
+
+def test_serve_metrics(metrics):
+    server = serve_metrics(0)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+            body = response.read().decode()
+    finally:
+        server.shutdown()
+
+    assert "# TYPE torah_dl_extractions_total counter" in body
+    assert "# TYPE torah_dl_http_request_duration_seconds histogram" in body
+
+
+class _EnablingTransport(StubTransport):
+    """Turns metrics on while a request is being sent."""
+
+    def send(self, method, url, **kwargs):
+        enable_metrics()
+        return super().send(method, url, **kwargs)
+
+
+def test_in_flight_ignores_requests_started_before_metrics_were_enabled():
+    disable_metrics()
+    try:
+        with use_transport(_EnablingTransport(b"x")):
+            http.get("https://midflight.example.org/")
+    finally:
+        disable_metrics()
+
+    assert HTTP_IN_FLIGHT.value(host="midflight.example.org") == 0
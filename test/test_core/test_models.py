@@ -0,0 +1,116 @@
+import pickle  # noqa: S403
+
+import pytest
+from utils import StubTransport
+
+from torah_dl import extract
+from torah_dl.core.exceptions import ExtractionError
+from torah_dl.core.extract import EXTRACTORS
+from torah_dl.core.models import Extraction, ExtractionRecord
+from torah_dl.core.transport import use_transport
+
+
+def test_deferred_field_is_resolved_once_on_access():
+    calls = []
+    extraction = Extraction(download_url="https://example.com/a.mp3").defer(title=lambda: calls.append(1) or "A")
+
+    assert "title" not in repr(extraction)
+    assert extraction.title == "A"
+    assert extraction.title == "A"
+    assert calls == [1]
+
+
+def test_deferred_fields_resolve_on_serialization():
+    extraction = Extraction(download_url="https://example.com/a.mp3").defer(title=lambda: "A", size=lambda: 10)
+
+    assert extraction.model_dump() == {
+        "title": "A",
+        "download_url": "https://example.com/a.mp3",
+        "file_format": None,
+        "file_name": None,
+        "size": 10,
+    }
+
+
+def test_copies_share_one_resolution():
+    calls = []
+    extraction = Extraction(download_url="https://example.com/a.mp3").defer(title=lambda: calls.append(1) or "A")
+    copy = extraction.model_copy()
+
+    assert copy.resolve().title == extraction.title == "A"
+    assert calls == [1]
+
+
+def test_copies_drop_resolved_fields_independently():
+    extraction = Extraction(download_url="https://example.com/a.mp3").defer(title=lambda: "A")
+    copy = extraction.model_copy()
+
+    assert extraction.title == "A"
+    assert extraction._deferred == {}
+    assert list(copy._deferred) == ["title"]
+    assert copy == extraction
+    assert copy.model_copy(update={"title": "B"}) == Extraction(download_url="https://example.com/a.mp3", title="B")
+
+
+def test_comparison_does_not_resolve():
+    calls = []
+    extraction = Extraction(download_url="https://example.com/a.mp3").defer(title=lambda: calls.append(1) or "A")
+
+    assert extraction == extraction.model_copy()
+    assert extraction != Extraction(download_url="https://example.com/a.mp3").defer(title=lambda: "A")
+    assert extraction != Extraction(download_url="https://example.com/a.mp3", title="A")
+    assert calls == []
+
+
+def test_deferred_extractions_can_be_pickled_and_deep_copied():
+    extraction = Extraction(download_url="https://example.com/a.mp3").defer(title=lambda: "A", size=lambda: 10)
+    pickled = pickle.loads(pickle.dumps(extraction))  # noqa: S301
+    copy = Extraction(download_url="https://example.com/a.mp3").defer(title=lambda: "A").model_copy(deep=True)
+
+    assert pickled == extraction == Extraction(download_url="https://example.com/a.mp3", title="A", size=10)
+    assert copy.title == "A"
+    assert copy._deferred == {}
+
+
+def test_only_optional_fields_can_be_deferred():
+    with pytest.raises(AttributeError):
+        Extraction(download_url="https://example.com/a.mp3").defer(download_url=lambda: "")
+
+
+def test_lazy_extract_skips_the_title_fetch():
+    transport = StubTransport(b"<html><h2>Lazy Shiur - Rabbi Example</h2></html>")
+    with use_transport(transport):
+        extraction = extract("http://torahmediaamerica.com/shiur-1024531.html", lazy=True)
+        assert transport.calls == []
+        assert extraction.title == "Lazy Shiur"
+
+    assert len(transport.calls) == 1
+
+
+def test_trusted_construction_matches_validated():
+    fields = {"download_url": "https://example.com/a.mp3", "title": "A", "file_format": "audio/mp3", "size": 10}
+    trusted = Extraction.trusted(**fields)
+
+    assert trusted == Extraction(**fields)
+    assert trusted.model_dump() == Extraction(**fields).model_dump()
+    assert trusted.model_dump(exclude_unset=True) == Extraction(**fields).model_dump(exclude_unset=True) == fields
+    trusted.title = "B"
+    assert trusted.defer(file_name=lambda: "a.mp3").file_name == "a.mp3"
+
+
+def test_record_round_trip():
+    extraction = Extraction(download_url="https://example.com/a.mp3", file_name="a.mp3").defer(title=lambda: "A")
+    record = extraction.to_record()
+
+    assert record == ExtractionRecord("https://example.com/a.mp3", "A", None, "a.mp3")
+    assert record.to_extraction() == extraction
+
+
+def test_extractors_without_derivation_or_feeds():
+    extractor = next(e for e in EXTRACTORS if not e.DERIVES_DOWNLOAD_URL)
+    url = extractor.EXAMPLES[0].url
+
+    assert extractor.derive(url) is None
+    assert extractor.feed_url(url) is None
+    with pytest.raises(ExtractionError):
+        list(extractor.parse_feed([], url))
@@ -0,0 +1,154 @@
+import multiprocessing
+
+import pytest
+from utils import StubTransport
+
+from torah_dl.core import http
+from torah_dl.core.exceptions import DeadlineExceededError
+from torah_dl.core.instrumentation import current_trace, tracing
+from torah_dl.core.ratelimit import (
+    RATE_LIMITER,
+    BandwidthLimiter,
+    HostRateLimiter,
+    RateLimit,
+    SharedTokenBucket,
+    TokenBucket,
+    normalize_host,
+)
+from torah_dl.core.transport import use_transport
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_allows_burst_then_paces():
+    clock = _FakeClock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock, sleep=clock.sleep)
+
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire() == pytest.approx(0.5)
+    clock.now += 10
+    assert bucket.acquire() == pytest.approx(0)
+
+
+def test_token_bucket_queues_concurrent_reservations_in_order():
+    clock = _FakeClock()
+    bucket = TokenBucket(rate=1, burst=1, clock=clock, sleep=clock.sleep)
+
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 1.0, 2.0]
+
+
+def test_host_limits_are_independent():
+    limiter = HostRateLimiter()
+    limiter.configure("www.slow.example", RateLimit(rate=1, burst=1))
+
+    assert limiter.limit_for("slow.example") == RateLimit(rate=1, burst=1)
+    assert limiter.limit_for("fast.example") is None
+    assert limiter.acquire("slow.example") == pytest.approx(0)
+    assert limiter.acquire("fast.example") == pytest.approx(0)
+    assert limiter.acquire("fast.example") == pytest.approx(0)
+
+
+def test_bandwidth_is_capped_overall_and_per_host():
+    clock = _FakeClock()
+    limiter = BandwidthLimiter(clock=clock, sleep=clock.sleep)
+    limiter.configure(1000)
+    limiter.configure(500, "www.slow.org")
+
+    assert limiter.consume("fast.org", 1000) == pytest.approx(0)
+    assert limiter.consume("fast.org", 1000) == pytest.approx(1.0)
+    clock.now += 10
+    assert limiter.consume("slow.org", 500) == pytest.approx(0)
+    assert limiter.consume("slow.org", 500) == pytest.approx(1.0)
+    assert limiter.limits() == {None: 1000, "slow.org": 500}
+
+    limiter.configure(None)
+    limiter.configure(None, "slow.org")
+    assert limiter.consume("slow.org", 10**9) == pytest.approx(0)
+
+
+def test_concurrent_downloads_share_bandwidth_in_turn():
+    clock = _FakeClock()
+    limiter = BandwidthLimiter(clock=clock, sleep=lambda _: None)
+    limiter.configure(100)
+
+    # chunks reserved by two downloads alternately are served in the order they arrived
+    waits = [limiter.consume(host, 100) for host in ("a.org", "b.org", "a.org", "b.org")]
+    assert waits == pytest.approx([0.0, 1.0, 2.0, 3.0])
+
+
+def test_shared_bucket_is_drawn_on_by_every_process():
+    context = multiprocessing.get_context("spawn")
+    bucket = SharedTokenBucket(1, burst=1000, context=context)
+
+    # the whole burst is used by another process, so this one has to wait for the bucket to refill
+    process = context.Process(target=bucket.reserve, args=(1000,))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    assert bucket.reserve(10) > 5
+
+    limiter = BandwidthLimiter()
+    limiter.configure(1000)
+    limiter.configure(500, "slow.org")
+    buckets = limiter.shared_buckets(context)
+    other = BandwidthLimiter()
+    other.use_buckets(buckets)
+    assert other.limits() == {None: 1000, "slow.org": 500}
+    limiter.use_buckets(buckets)
+    limiter.consume("slow.org", 500)
+    assert other.consume("slow.org", 500) > 0.5
+
+
+def test_request_limits_can_be_shared_between_processes():
+    limiter = HostRateLimiter(default=RateLimit(rate=1, burst=1))
+    limiter.configure("slow.example", RateLimit(rate=1, burst=2))
+    limiter.configure("free.example", None)
+    shared = limiter.shared_buckets(multiprocessing.get_context("spawn"))
+    first, second = HostRateLimiter(), HostRateLimiter()
+    first.use_buckets(*shared)
+    second.use_buckets(*shared)
+
+    assert second.limit_for("slow.example") == RateLimit(rate=1, burst=2)
+    assert second.limit_for("free.example") is None
+    assert second.limit_for("any.example") == RateLimit(rate=1, burst=1)
+
+    # what one limiter takes from a host's bucket is gone for the other
+    for host in ("slow.example", "slow.example", "any.example"):
+        first.acquire(host)
+    for host in ("slow.example", "any.example"):
+        with pytest.raises(DeadlineExceededError):
+            second.acquire(host, timeout=0)
+    assert second.acquire("free.example", timeout=0) == 0
+
+
+def test_normalize_host():
+    assert normalize_host("https://WWW.KolHalashon.com:443/mp3/x.mp3") == "kolhalashon.com"
+    assert normalize_host("www.yutorah.org") == "yutorah.org"
+
+
+def test_extractor_limits_are_registered():
+    assert RATE_LIMITER.limit_for("www.kolhalashon.com") == RateLimit(rate=2, burst=4)
+
+
+def test_requests_go_through_limiter(monkeypatch):
+    acquired = []
+    monkeypatch.setattr(RATE_LIMITER, "acquire", lambda host, timeout=None: acquired.append(host) or 0.25)
+
+    with use_transport(StubTransport(b"")), tracing("https://example.org/"):
+        http.get("https://example.org/feed.xml")
+        (timing,) = current_trace().requests
+
+    assert acquired == ["example.org"]
+    assert timing.queued == pytest.approx(0.25, abs=0.01)
@@ -0,0 +1,208 @@
+import re
+import sys
+
+import pytest
+import requests
+from utils import StubTransport
+
+from torah_dl import extract
+from torah_dl.core import http, retry
+from torah_dl.core.exceptions import CircuitOpenError, DeadlineExceededError, DownloadURLError, NetworkError
+from torah_dl.core.instrumentation import tracing
+from torah_dl.core.models import Extraction, Extractor
+from torah_dl.core.retry import CircuitBreaker, RetryPolicy, is_transient
+from torah_dl.core.transport import CassetteMissError, use_transport
+
+
+class _SequenceTransport(StubTransport):
+    """Fails with the given errors or status codes before answering normally."""
+
+    def __init__(self, *failures):
+        super().__init__(b"ok")
+        self.failures = list(failures)
+
+    def send(self, method, url, **kwargs):
+        if self.failures:
+            failure = self.failures.pop(0)
+            if isinstance(failure, Exception):
+                self.calls.append((method, url))
+                raise failure
+            self.status_code = failure
+        else:
+            self.status_code = 200
+        return super().send(method, url, **kwargs)
+
+
+def _response(status_code: int) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    return response
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(http.time, "sleep", recorded.append)
+    return recorded
+
+
+def test_transient_failures_are_retried(sleeps):
+    transport = _SequenceTransport(requests.ConnectionError(), 503)
+    with use_transport(transport):
+        response = http.get("https://flaky.example/")
+
+    assert response.status_code == 200
+    assert len(transport.calls) == 3
+    assert len(sleeps) == 2
+
+
+def test_waits_are_not_counted_as_parse_time(sleeps, monkeypatch):
+    monkeypatch.setattr(http.RATE_LIMITER, "acquire", lambda host, timeout=None: 0.25)
+    with use_transport(_SequenceTransport(503)), tracing("https://flaky.example/") as trace:
+        http.get("https://flaky.example/", retry=RetryPolicy(base_delay=1, jitter=False))
+    trace.extract_time = 5.0
+
+    assert (trace.queue_time, trace.backoff_time) == (pytest.approx(0.5, abs=0.01), 1.0)
+    assert trace.parse_time == pytest.approx(5.0 - trace.network_time - trace.queue_time - 1.0)
+
+
+def test_permanent_failures_are_not_retried(sleeps):
+    transport = _SequenceTransport(404)
+    with use_transport(transport):
+        assert http.get("https://gone.example/").status_code == 404
+
+    assert len(transport.calls) == 1
+    assert sleeps == []
+
+
+def test_last_response_returned_when_attempts_run_out(sleeps):
+    transport = _SequenceTransport(503, 503, 503, 503)
+    with use_transport(transport):
+        assert http.get("https://down.example/", retry=RetryPolicy(max_attempts=2)).status_code == 503
+
+    assert len(transport.calls) == 2
+
+
+def test_retry_after_is_honoured(sleeps):
+    class _RetryAfterTransport(_SequenceTransport):
+        def send(self, method, url, **kwargs):
+            self.headers = {"Retry-After": "7"} if self.failures else {}
+            return super().send(method, url, **kwargs)
+
+    with use_transport(_RetryAfterTransport(429)):
+        http.get("https://busy.example/")
+
+    assert sleeps == [7.0]
+
+
+def test_backoff_grows_exponentially_up_to_max():
+    policy = RetryPolicy(base_delay=1, max_delay=5, jitter=False)
+    assert [policy.delay(attempt) for attempt in range(5)] == [1, 2, 4, 5, 5]
+    assert 0 <= RetryPolicy(base_delay=1).delay(3) <= 8
+
+
+def test_is_transient():
+    assert is_transient(requests.Timeout())
+    assert is_transient(requests.ConnectionError())
+    assert is_transient(status=502)
+    assert not is_transient(status=404)
+    assert not is_transient(CassetteMissError("GET", "https://example.org/"))
+    assert not is_transient(DownloadURLError())
+
+
+def test_circuit_breaker_opens_and_recovers():
+    clock = _FakeClock()
+    breaker = CircuitBreaker("site", failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.record(NetworkError())
+    breaker.record(DownloadURLError())
+    breaker.record(NetworkError())
+    breaker.before_call()
+
+    breaker.record(NetworkError())
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now += 10
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(None)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_breaker_ignores_deadlines_and_permanent_errors():
+    clock = _FakeClock()
+    breaker = CircuitBreaker("site", failure_threshold=1, reset_timeout=10, clock=clock)
+    not_found = NetworkError()
+    not_found.__cause__ = requests.HTTPError(response=_response(404))
+    breaker.record(not_found)
+    breaker.record(DeadlineExceededError())
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record(NetworkError())
+    clock.now += 10
+    breaker.before_call()
+    breaker.record(DeadlineExceededError())
+    breaker.before_call()
+    assert breaker.failures == 1
+
+
+def test_repeated_not_found_leaves_circuit_closed(sleeps):
+    transport = _SequenceTransport(*[404] * 10)
+    url = "https://etzion.org.il/en/missing"
+
+    with use_transport(transport):
+        for _ in range(10):
+            with pytest.raises(NetworkError) as excinfo:
+                extract(url)
+            assert not isinstance(excinfo.value, CircuitOpenError)
+
+    assert len(transport.calls) == 10
+    assert retry.circuit_breaker("Virtual Beit Midrash (Etzion)").state == CircuitBreaker.CLOSED
+
+
+def test_extract_fails_fast_for_dead_site(sleeps, monkeypatch):
+    monkeypatch.setattr(retry, "_retry_policy", retry.NO_RETRY)
+    transport = _SequenceTransport(*[requests.ConnectionError()] * 10)
+    url = "https://etzion.org.il/en/dead"
+
+    with use_transport(transport):
+        for _ in range(5):
+            with pytest.raises(NetworkError):
+                extract(url)
+        with pytest.raises(CircuitOpenError):
+            extract(url)
+
+    assert len(transport.calls) == 5
+
+
+class _DeferringExtractor(Extractor):
+    """Returns at once, leaving the title to a request that always fails."""
+
+    name = "Deferring"
+    url_patterns = re.compile(r"https://deferring\.example/")
+
+    def extract(self, url):
+        return Extraction(download_url=f"{url}.mp3").defer(title=self._fetch_title)
+
+    def _fetch_title(self):
+        raise NetworkError() from requests.ConnectionError()
+
+
+def test_resolving_deferred_fields_counts_towards_the_circuit(monkeypatch):
+    monkeypatch.setattr(sys.modules["torah_dl.core.extract"], "EXTRACTORS", [_DeferringExtractor()])
+
+    for _ in range(5):
+        with pytest.raises(NetworkError):
+            extract("https://deferring.example/a")
+    with pytest.raises(CircuitOpenError):
+        extract("https://deferring.example/a")
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from torah_dl.core.manifest import FeedState, Manifest, ManifestEntry
+from torah_dl.core.shard import InvalidShardError, Shard, shard_key, shard_urls
+
+URLS = [f"https://www.yutorah.org/lectures/{shiur_id}/" for shiur_id in range(1117000, 1117200)] + [
+    f"https://example.com/shiur/{i}.mp3" for i in range(100)
+]
+
+
+def test_shards_are_disjoint_and_cover_every_url():
+    shards = [list(shard_urls(URLS, f"{i}/4")) for i in range(1, 5)]
+    assert sorted(url for shard in shards for url in shard) == sorted(URLS)
+    assert all(shard for shard in shards)
+
+
+def test_urls_of_the_same_item_land_in_the_same_shard():
+    urls = [
+        "https://www.yutorah.org/lectures/1117459/",
+        "https://www.yutorah.org/lectures/details?shiurid=1117459",
+        "https://www.orayta.org/orayta-torah/audio-shiurim.html?page=lecture&shiurID=1117459&shiurTitle=Test",
+    ]
+    assert shard_key(urls[0]) == shard_key(urls[1]) == shard_key(urls[2])
+    for i in range(1, 8):
+        assert len({Shard(index=i, count=7).contains(url) for url in urls}) == 1
+
+
+@pytest.mark.parametrize("shard", ["0/4", "5/4", "1/0", "1", "a/b", "2/-1"])
+def test_invalid_shards_are_rejected(shard):
+    with pytest.raises(InvalidShardError):
+        Shard.parse(shard)
+
+
+def test_shard_round_trips():
+    assert str(Shard.parse("3/8")) == "3/8"
+
+
+def test_merge_keeps_the_newest_entry_and_feed_state():
+    now = datetime.now(timezone.utc)
+    old = ManifestEntry(source_url="a", download_url="u", path="old.mp3", downloaded_at=now - timedelta(hours=1))
+    new = ManifestEntry(source_url="a", download_url="u", path="new.mp3", downloaded_at=now)
+    other = ManifestEntry(source_url="b", download_url="v", path="other.mp3")
+
+    first = Manifest(entries={"u": new}, feeds={"f": FeedState(etag="1", synced_at=now - timedelta(hours=1))})
+    second = Manifest(entries={"u": old, "v": other}, feeds={"f": FeedState(etag="2", synced_at=now)})
+
+    merged = first.merge(second)
+    assert merged is first
+    assert merged.entries["u"].path == "new.mp3"
+    assert merged.entries["v"].path == "other.mp3"
+    assert merged.feeds["f"].etag == "2"
@@ -0,0 +1,124 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from utils import StubTransport
+
+from torah_dl import extract
+from torah_dl.core import http
+from torah_dl.core.extractors.kolhalashon import KolHalashonExtractor
+from torah_dl.core.extractors.orayta import OraytaExtractor
+from torah_dl.core.extractors.yutorah import YutorahExtractor
+from torah_dl.core.singleflight import SingleFlight
+from torah_dl.core.transport import use_transport
+
+YUTORAH_HTML = b"""
+<html>
+  <head><title>YUTorah Online - Shared Shiur (Rabbi Example)</title></head>
+  <body><a href="https://download.yutorah.org/2024/1/1117459/shared-shiur.mp3">mp3</a></body>
+</html>
+"""
+
+
+class _SlowTransport(StubTransport):
+    def send(self, method, url, **kwargs):
+        time.sleep(0.1)
+        return super().send(method, url, **kwargs)
+
+
+def _concurrently(fn, *args):
+    with ThreadPoolExecutor(max_workers=len(args)) as pool:
+        return list(pool.map(fn, args))
+
+
+def test_concurrent_calls_share_one_run():
+    group = SingleFlight()
+    runs = []
+    release = threading.Event()
+
+    def _work():
+        runs.append(1)
+        release.wait(1)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(group.do, "key", _work) for _ in range(4)]
+        time.sleep(0.05)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(runs) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+    assert {result for result, _ in results} == {"result"}
+
+
+def test_errors_are_not_cached():
+    def _fail():
+        raise ValueError
+
+    group = SingleFlight()
+    with pytest.raises(ValueError):
+        group.do("key", _fail)
+    assert group.do("key", lambda: 1) == (1, False)
+
+
+def test_duplicate_gets_share_one_fetch():
+    transport = _SlowTransport(b"body")
+    with use_transport(transport):
+        responses = _concurrently(http.get, *["https://example.org/same"] * 3)
+
+    assert len(transport.calls) == 1
+    assert {r.content for r in responses} == {b"body"}
+
+
+def test_different_gets_of_the_same_url_are_not_shared():
+    transport = _SlowTransport(b"body")
+    requests = [
+        {},
+        {"params": {"page": 2}},
+        {"headers": {"Accept": "application/json"}},
+        {"timeout": 5},
+        {"allow_redirects": False},
+    ]
+    with use_transport(transport):
+        _concurrently(lambda kwargs: http.get("https://example.org/same", **kwargs), *requests)
+
+    assert len(transport.calls) == len(requests)
+
+
+def test_yutorah_and_orayta_share_classic_fetch():
+    transport = _SlowTransport(YUTORAH_HTML)
+    urls = [
+        "https://www.yutorah.org/lectures/1117459/",
+        "https://www.orayta.org/orayta-torah/audio-shiurim.html?page=lecture&shiurID=1117459&shiurTitle=Shared",
+    ]
+    with use_transport(transport):
+        extractions = _concurrently(extract, *urls)
+
+    assert transport.calls == [("GET", "https://classic.yutorah.org/lectures/lecture_iframe.cfm/1117459")]
+    assert {e.title for e in extractions} == {"Shared Shiur"}
+
+
+def test_duplicate_extractions_are_coalesced():
+    transport = _SlowTransport(YUTORAH_HTML)
+    urls = ["https://www.yutorah.org/lectures/1117460/", "https://www.yutorah.org/lectures/details?shiurid=1117460"]
+    with use_transport(transport):
+        first, second = _concurrently(extract, *urls)
+
+    assert len(transport.calls) == 1
+    assert first == second
+    assert first is not second
+
+
+def test_canonical_ids():
+    assert YutorahExtractor().canonical_id("https://www.yutorah.org/lectures/details?shiurid=1117459") == (
+        "yutorah:1117459"
+    )
+    assert OraytaExtractor().canonical_id(
+        "https://www.orayta.org/orayta-torah/audio-shiurim.html?page=lecture&shiurID=1117459&shiurTitle=x"
+    ) == ("yutorah:1117459")
+    assert KolHalashonExtractor().canonical_id("https://www.kolhalashon.com/regularSite/playShiur/123456/") == (
+        "kolhalashon:00123456"
+    )
+    assert YutorahExtractor().canonical_id("HTTPS://WWW.YUTORAH.ORG/search#top") == "https://www.yutorah.org/search"
@@ -0,0 +1,76 @@
+import hashlib
+import io
+
+import requests
+
+from torah_dl.core.store import MediaStore
+from torah_dl.core.transport import Transport, use_transport
+
+AUDIO = b"ID3" + bytes(range(256)) * 16
+
+
+class _Mirror(Transport):
+    """Serves the same file at every URL, recording the URLs requested."""
+
+    def __init__(self):
+        self.urls: list[str] = []
+
+    def send(self, method, url, **kwargs):
+        self.urls.append(url)
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200
+        response._content = AUDIO
+        response._content_consumed = True
+        return response
+
+
+def test_known_urls_are_linked_without_a_request(tmp_path):
+    site = _Mirror()
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    with MediaStore(tmp_path / "store") as store, use_transport(site):
+        first = store.download("https://shiurim.yutorah.net/1.mp3", tmp_path / "a" / "1.mp3")
+        second = store.download("https://shiurim.yutorah.net/1.mp3", tmp_path / "b" / "1.mp3")
+
+        assert (first.downloaded, second.downloaded) == (True, False)
+        assert second.sha256 == first.sha256 == hashlib.sha256(AUDIO).hexdigest()
+        assert (tmp_path / "b" / "1.mp3").read_bytes() == AUDIO
+        assert site.urls == ["https://shiurim.yutorah.net/1.mp3"]
+
+        stored = store.object_path(first.sha256)
+        assert (tmp_path / "a" / "1.mp3").samefile(stored)
+        assert (tmp_path / "b" / "1.mp3").samefile(stored)
+
+
+def test_the_same_media_from_another_url_is_stored_once(tmp_path):
+    with MediaStore(tmp_path / "store") as store, use_transport(_Mirror()):
+        store.download("https://shiurim.yutorah.net/1.mp3", tmp_path / "yutorah.mp3")
+        store.download("https://media.ou.org/1.mp3", tmp_path / "outorah.mp3")
+
+        assert len(store) == 2
+        assert len(list((tmp_path / "store" / "objects").rglob("*"))) == 2  # one directory, one file
+        assert (tmp_path / "yutorah.mp3").samefile(tmp_path / "outorah.mp3")
+
+
+def test_urls_whose_file_left_the_store_are_downloaded_again(tmp_path):
+    site = _Mirror()
+    with MediaStore(tmp_path / "store") as store, use_transport(site):
+        result = store.download("https://media.ou.org/1.mp3", tmp_path / "1.mp3")
+        store.object_path(result.sha256).unlink()
+
+        assert store.get("https://media.ou.org/1.mp3") is None
+        assert store.download("https://media.ou.org/1.mp3", tmp_path / "1.mp3").downloaded
+        assert len(site.urls) == 2
+
+
+def test_streams_are_given_the_stored_copy(tmp_path):
+    site = _Mirror()
+    stream = io.BytesIO()
+    with MediaStore(tmp_path / "store") as store, use_transport(site):
+        store.download("https://media.ou.org/1.mp3", tmp_path / "1.mp3")
+        result = store.download("https://media.ou.org/1.mp3", stream)
+
+    assert stream.getvalue() == AUDIO
+    assert (result.downloaded, result.path) == (False, None)
+    assert len(site.urls) == 1
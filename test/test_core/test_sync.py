@@ -0,0 +1,109 @@
+import pytest
+import requests
+
+from torah_dl.core.download import output_name
+from torah_dl.core.extract import EXTRACTORS
+from torah_dl.core.extractors.torahapp import TorahAppExtractor
+from torah_dl.core.manifest import MANIFEST_NAME, Manifest
+from torah_dl.core.models import Extraction
+from torah_dl.core.sync import SyncNotSupportedError, sync
+from torah_dl.core.transport import Transport, use_transport
+
+FEED_URL = "https://feeds.example.org/podcast.xml"
+SERIES_URL = "https://torahapp.org/share/p/TEST_1"
+
+
+def _feed(*episode_ids: int) -> bytes:
+    items = "".join(
+        f"<item><guid>yu:{i}</guid><title>Shiur {i}</title>"
+        f'<enclosure url="https://media.example.org/{i}.MP3" type="audio/mpeg"/></item>'
+        for i in episode_ids
+    )
+    return f"<rss><channel>{items}<item><guid>text</guid><title>No audio</title></item></channel></rss>".encode()
+
+
+class _FeedSite(Transport):
+    """Serves a podcast feed with an ETag, and an audio file for every other URL."""
+
+    def __init__(self, feed: bytes, etag: str = '"v1"'):
+        self.feed = feed
+        self.etag = etag
+        self.calls: list[tuple[str, str]] = []
+
+    def send(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200
+        if url == FEED_URL:
+            if (kwargs.get("headers") or {}).get("If-None-Match") == self.etag:
+                response.status_code = 304
+                response._content = b""
+            else:
+                response.headers["ETag"] = self.etag
+                response._content = self.feed
+        elif url.endswith("/3.MP3"):
+            response.status_code = 500
+            response._content = b""
+        else:
+            response._content = url.encode()
+        response._content_consumed = True
+        return response
+
+
+@pytest.fixture(autouse=True)
+def known_podcast(monkeypatch):
+    torahapp = next(extractor for extractor in EXTRACTORS if isinstance(extractor, TorahAppExtractor))
+    monkeypatch.setattr(torahapp, "podcasts_to_rss", {"TEST_1": FEED_URL})
+
+
+def test_only_new_items_are_downloaded(tmp_path):
+    with use_transport(site := _FeedSite(_feed(1, 2))):
+        first = sync(SERIES_URL, tmp_path)
+    assert sorted(first.downloaded) == [str(tmp_path / "yu_1.MP3"), str(tmp_path / "yu_2.MP3")]
+    assert (tmp_path / "yu_1.MP3").read_bytes() == b"https://media.example.org/1.MP3"
+
+    with use_transport(site):
+        unchanged = sync(SERIES_URL, tmp_path)
+    assert unchanged.not_modified
+    assert site.calls[-1] == ("GET", FEED_URL)
+
+    site.feed, site.etag = _feed(1, 2, 4), '"v2"'
+    with use_transport(site):
+        site.calls.clear()
+        updated = sync(SERIES_URL, tmp_path)
+    assert updated.downloaded == [str(tmp_path / "yu_4.MP3")]
+    assert updated.skipped == 2
+    assert site.calls == [("GET", FEED_URL), ("GET", "https://media.example.org/4.MP3")]
+
+    manifest = Manifest.load(tmp_path / MANIFEST_NAME)
+    assert manifest.feeds[FEED_URL].etag == '"v2"'
+    entry = manifest.entries["https://media.example.org/4.MP3"]
+    assert entry.title == "Shiur 4"
+    assert entry.source_url == "https://torahapp.org/share/p/TEST_1?e=yu%3A4"
+
+
+def test_failures_are_retried_on_the_next_sync(tmp_path):
+    with use_transport(site := _FeedSite(_feed(1, 3))):
+        result = sync(SERIES_URL, tmp_path)
+        assert list(result.failed) == ["https://media.example.org/3.MP3"]
+        assert FEED_URL not in Manifest.load(tmp_path / MANIFEST_NAME).feeds
+
+        site.calls.clear()
+        retried = sync(SERIES_URL, tmp_path)
+
+    assert not retried.not_modified
+    assert retried.skipped == 1
+    assert ("GET", "https://media.example.org/3.MP3") in site.calls
+
+
+def test_sources_without_a_feed_are_rejected(tmp_path):
+    with pytest.raises(SyncNotSupportedError):
+        sync("http://torahmediaamerica.com/shiur-1024531.html", tmp_path)
+
+
+def test_output_name():
+    assert output_name(
+        Extraction(download_url="https://a.org/x/81351.mp3", file_name="http:__outorah.org_p_81351")
+    ) == ("http___outorah.org_p_81351.mp3")
+    assert output_name(Extraction(download_url="https://a.org/x/shiur.mp3")) == "shiur.mp3"
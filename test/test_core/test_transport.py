@@ -0,0 +1,59 @@
+import pytest
+from utils import StubTransport
+
+from torah_dl import download, extract
+from torah_dl.core.exceptions import DownloadError, NetworkError
+from torah_dl.core.transport import CassetteMissError, RecordingTransport, ReplayTransport, use_transport
+
+VBM_HTML = b"""
+<html>
+  <head><title>Recorded Title | VBM</title></head>
+  <body><audio src="https://cdn.example.org/recorded.mp3"></audio></body>
+</html>
+"""
+
+
+def test_record_then_replay(tmp_path):
+    url = "https://etzion.org.il/en/recorded"
+    stub = StubTransport(VBM_HTML)
+
+    with use_transport(RecordingTransport(tmp_path, inner=stub)):
+        recorded = extract(url)
+    assert stub.calls == [("GET", url)]
+
+    with use_transport(ReplayTransport(tmp_path)):
+        replayed = extract(url)
+
+    assert replayed == recorded
+    assert replayed.title == "Recorded Title"
+    assert stub.calls == [("GET", url)]
+
+
+def test_replay_keys_on_range_header(tmp_path):
+    url = "https://example.org/audio.mp3"
+    with use_transport(RecordingTransport(tmp_path, inner=StubTransport(b"ID3"))) as transport:
+        transport.send("GET", url, headers={"Range": "bytes=0-2"})
+
+    replay = ReplayTransport(tmp_path)
+    assert replay.send("GET", url, headers={"range": "bytes=0-2"}).content == b"ID3"
+    with pytest.raises(CassetteMissError):
+        replay.send("GET", url)
+
+
+def test_replay_miss_is_network_error(tmp_path):
+    with use_transport(ReplayTransport(tmp_path)), pytest.raises(NetworkError):
+        extract("https://etzion.org.il/en/never-recorded")
+
+
+def test_download_replay(tmp_path):
+    url = "https://example.org/audio.mp3"
+    cassettes = tmp_path / "cassettes"
+    with use_transport(RecordingTransport(cassettes, inner=StubTransport(b"audio-bytes"))):
+        download(url, tmp_path / "recorded.mp3")
+
+    with use_transport(ReplayTransport(cassettes)):
+        download(url, tmp_path / "replayed.mp3")
+        with pytest.raises(DownloadError):
+            download("https://example.org/missing.mp3", tmp_path / "missing.mp3")
+
+    assert (tmp_path / "replayed.mp3").read_bytes() == b"audio-bytes"
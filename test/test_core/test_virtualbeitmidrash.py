@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import requests
 
+from torah_dl.core import http
 from torah_dl.core.extractors.virtualbeitmidrash import VirtualBeitMidrashExtractor
 
 
@@ -32,7 +33,7 @@ def test_extract_prefers_youtube_over_mp3(monkeypatch):
     def _mock_get(*args, **kwargs):
         return _MockResponse(html)
 
-    monkeypatch.setattr(requests, "get", _mock_get)
+    monkeypatch.setattr(http, "get", _mock_get)
 
     extractor = VirtualBeitMidrashExtractor()
     extraction = extractor.extract("https://etzion.org.il/en/custom/video")
@@ -54,7 +55,7 @@ def test_extract_audio_from_audio_tag(monkeypatch):
     def _mock_get(*args, **kwargs):
         return _MockResponse(html)
 
-    monkeypatch.setattr(requests, "get", _mock_get)
+    monkeypatch.setattr(http, "get", _mock_get)
 
     extractor = VirtualBeitMidrashExtractor()
     extraction = extractor.extract("https://etzion.org.il/en/custom/audio")
@@ -77,7 +78,7 @@ def test_extract_audio_from_raw_html_mp3(monkeypatch):
     def _mock_get(*args, **kwargs):
         return _MockResponse(html)
 
-    monkeypatch.setattr(requests, "get", _mock_get)
+    monkeypatch.setattr(http, "get", _mock_get)
 
     extractor = VirtualBeitMidrashExtractor()
     extraction = extractor.extract("https://etzion.org.il/en/custom/raw-audio")
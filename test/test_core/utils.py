@@ -3,8 +3,10 @@ import inspect
 from pathlib import Path
 
 import pytest
+import requests
 
 from torah_dl.core.models import Extractor
+from torah_dl.core.transport import Transport
 
 
 def get_all_the_tests(only_valid: bool = False) -> list[pytest.param]:
@@ -35,3 +37,23 @@ def get_all_the_tests(only_valid: bool = False) -> list[pytest.param]:
                         )
                     )
     return tests
+
+
+class StubTransport(Transport):
+    """Answers every request with the same canned response and remembers what was asked."""
+
+    def __init__(self, body: bytes, status_code: int = 200, headers: dict[str, str] | None = None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers or {"Content-Type": "text/html; charset=utf-8"}
+        self.calls: list[tuple[str, str]] = []
+
+    def send(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.url = url
+        response.headers.update(self.headers)
+        response._content = self.body
+        response._content_consumed = True
+        return response